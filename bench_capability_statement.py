@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Capability Statement PDF generator
+
+Each variant is rendered in a fresh process so peak RSS and import costs are
+measured in isolation (the derivative cache is shared unless --cold). For every variant the harness records wall time, CPU
+time, peak RSS, tracemalloc peak, page count and output bytes, appends the
+run to a JSON history file and compares it with the last passing run.
+
+Variants:
+    full-resolution   original PNG backgrounds, no downscaling
+    downscaled        cached derivatives at the default DPI/quality
+    no-background     text only, page callbacks draw the plain dark page
+
+Usage:
+    python bench_capability_statement.py [--repeat N] [--threshold 0.10]
+                                         [--history PATH] [--cold] [--no-record]
+
+Exits with status 1 when a variant got slower or its PDF larger than the
+last passing run by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from build_common import git_commit, run_in_process
+from capability_assets import CACHE_DIR, DEFAULT_DPI, DEFAULT_QUALITY
+
+HISTORY_PATH = '.cache/bench/capability_statement.json'
+
+VARIANTS = {
+    'full-resolution': {'dpi': None, 'quality': DEFAULT_QUALITY, 'backgrounds': True},
+    'downscaled': {'dpi': DEFAULT_DPI, 'quality': DEFAULT_QUALITY, 'backgrounds': True},
+    'no-background': {'dpi': DEFAULT_DPI, 'quality': DEFAULT_QUALITY, 'backgrounds': False},
+}
+
+
+def _run_variant(settings, cache_dir, trace, queue):
+    """Child process: import, render once and report measurements"""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    from capability_assets import prepare_backgrounds
+    from generate_capability_statement import build_document, build_styles
+
+    backgrounds = {}
+    if settings['backgrounds']:
+        backgrounds = prepare_backgrounds(settings['dpi'], settings['quality'], cache_dir)
+    context = {'styles': build_styles(), 'backgrounds': backgrounds}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'bench.pdf')
+        doc = build_document(pdf_path, context=context)
+        output_bytes = os.path.getsize(pdf_path)
+
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace else None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        max_rss *= 1024
+    queue.put({
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'peak_rss_bytes': max_rss,
+        'tracemalloc_peak_bytes': traced_peak,
+        'pages': doc.page,
+        'output_bytes': output_bytes,
+    })
+
+
+def _spawn(settings, cache_dir, trace):
+    return run_in_process(_run_variant, (settings, cache_dir, trace), 'rendering a variant')
+
+
+def measure(settings, cache_dir, repeat):
+    """
+    Render a variant `repeat` times in fresh processes and keep the medians.
+
+    tracemalloc slows allocation-heavy code several-fold, so the traced peak
+    comes from one extra run that is not used for timing.
+    """
+    runs = [_spawn(settings, cache_dir, trace=False) for _ in range(repeat)]
+    traced = _spawn(settings, cache_dir, trace=True)
+    return {
+        'wall_seconds': round(statistics.median(r['wall_seconds'] for r in runs), 4),
+        'wall_seconds_min': round(min(r['wall_seconds'] for r in runs), 4),
+        'cpu_seconds': round(statistics.median(r['cpu_seconds'] for r in runs), 4),
+        'peak_rss_bytes': max(r['peak_rss_bytes'] for r in runs),
+        'tracemalloc_peak_bytes': traced['tracemalloc_peak_bytes'],
+        'pages': runs[-1]['pages'],
+        'output_bytes': runs[-1]['output_bytes'],
+        'runs': repeat,
+    }
+
+
+def load_history(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+        f.write('\n')
+
+
+def find_regressions(previous, current, threshold, size_threshold):
+    """Return messages for variants slower/larger than `previous` beyond the thresholds"""
+    problems = []
+    for name, result in current.items():
+        base = previous.get(name)
+        if not base:
+            continue
+        if result['wall_seconds'] > base['wall_seconds'] * (1 + threshold):
+            problems.append(f"{name}: wall time {base['wall_seconds']:.3f}s -> {result['wall_seconds']:.3f}s "
+                            f"(+{result['wall_seconds'] / base['wall_seconds'] - 1:.0%})")
+        if result['output_bytes'] > base['output_bytes'] * (1 + size_threshold):
+            problems.append(f"{name}: output {base['output_bytes']:,} -> {result['output_bytes']:,} bytes "
+                            f"(+{result['output_bytes'] / base['output_bytes'] - 1:.1%})")
+    return problems
+
+
+def print_results(results):
+    print(f"{'variant':16s} {'wall s':>8s} {'cpu s':>8s} {'rss MiB':>8s} {'traced MiB':>10s} "
+          f"{'pages':>5s} {'bytes':>11s}")
+    for name, r in results.items():
+        print(f"{name:16s} {r['wall_seconds']:8.3f} {r['cpu_seconds']:8.3f} "
+              f"{r['peak_rss_bytes'] / 2**20:8.1f} {r['tracemalloc_peak_bytes'] / 2**20:10.1f} "
+              f"{r['pages']:5d} {r['output_bytes']:11,d}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the capability statement generator')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per variant (median is kept)')
+    parser.add_argument('--variant', action='append', choices=sorted(VARIANTS),
+                        help='only run this variant (repeatable)')
+    parser.add_argument('--history', default=HISTORY_PATH, help='JSON history file')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed wall-time growth vs the previous run (default 0.10)')
+    parser.add_argument('--size-threshold', type=float, default=0.01,
+                        help='allowed output-size growth vs the previous run (default 0.01)')
+    parser.add_argument('--cold', action='store_true',
+                        help='use an empty derivative cache so image preparation is timed too')
+    parser.add_argument('--no-record', action='store_true', help='compare only, do not append to history')
+    args = parser.parse_args(argv)
+
+    names = args.variant or list(VARIANTS)
+    results = {}
+    for name in names:
+        try:
+            if args.cold:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    results[name] = measure(VARIANTS[name], cache_dir, args.repeat)
+            else:
+                results[name] = measure(VARIANTS[name], CACHE_DIR, args.repeat)
+        except RuntimeError as e:
+            print(f"Error: {name}: {e}")
+            sys.exit(1)
+    print_results(results)
+
+    history = load_history(args.history)
+    # Compare with the last run that passed, so one regression can't become the new baseline
+    previous = next((run['results'] for run in reversed(history)
+                     if run.get('cold') == args.cold and run.get('passed', True)), {})
+    problems = find_regressions(previous, results, args.threshold, args.size_threshold)
+
+    if not args.no_record:
+        history.append({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'cold': args.cold,
+            'passed': not problems,
+            'results': results,
+        })
+        save_history(args.history, history)
+        print(f"History updated: {args.history} ({len(history)} runs)")
+
+    if problems:
+        print("Regressions against the previous run:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Benchmark generate_toc.py on synthetic markdown corpora
+
+Corpora from 1K to 5M lines are generated deterministically (and kept under
+.cache/bench/toc_corpora) with varying heading density, fence density (mixed
+``` and ~~~ blocks, some holding heading-like lines) and placement of an
+existing TOC. Each corpus is measured in a fresh process; every phase
+reports its throughput in corpus lines per second and its tracemalloc peak
+(allocations made by the phase itself, the input text excluded).
+
+Phases:
+    splitlines             md_text.splitlines()
+    fence_mask             per-line fence mask (legacy API)
+    extract_headings       (level, title) list (legacy API)
+    index                  MarkdownIndex.from_text()
+    slugify                slugify() over every heading title
+    build_toc              build_toc() from the index
+    insert_or_replace_toc  splice the new TOC into the text
+
+Usage:
+    python bench_toc.py [--sizes 1000 100000] [--corpus prose] [--repeat 3]
+    python bench_toc.py --save-baseline       # record .cache/bench/generate_toc.json
+    python bench_toc.py --compare             # exit 1 on regressions vs the baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import timeit
+import tracemalloc
+
+from build_common import git_commit, run_in_process
+
+BASELINE_PATH = '.cache/bench/generate_toc.json'
+CORPUS_DIR = '.cache/bench/toc_corpora'
+CORPUS_VERSION = 1  # bump when the generator changes, so stale corpora are rebuilt
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 5_000_000)
+QUICK_SIZES = (1_000, 10_000, 100_000)
+
+# heading_density: share of lines that are headings
+# fence_density:   share of lines that open a fenced block (3-40 lines long)
+# toc:             'none' (TOC gets inserted), 'top' (after the H1) or 'end' (last section)
+CORPORA = {
+    'prose': {'heading_density': 0.02, 'fence_density': 0.005, 'toc': 'top'},
+    'dense-headings': {'heading_density': 0.25, 'fence_density': 0.01, 'toc': 'top'},
+    'code-heavy': {'heading_density': 0.02, 'fence_density': 0.04, 'toc': 'none'},
+    'late-toc': {'heading_density': 0.05, 'fence_density': 0.01, 'toc': 'end'},
+}
+
+PHASES = ('splitlines', 'fence_mask', 'extract_headings', 'index', 'slugify', 'build_toc',
+          'insert_or_replace_toc')
+
+WORDS = ('release', 'pipeline', 'capability', 'statement', 'anchor', 'section', 'cache', 'build',
+         'Render', 'Deploy', 'API', 'v2.1', 'notes', '(beta)', 'C++', 'data', 'index', 'time')
+
+# Peaks below this are allocator noise and are not compared
+MIN_COMPARED_PEAK = 64 * 1024
+
+
+def corpus_path(name, lines):
+    return os.path.join(CORPUS_DIR, f"{name}-{lines}-v{CORPUS_VERSION}.md")
+
+
+def _corpus_lines(settings, lines, seed):
+    """Yield the lines of one synthetic document"""
+    rng = random.Random(seed)
+    headings, fences = settings['heading_density'], settings['fence_density']
+    toc_at = {'none': None, 'top': 2, 'end': max(int(lines * 0.9), 3)}[settings['toc']]
+    toc_entries = max(min(int(lines * headings), 200), 1)
+
+    yield '# Synthetic Benchmark Document'
+    yield ''
+    n = 2
+    while n < lines:
+        if toc_at is not None and n >= toc_at:
+            toc_at = None
+            yield '## Table of Contents'
+            for k in range(toc_entries):
+                yield f"- [Stale entry {k}](#stale-entry-{k})"
+            yield ''
+            n += toc_entries + 2
+            continue
+        roll = rng.random()
+        if roll < fences:
+            token = rng.choice(('```', '~~~'))
+            other = '~~~' if token == '```' else '```'
+            length = rng.randint(3, 40)
+            yield token + rng.choice(('', 'python', 'bash', 'json'))
+            for k in range(length - 2):
+                pick = rng.random()
+                if pick < 0.1:
+                    yield '## not a heading inside a fence'
+                elif pick < 0.15:
+                    yield other  # the other token does not close the block
+                else:
+                    yield f"    value_{k} = compute({k})"
+            yield token
+            n += length
+        elif roll < fences + headings:
+            title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+            yield f"{'#' * rng.choice((2, 2, 3, 3, 4, 5))} {title}"
+            n += 1
+        elif roll < fences + headings + 0.2:
+            yield ''
+            n += 1
+        else:
+            yield ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+            n += 1
+
+
+def ensure_corpus(name, lines):
+    """Generate the corpus file once; later runs reuse it"""
+    path = corpus_path(name, lines)
+    if not os.path.exists(path):
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for line in _corpus_lines(CORPORA[name], lines, seed=f"{name}-{lines}"):
+                f.write(line)
+                f.write('\n')
+        os.replace(tmp, path)
+    return path
+
+
+def _phase_functions(text):
+    """Callables for each phase, with their inputs prepared up front (untimed)"""
+    from generate_toc import (MarkdownIndex, build_toc, extract_headings, fence_mask,
+                              insert_or_replace_toc, slugify)
+
+    lines = text.splitlines()
+    index = MarkdownIndex.from_text(text)
+    titles = index.titles
+    toc = build_toc(index)
+    return {
+        'splitlines': lambda: text.splitlines(),
+        'fence_mask': lambda: fence_mask(lines),
+        'extract_headings': lambda: extract_headings(lines),
+        'index': lambda: MarkdownIndex.from_text(text),
+        'slugify': lambda: [slugify(title) for title in titles],
+        'build_toc': lambda: build_toc(index),
+        'insert_or_replace_toc': lambda: insert_or_replace_toc(text, toc, index=index),
+    }, {'lines': len(lines), 'headings': len(index), 'fences': len(index.fence_starts)}
+
+
+def _run_corpus(path, phases, repeat, queue):
+    """Child process: time and trace every phase over one corpus"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    functions, shape = _phase_functions(text)
+
+    results = {}
+    for name in phases:
+        fn = functions[name]
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        # the fastest repeat is the least disturbed by other load on the machine
+        seconds = min(timer.repeat(repeat, number)) / number
+
+        # tracemalloc slows allocation several-fold, so the peak is a separate call
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {
+            'seconds': round(seconds, 6),
+            'lines_per_second': round(shape['lines'] / seconds),
+            'peak_bytes': peak,
+        }
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        max_rss *= 1024
+    queue.put({**shape, 'bytes': len(text.encode('utf-8')), 'peak_rss_bytes': max_rss,
+               'phases': results})
+
+
+def measure(name, lines, phases, repeat):
+    path = ensure_corpus(name, lines)
+    result = run_in_process(_run_corpus, (path, phases, repeat), f"measuring {name}/{lines}")
+    return {'corpus': name, **result}
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(path, baseline):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+
+def find_regressions(baseline, current, threshold, memory_threshold):
+    """Messages for phases slower or hungrier than the baseline beyond the thresholds"""
+    problems = []
+    for key, result in current.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for phase, r in result['phases'].items():
+            b = base['phases'].get(phase)
+            if not b:
+                continue
+            if r['lines_per_second'] < b['lines_per_second'] * (1 - threshold):
+                problems.append(f"{key} {phase}: {b['lines_per_second']:,} -> {r['lines_per_second']:,} lines/s "
+                                f"({r['lines_per_second'] / b['lines_per_second'] - 1:.0%})")
+            if (max(r['peak_bytes'], b['peak_bytes']) >= MIN_COMPARED_PEAK
+                    and r['peak_bytes'] > b['peak_bytes'] * (1 + memory_threshold)):
+                problems.append(f"{key} {phase}: peak {b['peak_bytes'] / 2**20:.1f} -> "
+                                f"{r['peak_bytes'] / 2**20:.1f} MiB "
+                                f"(+{r['peak_bytes'] / max(b['peak_bytes'], 1) - 1:.0%})")
+    return problems
+
+
+def print_results(results, phases):
+    print(f"{'corpus':38s} {'phase':22s} {'lines/s':>14s} {'ms':>10s} {'peak MiB':>9s}")
+    for key, result in results.items():
+        label = f"{key} ({result['headings']:,} h, {result['fences']:,} f)"
+        for phase in phases:
+            r = result['phases'][phase]
+            print(f"{label:38s} {phase:22s} {r['lines_per_second']:14,d} {r['seconds'] * 1000:10.3f} "
+                  f"{r['peak_bytes'] / 2**20:9.2f}")
+            label = ''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark generate_toc.py on synthetic corpora')
+    parser.add_argument('--sizes', type=int, nargs='+', default=None,
+                        help=f"corpus sizes in lines (default {' '.join(map(str, SIZES))})")
+    parser.add_argument('--quick', action='store_true',
+                        help=f"only the small sizes ({' '.join(map(str, QUICK_SIZES))})")
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help='only this corpus profile (repeatable)')
+    parser.add_argument('--phase', action='append', choices=PHASES, help='only this phase (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repeats per phase (fastest is kept)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='write these results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare with the baseline, exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='allowed throughput drop per phase (default 0.15)')
+    parser.add_argument('--memory-threshold', type=float, default=0.10,
+                        help='allowed peak-memory growth per phase (default 0.10)')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    phases = tuple(args.phase or PHASES)
+    results = {}
+    for name in args.corpus or list(CORPORA):
+        for lines in sizes:
+            try:
+                results[f"{name}/{lines}"] = measure(name, lines, phases, args.repeat)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+    print_results(results, phases)
+
+    problems = []
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            print(f"Error: no baseline at {args.baseline}; record one with --save-baseline")
+            sys.exit(1)
+        problems = find_regressions(baseline['results'], results, args.threshold, args.memory_threshold)
+        compared = sum(1 for key in results if key in baseline['results'])
+        print(f"Compared {compared} corpora with the baseline from {baseline['timestamp']} "
+              f"(commit {baseline.get('commit')})")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'results': results,
+        })
+        print(f"Baseline written to {args.baseline}")
+
+    if problems:
+        print('Regressions against the baseline:')
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Constants and helpers shared by the website build, the page budget and the
+benchmarks. Standard library only, so any script can import it without
+pulling in another tool's dependencies.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import subprocess
+from queue import Empty
+
+DIST_DIR = 'dist'
+
+# Text assets get precompressed siblings; the PDF is included on purpose
+COMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.txt', '.xml', '.pdf')
+
+# Seconds between checks that a measuring process is still alive
+POLL_INTERVAL = 1.0
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git work tree"""
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_in_process(target, args, label):
+    """
+    Run target(*args, queue) in a fresh (spawned) process and return the one
+    result it puts on the queue. Raises RuntimeError when the process ends
+    without a result (a crash, a failed import, the OOM killer) instead of
+    waiting forever; `label` names the run in the message.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(*args, queue))
+    proc.start()
+    while True:
+        try:
+            result = queue.get(timeout=POLL_INTERVAL)
+            break
+        except Empty:
+            if proc.is_alive():
+                continue
+        # the child may have exited right after putting its result
+        try:
+            result = queue.get_nowait()
+            break
+        except Empty:
+            proc.join()
+            code = proc.exitcode
+            cause = f"killed by signal {-code}" if code < 0 else f"exit code {code}"
+            raise RuntimeError(f"{label}: the measuring process ended ({cause}) without a result")
+    proc.join()
+    return result
+
+
+def hashed_name(name, data):
+    """`name` with the first 10 hex digits of sha256(data) before its extension"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
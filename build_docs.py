@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Build the markdown under Documents/ into HTML pages
+
+    python build_docs.py [--source Documents] [--out dist/docs] [--jobs N] [--force]
+
+Every *.md file becomes a page styled with styles.css (minified, under a
+content-hashed name) and the layout in docs_template.html. The page
+navigation is the TOC engine of generate_toc.py: MarkdownIndex finds the
+headings (outside fences and comments) and build_toc() lists them, with the
+same GitHub-style anchors as the TOCs kept in the markdown itself. The
+markdown's own "Table of Contents" section is left out of the page body, since
+the sidebar shows it. index.html lists the documents.
+
+The markdown renderer is deliberately small and covers what these documents
+use: headings, paragraphs, nested and loose lists, blockquotes, fenced code,
+rules, and inline code, links, bold and italic. Links to other .md files
+point at their .html pages.
+
+Builds are incremental. Each page's inputs are recorded in
+.cache/docs_build.json with their digests:
+    page.html     <- its .md source, the template, the stylesheet, the
+                     document list (every title is in the sidebar), the
+                     renderer (this file and generate_toc.py)
+    index.html    <- the template, the stylesheet, the document list, the renderer
+A page is rendered again only when one of its inputs changed (or its output
+is missing); the pages that are due are rendered in parallel over a process
+pool. Pages of deleted sources are removed.
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from string import Template
+
+from build_common import hashed_name
+from site_css import minify_css
+from generate_toc import (FENCE_RE, HEADER_RE, MarkdownIndex, build_toc, collect_files, file_digest, slugify,
+                          unique_anchor)
+
+SOURCE_DIR = 'Documents'
+OUT_DIR = 'dist/docs'
+TEMPLATE_PATH = 'docs_template.html'
+STYLESHEET_PATH = 'styles.css'
+STATE_PATH = '.cache/docs_build.json'
+
+# Code the output depends on besides the inputs of each page
+RENDERER_SOURCES = ('build_docs.py', 'generate_toc.py')
+
+# Bump when the state file format changes
+STATE_VERSION = 1
+
+LIST_ITEM_RE = re.compile(r'^( *)([*+-]|\d{1,9}[.)])( +|$)')
+RULE_RE = re.compile(r'^ {0,3}([-*_])( *\1){2,} *$')
+QUOTE_RE = re.compile(r'^ {0,3}> ?')
+
+
+# ---------------------------------------------------------------- markdown
+
+def _href(url):
+    """Point links at other markdown documents to their rendered pages"""
+    path, sep, fragment = url.partition('#')
+    if path.endswith('.md') and '://' not in path:
+        path = path[:-3] + '.html'
+    return path + sep + fragment
+
+
+def render_inline(text):
+    """Inline markdown (code, links, bold, italic) of one block as HTML"""
+    codes = []
+
+    def stash(match):
+        codes.append(f'<code>{html.escape(match.group(2).strip(), quote=False)}</code>')
+        return f'\x00{len(codes) - 1}\x00'
+
+    text = re.sub(r'(`+)(.+?)\1', stash, text, flags=re.DOTALL)
+    text = html.escape(text, quote=False)
+    text = re.sub(r'\[([^\]]+)\]\(([^)\s]+)\)',
+                  lambda m: f'<a href="{html.escape(_href(m.group(2)))}">{m.group(1)}</a>', text)
+    text = re.sub(r'\*\*(?!\s)(.+?)(?<!\s)\*\*', r'<strong>\1</strong>', text)
+    text = re.sub(r'(?<!\w)__(?!\s)(.+?)(?<!\s)__(?!\w)', r'<strong>\1</strong>', text)
+    text = re.sub(r'(?<![\w*])\*(?![\s*])(.+?)(?<![\s*])\*(?![\w*])', r'<em>\1</em>', text)
+    text = re.sub(r'(?<![\w_])_(?![\s_])(.+?)(?<![\s_])_(?![\w_])', r'<em>\1</em>', text)
+    text = re.sub(r' {2,}\n', '<br>\n', text)
+    return re.sub(r'\x00(\d+)\x00', lambda m: codes[int(m.group(1))], text)
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip(' '))
+
+
+def _starts_block(line):
+    stripped = line.strip()
+    return bool(HEADER_RE.match(stripped) or FENCE_RE.match(stripped) or RULE_RE.match(line)
+                or QUOTE_RE.match(line) or LIST_ITEM_RE.match(line) or stripped.startswith('<!--'))
+
+
+def _list_block(lines, i):
+    """End (exclusive) of the list starting at lines[i]"""
+    base = _indent(lines[i])
+    j = i + 1
+    while j < len(lines):
+        line = lines[j]
+        if not line.strip():
+            following = next((k for k in range(j + 1, len(lines)) if lines[k].strip()), None)
+            if following is None:
+                break
+            nested = _indent(lines[following]) > base
+            if not (nested or (_indent(lines[following]) == base and LIST_ITEM_RE.match(lines[following]))):
+                break
+            j = following
+        elif _indent(line) > base or (_indent(line) == base and LIST_ITEM_RE.match(line)):
+            j += 1
+        else:
+            break
+    return j
+
+
+def _render_list(lines, anchors):
+    base = _indent(lines[0])
+    items = []  # [content column, lines]
+    for line in lines:
+        match = LIST_ITEM_RE.match(line)
+        if match and _indent(line) == base:
+            items.append((match.end(), [line[match.end():]]))
+        else:
+            column = items[-1][0]
+            items[-1][1].append(line[min(column, _indent(line)):])
+    # loose list: a blank line between items or between the blocks of an item
+    # (the list block never ends with one)
+    loose = any(not text.strip() for _, body in items for text in body)
+    marker = LIST_ITEM_RE.match(lines[0]).group(2)
+    ordered = marker[0].isdigit()
+    out = []
+    for _, body in items:
+        while body and not body[-1].strip():
+            body.pop()
+        blocks = render_blocks(body, anchors)
+        if not loose and blocks.startswith('<p>'):
+            blocks = blocks[3:].replace('</p>', '', 1)
+        out.append(f'<li>{blocks}</li>')
+    tag = 'ol' if ordered else 'ul'
+    start = int(marker[:-1]) if ordered else 1
+    start_attr = f' start="{start}"' if start != 1 else ''
+    return f'<{tag}{start_attr}>\n' + '\n'.join(out) + f'\n</{tag}>'
+
+
+def render_blocks(lines, anchors=None):
+    """
+    Markdown lines (without line breaks) as HTML block elements. `anchors`
+    holds the heading ids given so far (see generate_toc.unique_anchor), so
+    a repeated heading gets GitHub's numbered id, as in the TOC.
+    """
+    anchors = {} if anchors is None else anchors
+    out = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped:
+            i += 1
+            continue
+        if stripped.startswith('<!--'):
+            while i < len(lines) and '-->' not in lines[i]:
+                i += 1
+            i += 1
+            continue
+        fence = FENCE_RE.match(stripped)
+        if fence:
+            language = stripped[len(fence.group(1)):].strip().split(' ')[0]
+            j = i + 1
+            while j < len(lines) and not lines[j].strip().startswith(fence.group(1)):
+                j += 1
+            cls = f' class="language-{html.escape(language)}"' if language else ''
+            code = '\n'.join(lines[i + 1:j])
+            out.append(f'<pre><code{cls}>{html.escape(code, quote=False)}</code></pre>')
+            i = j + 1
+            continue
+        heading = HEADER_RE.match(stripped)
+        if heading:
+            level, title = len(heading.group(1)), heading.group(2)
+            anchor = unique_anchor(anchors, slugify(title))
+            out.append(f'<h{level} id="{anchor}">{render_inline(title)}</h{level}>')
+            i += 1
+            continue
+        if RULE_RE.match(line):
+            out.append('<hr>')
+            i += 1
+            continue
+        if QUOTE_RE.match(line):
+            j = i
+            while j < len(lines) and QUOTE_RE.match(lines[j]):
+                j += 1
+            quoted = [QUOTE_RE.sub('', text, count=1) for text in lines[i:j]]
+            out.append(f'<blockquote>\n{render_blocks(quoted, anchors)}\n</blockquote>')
+            i = j
+            continue
+        if LIST_ITEM_RE.match(line) and line[LIST_ITEM_RE.match(line).end():].strip():
+            j = _list_block(lines, i)
+            out.append(_render_list(lines[i:j], anchors))
+            i = j
+            continue
+        j = i + 1
+        while j < len(lines) and lines[j].strip() and not _starts_block(lines[j]):
+            j += 1
+        paragraph = '\n'.join(text.strip() for text in lines[i:j])
+        out.append(f'<p>{render_inline(paragraph)}</p>')
+        i = j
+    return '\n'.join(out)
+
+
+def render_markdown(md_text):
+    """Render a document; returns (title, body HTML, TOC HTML)"""
+    index = MarkdownIndex.from_text(md_text)
+    lines = md_text.splitlines()
+    if index.toc_start is not None:
+        lines = lines[:index.toc_start] + lines[index.toc_end:]
+    body = render_blocks(lines)
+    headings = [h for h in index.headings if h[2] != index.toc_start]
+    toc = render_blocks(build_toc(headings, toc_title='').splitlines())
+    return document_title(md_text, index), body, toc
+
+
+def document_title(md_text, index=None):
+    """The first H1 of a document, or None"""
+    index = index or MarkdownIndex.from_text(md_text)
+    for level, title in zip(index.heading_levels, index.titles):
+        if level == 1:
+            return title
+    return None
+
+
+# ---------------------------------------------------------------- pages
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def page_name(source, source_dir):
+    return os.path.splitext(os.path.relpath(source, source_dir))[0].replace(os.sep, '/') + '.html'
+
+
+def documents_nav(documents, current=None):
+    """The document list of the sidebar; `documents` is [(page, title)]"""
+    items = []
+    for page, title in documents:
+        current_attr = ' aria-current="page"' if page == current else ''
+        items.append(f'<li><a href="{html.escape(page)}"{current_attr}>{html.escape(title)}</a></li>')
+    return '<ul>\n' + '\n'.join(items) + '\n</ul>'
+
+
+def _relative(page, target):
+    """URL of `target` (out-dir relative) from `page`"""
+    return os.path.relpath(target, os.path.dirname(page) or '.').replace(os.sep, '/')
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def render_page(job):
+    """Pool worker: render one page into the out dir; returns (page, error or None)"""
+    page, source, context = job
+    try:
+        template = Template(context['template'])
+        documents = [(_relative(page, p), t) for p, t in context['documents']]
+        if source is None:
+            title, toc = 'Documents', ''
+            content = '<h1>Documents</h1>\n' + documents_nav(documents)
+            source = context['source_dir']
+        else:
+            with open(source, encoding='utf-8') as f:
+                title, content, toc = render_markdown(f.read())
+            title = title or os.path.splitext(os.path.basename(source))[0]
+        text = template.substitute(
+            title=html.escape(title),
+            stylesheet=_relative(page, context['stylesheet']),
+            documents=documents_nav(documents, _relative(page, page)),
+            toc=toc,
+            content=content,
+            source=html.escape(source.replace(os.sep, '/')),
+        )
+        _write(os.path.join(context['out_dir'], page), text)
+    except (OSError, UnicodeDecodeError, KeyError, ValueError) as e:
+        return page, f'{type(e).__name__}: {e}'
+    return page, None
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if data.get('version') == STATE_VERSION else {}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def build_docs(source_dir=SOURCE_DIR, out_dir=OUT_DIR, jobs=None, force=False, state_path=STATE_PATH):
+    """
+    Render the pages whose inputs changed. Returns {'rendered': {page:
+    [changed inputs]}, 'current': [pages], 'removed': [pages], 'errors':
+    [(page, error)]}.
+    """
+    state = load_state(state_path)
+    previous = state.get('pages', {})
+    titles = state.get('titles', {})  # source -> [digest, title]
+
+    with open(TEMPLATE_PATH, encoding='utf-8') as f:
+        template = f.read()
+    with open(STYLESHEET_PATH, encoding='utf-8') as f:
+        css = minify_css(f.read())
+    stylesheet = hashed_name(STYLESHEET_PATH, css.encode('utf-8'))
+    shared = {
+        TEMPLATE_PATH: _digest(template.encode('utf-8')),
+        STYLESHEET_PATH: stylesheet,
+        'renderer': _digest(''.join(file_digest(p) for p in RENDERER_SOURCES).encode('ascii')),
+    }
+
+    sources = {}
+    new_titles = {}
+    for path in collect_files([source_dir]):
+        source = str(path)
+        digest = file_digest(source)
+        if titles.get(source, [None])[0] == digest:
+            title = titles[source][1]
+        else:
+            with open(source, encoding='utf-8') as f:
+                title = document_title(f.read())
+        title = title or path.stem
+        new_titles[source] = [digest, title]
+        sources[page_name(source, source_dir)] = (source, digest)
+    documents = sorted(((page, new_titles[source][1]) for page, (source, _) in sources.items()),
+                       key=lambda item: item[0])
+    shared['documents'] = _digest(json.dumps(documents).encode('utf-8'))
+
+    graph = {'index.html': (None, dict(shared))}
+    for page, (source, digest) in sources.items():
+        graph[page] = (source, {source: digest, **shared})
+
+    result = {'rendered': {}, 'current': [], 'removed': [], 'errors': []}
+    todo = []
+    for page, (source, inputs) in sorted(graph.items()):
+        old = previous.get(page, {})
+        changed = sorted(name for name in inputs if old.get(name) != inputs[name])
+        if not changed and not force and os.path.exists(os.path.join(out_dir, page)):
+            result['current'].append(page)
+            continue
+        result['rendered'][page] = changed or (['forced'] if force else ['output missing'])
+        todo.append(page)
+
+    context = {'template': template, 'stylesheet': stylesheet, 'documents': documents,
+               'out_dir': out_dir, 'source_dir': source_dir}
+    jobs_list = [(page, graph[page][0], context) for page in todo]
+    if len(jobs_list) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(render_page, jobs_list))
+    else:
+        outcomes = [render_page(job) for job in jobs_list]
+
+    pages = {page: previous[page] for page in result['current']}
+    for page, error in outcomes:
+        if error:
+            result['errors'].append((page, error))
+            del result['rendered'][page]
+        else:
+            pages[page] = graph[page][1]
+
+    # The stylesheet is shared by every page; write it when its hashed name is new
+    css_path = os.path.join(out_dir, stylesheet)
+    if not os.path.exists(css_path):
+        _write(css_path, css)
+    # Remove pages of deleted sources and stylesheets of earlier builds
+    for page in sorted(set(previous) - set(graph)):
+        result['removed'].append(page)
+        try:
+            os.unlink(os.path.join(out_dir, page))
+        except FileNotFoundError:
+            pass
+    for name in os.listdir(out_dir):
+        if re.fullmatch(r'styles\.[0-9a-f]+\.css', name) and name != stylesheet:
+            os.unlink(os.path.join(out_dir, name))
+
+    save_state({'version': STATE_VERSION, 'pages': pages, 'titles': new_titles}, state_path)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the Documents/ markdown into HTML pages')
+    parser.add_argument('--source', default=SOURCE_DIR, help=f'markdown directory (default {SOURCE_DIR})')
+    parser.add_argument('--out', default=OUT_DIR, help=f'output directory (default {OUT_DIR})')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='render every page')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.source):
+        print(f"Error: {args.source} not found")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    result = build_docs(args.source, args.out, args.jobs, args.force)
+    for page, error in result['errors']:
+        print(f"Error: {page}: {error}")
+    for page, changed in result['rendered'].items():
+        print(f"Rendered {os.path.join(args.out, page)} ({', '.join(changed)})")
+    for page in result['removed']:
+        print(f"Removed {os.path.join(args.out, page)}")
+    print(f"{len(result['rendered'])} page(s) rendered, {len(result['current'])} up to date "
+          f"in {time.perf_counter() - start:.2f}s")
+    if result['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
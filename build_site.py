@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Build the deployable website into dist/
+
+    python build_site.py [--dist dist] [--jobs N]
+
+Steps:
+    1. responsive image derivatives (site_images.py)
+    2. minified CSS and JS, published under content-hashed names
+       (styles.<hash>.css, script.<hash>.js) so they can be cached forever
+    3. critical CSS: the rules that style the header and hero (the first
+       screen) are inlined into index.html; the full stylesheet loads
+       asynchronously via rel=preload (with a <noscript> fallback)
+    4. image loading hints (html_optimize.py): width/height on every <img>,
+       loading="lazy" below the first screen and a preload for the hero
+       image; then the minified index.html
+    5. capability_statement.pdf and CNAME copied as-is
+    6. every text asset (and the PDF) precompressed to .gz and .br siblings;
+       .br needs the optional `brotli` package and is skipped without it
+    7. a service worker (sw.js, see service_worker.py) that serves every
+       file cache-first from a precache manifest of content hashes
+
+The minifiers are deliberately conservative (comments and redundant
+whitespace only; no renaming), so they cannot change behaviour.
+"""
+
+import argparse
+import gzip
+import os
+import re
+import shutil
+import sys
+import time
+
+try:
+    import brotli
+except ImportError:  # optional: .br siblings are skipped without it
+    brotli = None
+
+import html_optimize
+import service_worker
+import site_images
+from build_common import COMPRESSIBLE_EXTENSIONS, DIST_DIR, hashed_name
+from site_css import critical_css, first_screen, minify_css
+
+# Copied into dist/ unchanged (when present)
+STATIC_FILES = ('capability_statement.pdf', 'CNAME')
+
+# Elements whose start/end tags may lose the whitespace around them
+BLOCK_TAGS = frozenset((
+    'html', 'head', 'body', 'meta', 'link', 'title', 'style', 'script', 'noscript', 'header',
+    'nav', 'main', 'section', 'article', 'aside', 'footer', 'div', 'form', 'ul', 'ol', 'li',
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'picture', 'source', 'select', 'option', 'br',
+))
+
+
+# ---------------------------------------------------------------- JS
+
+JS_TOKEN_RE = re.compile(r'''
+    "(?:\\.|[^"\\\n])*"
+  | '(?:\\.|[^'\\\n])*'
+  | `(?:\\.|[^`\\])*`
+  | //[^\n]*
+  | /\*.*?\*/
+  | \n\s*
+  | [ \t]+
+  | [\w$]+
+  | .
+''', re.DOTALL | re.VERBOSE)
+
+# A '/' after one of these starts a regular expression literal, not a division
+JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {'', 'return', 'typeof', 'case', 'in', 'of'}
+JS_WORD_RE = re.compile(r'[\w$]')
+JS_REGEX_RE = re.compile(r'/(?:\\.|\[(?:\\.|[^\]\\])*\]|[^/\\\n\[])+/[a-z]*')
+
+
+def minify_js(js):
+    """
+    Drop comments, indentation and blank lines. Line breaks are kept so
+    automatic semicolon insertion behaves exactly as before.
+    """
+    tokens = []  # significant tokens plus ' ' and '\n' separators
+    last = ''  # last significant token
+    i = 0
+    while i < len(js):
+        if js[i] == '/' and last in JS_REGEX_PRECEDERS and js[i:i + 2] not in ('//', '/*'):
+            m = JS_REGEX_RE.match(js, i)
+            if m:
+                tokens.append(m.group(0))
+                last = m.group(0)
+                i = m.end()
+                continue
+        token = JS_TOKEN_RE.match(js, i).group(0)
+        i += len(token)
+        if token.startswith('//'):
+            continue
+        if token.startswith('/*'):
+            # a multi-line comment still ends the line for semicolon insertion
+            tokens.append('\n' if '\n' in token else ' ')
+        elif token[0] == '\n':
+            tokens.append('\n')
+        elif token[0] in ' \t':
+            tokens.append(' ')
+        else:
+            tokens.append(token)
+            last = token
+
+    out = []
+    for j, token in enumerate(tokens):
+        if token == ' ':
+            # keep a space only between two word characters, or in '+ +' / '- -'
+            before = out[-1][-1:] if out else ''
+            after = tokens[j + 1][:1] if j + 1 < len(tokens) else ''
+            if (JS_WORD_RE.match(before) and JS_WORD_RE.match(after)) or (before == after and before in ('+', '-')):
+                out.append(' ')
+        elif token == '\n':
+            if out and out[-1] != '\n':
+                out.append('\n')
+        else:
+            out.append(token)
+    return ''.join(out).strip('\n') + '\n'
+
+
+# ---------------------------------------------------------------- HTML
+
+HTML_TOKEN_RE = re.compile(r'''
+    <!--.*?-->
+  | <(?P<raw>pre|textarea|script|style)\b.*?</(?P=raw)\s*>
+  | <[^>]*>
+  | [^<]+
+''', re.DOTALL | re.IGNORECASE | re.VERBOSE)
+TAG_NAME_RE = re.compile(r'</?\s*([a-zA-Z][\w-]*)')
+QUOTED_RE = re.compile(r'''("[^"]*"|'[^']*')''')
+
+
+def _minify_tag(tag):
+    parts = QUOTED_RE.split(tag)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\s+', ' ', parts[i])
+    tag = ''.join(parts)
+    return re.sub(r'\s*(/?)>$', r'\1>', tag.replace('< ', '<'))
+
+
+def minify_html(html):
+    """
+    Drop comments (but not conditional comments) and collapse whitespace.
+    Whitespace is removed entirely only between block-level tags;
+    <pre>, <textarea>, <script> and <style> contents are kept verbatim.
+    """
+    tokens = []
+    for m in HTML_TOKEN_RE.finditer(html):
+        token = m.group(0)
+        if token.startswith('<!--'):
+            if token.startswith('<!--[if'):
+                tokens.append(token)
+            continue
+        if token.startswith('<') and not m.group('raw'):
+            token = _minify_tag(token)
+        elif not token.startswith('<'):
+            token = re.sub(r'\s+', ' ', token)
+        tokens.append(token)
+
+    def is_block(token):
+        name = TAG_NAME_RE.match(token) if token.startswith('<') else None
+        return name is not None and name.group(1).lower() in BLOCK_TAGS or token.startswith('<!')
+
+    out = []
+    for i, token in enumerate(tokens):
+        if token.isspace():
+            prev = out[-1] if out else ''
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else ''
+            if not prev or not nxt or is_block(prev) or is_block(nxt):
+                continue
+        elif not token.startswith('<'):
+            # trim text next to block tags
+            if not out or is_block(out[-1]):
+                token = token.lstrip()
+            if i + 1 >= len(tokens) or is_block(tokens[i + 1]):
+                token = token.rstrip()
+            if not token:
+                continue
+        out.append(token)
+    return ''.join(out)
+
+
+# ---------------------------------------------------------------- build
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def precompress(path):
+    """
+    Write `path`.gz (and `path`.br when brotli is installed) next to `path`.
+
+    Siblings that would not be smaller are skipped. Returns
+    {'gz': bytes or None, 'br': bytes or None}.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = {'gz': None, 'br': None}
+    encoders = {'gz': lambda d: gzip.compress(d, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoders['br'] = lambda d: brotli.compress(d, quality=11)
+    for ext, encode in encoders.items():
+        packed = encode(data)
+        sibling = f"{path}.{ext}"
+        if len(packed) < len(data):
+            _write(sibling, packed)
+            sizes[ext] = len(packed)
+        elif os.path.exists(sibling):
+            os.unlink(sibling)
+    return sizes
+
+
+def build_site(dist_dir=DIST_DIR, jobs=None):
+    """Build dist/; returns {dist-relative path: {'source', 'bytes', 'gz', 'br'}} for the report"""
+    manifest, info = site_images.build_images(dist_dir=dist_dir, jobs=jobs)
+    written = {}
+
+    with open('styles.css', encoding='utf-8') as f:
+        css = minify_css(site_images.rewrite_css(f.read(), manifest))
+    with open('script.js', encoding='utf-8') as f:
+        js = minify_js(f.read())
+    with open('index.html', encoding='utf-8') as f:
+        html = site_images.rewrite_html(f.read(), manifest)
+    html, _ = html_optimize.optimize_html(html, '.', css)
+
+    css_name = hashed_name('styles.css', css.encode('utf-8'))
+    js_name = hashed_name('script.js', js.encode('utf-8'))
+    written[css_name] = ('styles.css', css.encode('utf-8'))
+    written[js_name] = ('script.js', js.encode('utf-8'))
+
+    critical = critical_css(css, first_screen(html))
+    stylesheet = (f'<style>{critical}</style>'
+                  f'<link rel="preload" href="{css_name}" as="style" '
+                  f'onload="this.onload=null;this.rel=\'stylesheet\'">'
+                  f'<noscript><link rel="stylesheet" href="{css_name}"></noscript>')
+    html, count = re.subn(r'<link\s+rel="stylesheet"\s+href="styles\.css"\s*/?>', lambda m: stylesheet, html)
+    if count != 1:
+        raise ValueError('index.html: expected one <link rel="stylesheet" href="styles.css">')
+    html, count = re.subn(r'<script\s+src="script\.js"\s*>', f'<script src="{js_name}" defer>', html)
+    if count != 1:
+        raise ValueError('index.html: expected one <script src="script.js">')
+    html, count = re.subn(r'</body>', lambda m: service_worker.REGISTER_SNIPPET + m.group(0), html)
+    if count != 1:
+        raise ValueError('index.html: expected one </body>')
+    written['index.html'] = ('index.html', minify_html(html).encode('utf-8'))
+
+    for name, (_, data) in written.items():
+        _write(os.path.join(dist_dir, name), data)
+    for name in STATIC_FILES:
+        if os.path.exists(name):
+            shutil.copyfile(name, os.path.join(dist_dir, name))
+            written[name] = (name, None)
+
+    report = {}
+    for name, (source, _) in written.items():
+        path = os.path.join(dist_dir, name)
+        report[name] = {'source': os.path.getsize(source), 'bytes': os.path.getsize(path)}
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            report[name].update(precompress(path))
+
+    # Remove hashed CSS/JS and compressed siblings left over from earlier builds
+    keep = set(written)
+    keep |= {f"{name}.{ext}" for name in written for ext in ('gz', 'br')}
+    for name in os.listdir(dist_dir):
+        path = os.path.join(dist_dir, name)
+        if os.path.isfile(path) and name not in keep:
+            os.unlink(path)
+
+    # Last: the manifest hashes the final files
+    manifest = service_worker.write_service_worker(dist_dir)
+    worker = os.path.join(dist_dir, service_worker.WORKER_NAME)
+    report[service_worker.WORKER_NAME] = {'source': None, 'bytes': os.path.getsize(worker),
+                                          **precompress(worker)}
+    info['precached'] = sum(e['precache'] for e in manifest['entries'])
+    return report, info
+
+
+def print_report(report):
+    print(f"{'file':34s} {'source':>10s} {'dist':>10s} {'gzip':>10s} {'brotli':>10s}")
+    for name, r in report.items():
+        cells = [f"{r[k]:,}" if r.get(k) is not None else '-' for k in ('source', 'bytes', 'gz', 'br')]
+        print(f"{name:34s} {cells[0]:>10s} {cells[1]:>10s} {cells[2]:>10s} {cells[3]:>10s}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the minified, precompressed website into dist/')
+    parser.add_argument('--dist', default=DIST_DIR, help=f'output directory (default {DIST_DIR})')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='image encoder threads')
+    args = parser.parse_args(argv)
+
+    for name in ('index.html', 'styles.css', 'script.js'):
+        if not os.path.exists(name):
+            print(f"Error: {name} not found (run from the repo root)")
+            sys.exit(1)
+
+    start = time.perf_counter()
+    try:
+        report, info = build_site(args.dist, args.jobs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print_report(report)
+    if brotli is None:
+        print("Note: brotli is not installed, .br files were skipped (pip install brotli)")
+    print(f"Built {args.dist}/ in {time.perf_counter() - start:.1f}s "
+          f"({info['encoded']} image derivative(s) encoded, {info['reused']} reused; "
+          f"sw.js precaches {info['precached']} file(s))")
+
+
+if __name__ == '__main__':
+    main()
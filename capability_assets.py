@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Prepare page-sized image derivatives for the Capability Statement PDF
+
+Background images are downscaled to the resolution they are actually printed
+at, alpha-stripped and re-encoded once, then kept in an on-disk cache keyed by
+the source file's content hash plus the DPI/quality settings. Builds reuse the
+cached files and only reprocess an image when its source changes.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+# Cache location (relative to the repo root, ignored by git)
+CACHE_DIR = '.cache/capability_assets'
+
+# Default derivative settings
+DEFAULT_DPI = 150
+DEFAULT_QUALITY = 85
+
+# Letter page and logo box, in points (1/72 inch)
+PAGE_BOX = (612.0, 792.0)
+LOGO_BOX = (86.4, 86.4)
+
+# Content-page logo placement (lower-left corner of LOGO_BOX, in points)
+LOGO_ORIGIN = (36.0, 792.0 - 36.0 - 86.4)
+
+# Black overlay drawn over the hero so body text stays readable
+CONTENT_OVERLAY_ALPHA = 0.85
+
+# Image paths
+SHOWCASE_IMAGE = 'assets/img/BW_website-service_showcase_2.png'
+HERO_IMAGE = 'assets/img/BW_website-hero.png'
+LOGO_IMAGE = 'assets/img/Final_Logo.png'
+
+# Bump when the derivative recipe changes so stale cache entries are ignored
+RECIPE_VERSION = 2
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derivative_key(source_digest, box, dpi, quality, fmt):
+    """Cache key for one derivative: source content plus every setting that shapes it"""
+    settings = {
+        'recipe': RECIPE_VERSION,
+        'source': source_digest,
+        'box': [round(v, 3) for v in box],
+        'dpi': dpi,
+        'quality': quality,
+        'format': fmt,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+def target_size(size, box, dpi):
+    """
+    Pixel size an image needs to fill `box` (points) at `dpi` while keeping
+    its aspect ratio, as drawImage(preserveAspectRatio=True) places it.
+    Images are never upscaled.
+    """
+    width, height = size
+    scale = min(box[0] / width, box[1] / height)
+    pixels_w = max(1, round(width * scale * dpi / 72.0))
+    pixels_h = max(1, round(height * scale * dpi / 72.0))
+    if pixels_w >= width or pixels_h >= height:
+        return size
+    return pixels_w, pixels_h
+
+
+def _write_atomic(img, out_path, fmt, quality):
+    """Encode to a temp file and rename, so concurrent builds never see partial files"""
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    if fmt == 'JPEG':
+        img.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=False)
+    else:
+        img.save(tmp_path, 'PNG', optimize=True)
+    os.replace(tmp_path, out_path)
+
+
+def prepare_image(src, box, dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY, fmt='JPEG',
+                  cache_dir=CACHE_DIR):
+    """
+    Return the path of a cached derivative of `src` sized for `box` at `dpi`.
+
+    JPEG derivatives are flattened onto black (the statement's background
+    colour) so they carry no alpha channel; PNG derivatives keep transparency
+    for artwork such as the logo. Returns the source path unchanged when `dpi`
+    is None (full-resolution mode) and None when the source does not exist.
+    """
+    if not os.path.exists(src):
+        return None
+    if dpi is None:
+        return src
+
+    key = derivative_key(file_digest(src), box, dpi, quality, fmt)
+    ext = '.jpg' if fmt == 'JPEG' else '.png'
+    out_path = os.path.join(cache_dir, key + ext)
+    if os.path.exists(out_path):
+        return out_path
+
+    # Pillow is only needed on a cache miss
+    from PIL import Image
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(src) as img:
+        img.load()
+        size = target_size(img.size, box, dpi)
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+        if fmt == 'JPEG':
+            if img.mode in ('RGBA', 'LA', 'P'):
+                rgba = img.convert('RGBA')
+                flat = Image.new('RGB', rgba.size, (0, 0, 0))
+                flat.paste(rgba, mask=rgba.getchannel('A'))
+                img = flat
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+        _write_atomic(img, out_path, fmt, quality)
+    return out_path
+
+
+def _placed_rect(size, box, origin, scale):
+    """
+    Pixel rectangle (left, top, width, height) of an image drawn into `box`
+    at `origin` with preserveAspectRatio and a centred anchor, on a page
+    rendered at `scale` pixels per point.
+    """
+    fit = min(box[0] / size[0], box[1] / size[1])
+    width_pt, height_pt = size[0] * fit, size[1] * fit
+    x_pt = origin[0] + (box[0] - width_pt) / 2
+    y_pt = origin[1] + (box[1] - height_pt) / 2
+    top_pt = PAGE_BOX[1] - y_pt - height_pt
+    return (round(x_pt * scale), round(top_pt * scale),
+            max(1, round(width_pt * scale)), max(1, round(height_pt * scale)))
+
+
+def prepare_content_background(dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY, cache_dir=CACHE_DIR):
+    """
+    Flatten the content-page layers (hero, black overlay, logo) into one
+    full-page JPEG, as the viewer would composite them over a white page.
+
+    With `dpi` None the page is rendered at the hero's native resolution.
+    Returns None when neither the hero nor the logo exists.
+    """
+    layers = [path for path in (HERO_IMAGE, LOGO_IMAGE) if os.path.exists(path)]
+    if not layers:
+        return None
+
+    digests = {path: file_digest(path) for path in layers}
+    key = derivative_key(digests, PAGE_BOX, dpi, quality, 'content-composite')
+    out_path = os.path.join(cache_dir, key + '.jpg')
+    if os.path.exists(out_path):
+        return out_path
+
+    from PIL import Image
+
+    hero = Image.open(HERO_IMAGE) if HERO_IMAGE in digests else None
+    logo = Image.open(LOGO_IMAGE) if LOGO_IMAGE in digests else None
+    if dpi is None:
+        # Native resolution: one hero pixel per page pixel
+        scale = max(hero.size[0] / PAGE_BOX[0], hero.size[1] / PAGE_BOX[1]) if hero else 1.0
+    else:
+        scale = dpi / 72.0
+    page = Image.new('RGB', (round(PAGE_BOX[0] * scale), round(PAGE_BOX[1] * scale)), (255, 255, 255))
+
+    if hero is not None:
+        with hero:
+            left, top, width, height = _placed_rect(hero.size, PAGE_BOX, (0, 0), scale)
+            page.paste(hero.convert('RGB').resize((width, height), Image.LANCZOS), (left, top))
+        # The overlay covers the whole page, not just the hero's rectangle, as
+        # the canvas rect did; without a hero there was no overlay either
+        page = Image.blend(page, Image.new('RGB', page.size, (0, 0, 0)), CONTENT_OVERLAY_ALPHA)
+
+    if logo is not None:
+        with logo:
+            left, top, width, height = _placed_rect(logo.size, LOGO_BOX, LOGO_ORIGIN, scale)
+            mark = logo.convert('RGBA').resize((width, height), Image.LANCZOS)
+            page.paste(mark, (left, top), mark)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(page, out_path, 'JPEG', quality)
+    return out_path
+
+
+def prepare_backgrounds(dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY, cache_dir=CACHE_DIR):
+    """
+    Prepare every image the page callbacks draw.
+
+    Returns a dict with the 'cover' page image and the pre-composited
+    'content' page background (None when the source images are missing),
+    ready to hand to drawImage.
+    """
+    return {
+        'cover': prepare_image(SHOWCASE_IMAGE, PAGE_BOX, dpi, quality, 'JPEG', cache_dir),
+        'content': prepare_content_background(dpi, quality, cache_dir),
+    }
+
+
+if __name__ == '__main__':
+    # Warm the cache: python capability_assets.py [dpi] [quality]
+    dpi = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DPI
+    quality = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_QUALITY
+    for name, path in prepare_backgrounds(dpi, quality).items():
+        size = os.path.getsize(path) if path else 0
+        print(f'{name:6s} {path} ({size:,} bytes)')
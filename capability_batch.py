@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Render tailored Capability Statement variants in parallel
+
+Reads a JSON list of variant definitions, each overriding any key of
+generate_capability_statement.DEFAULT_CONTENT, e.g.
+
+    [
+      {"name": "navfac",
+       "decision_highlights": [],
+       "contact": {"lines": ["bd@example.com"]}}
+    ]
+
+Background derivatives are prepared once in the parent process; each pool
+worker then decodes them and builds the paragraph styles exactly once in its
+initializer and reuses them for every variant it renders.
+
+Usage:
+    python capability_batch.py capability_variants.json [--output-dir DIR] [--jobs N]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from capability_assets import DEFAULT_DPI, DEFAULT_QUALITY, prepare_backgrounds
+
+DEFAULT_OUTPUT_DIR = 'dist/capability_statements'
+
+# Per-worker render context (styles + decoded images), set by _init_worker
+_context = None
+
+
+def _init_worker(dpi, quality):
+    global _context
+    from generate_capability_statement import load_render_context
+    _context = load_render_context(dpi, quality)
+
+
+def _render_variant(variant, pdf_path):
+    """Render one variant in a worker; returns its report row"""
+    from generate_capability_statement import build_document
+
+    content = {k: v for k, v in variant.items() if k not in ('name', 'output')}
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    doc = build_document(pdf_path, content, context=_context)
+    return {
+        'name': variant['name'],
+        'output': pdf_path,
+        'seconds': round(time.perf_counter() - start, 4),
+        'cpu_seconds': round(time.process_time() - cpu_start, 4),
+        'pages': doc.page,
+        'bytes': os.path.getsize(pdf_path),
+        'pid': os.getpid(),
+    }
+
+
+def load_variants(path):
+    """Load and validate variant definitions"""
+    with open(path, encoding='utf-8') as f:
+        variants = json.load(f)
+    if not isinstance(variants, list):
+        raise ValueError(f"{path}: expected a JSON list of variants")
+    seen = set()
+    for i, variant in enumerate(variants):
+        name = variant.get('name')
+        if not name:
+            raise ValueError(f"{path}: variant #{i} has no 'name'")
+        if name in seen:
+            raise ValueError(f"{path}: duplicate variant name {name!r}")
+        seen.add(name)
+    return variants
+
+
+def output_path(variant, output_dir):
+    if variant.get('output'):
+        return variant['output']
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', variant['name']).strip('-')
+    return os.path.join(output_dir, f"capability_statement-{slug}.pdf")
+
+
+def render_batch(variants, output_dir=DEFAULT_OUTPUT_DIR, jobs=None,
+                 dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY):
+    """Render every variant across a process pool; returns report rows in input order"""
+    os.makedirs(output_dir, exist_ok=True)
+    if not variants:
+        return []
+
+    # Encode any missing derivatives once, before workers start reading them
+    prepare_backgrounds(dpi, quality)
+
+    paths = [output_path(v, output_dir) for v in variants]
+    for path in paths:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    jobs = jobs or min(len(variants), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(dpi, quality)) as pool:
+        return list(pool.map(_render_variant, variants, paths))
+
+
+def print_report(rows, wall_seconds):
+    name_width = max([len(r['name']) for r in rows] + [7])
+    print(f"{'variant':{name_width}s}  {'seconds':>8s}  {'pages':>5s}  {'bytes':>10s}  output")
+    for r in rows:
+        print(f"{r['name']:{name_width}s}  {r['seconds']:8.3f}  {r['pages']:5d}  {r['bytes']:10,d}  {r['output']}")
+    total = sum(r['seconds'] for r in rows)
+    print(f"{len(rows)} variants in {wall_seconds:.3f}s wall ({total:.3f}s summed render time)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render tailored capability statements in parallel')
+    parser.add_argument('variants', help='JSON file with a list of variant definitions')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+    parser.add_argument('--report', default=None,
+                        help='write the timing/size report as JSON (default: <output-dir>/report.json)')
+    args = parser.parse_args(argv)
+
+    try:
+        variants = load_variants(args.variants)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    rows = render_batch(variants, args.output_dir, args.jobs, args.dpi, args.quality)
+    wall = time.perf_counter() - start
+    print_report(rows, wall)
+
+    report_path = args.report or os.path.join(args.output_dir, 'report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'wall_seconds': round(wall, 4), 'variants': rows}, f, indent=2)
+        f.write('\n')
+    print(f"Report written: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
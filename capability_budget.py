@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Size-budget mode for the Capability Statement PDF
+
+Finds the best-looking render that fits in `max_bytes`, for portals and mail
+gateways that cap attachment size:
+
+    python generate_capability_statement.py --max-bytes 500K
+
+The background images are the only part of the file that scales. They are
+embedded as the JPEG derivatives capability_assets writes, byte for byte,
+so a render costs its images plus a fixed overhead (text, fonts, page
+structure; about 10 KiB). The search renders the requested setting once.
+If that does not fit, it keeps the measured overhead and predicts the size
+of every other setting from the sizes of its cached derivatives, without
+laying the document out again:
+
+  - background resolution steps down through DPI_STEPS (from the requested
+    --dpi); sizes fall with resolution, so the first step that fits at
+    MIN_QUALITY is found by bisection over the steps
+  - from there, the first resolution that fits at QUALITY_FLOOR wins, with
+    the highest quality up to the requested --quality that fits (bisection):
+    below the floor JPEG artefacts show sooner than a lower resolution does
+  - if none does, the lowest resolution wins, at the highest quality that
+    fits
+  - if no background setting fits, the lite template (no background
+    images, a plain dark page) is used
+
+Predicting a size still means encoding that setting's two background
+derivatives (Pillow, a few hundred ms each at print resolution); a search
+typically encodes 10-20 images, and describe() reports how many. Only the
+chosen setting is rendered again, and that render is checked. If the
+prediction was short, the check corrects the overhead and the search goes
+on. Derivatives encoded only to be measured are deleted afterwards; the
+chosen ones and any that were cached before the search stay in
+.cache/capability_assets.
+"""
+
+import argparse
+import os
+import re
+
+from capability_assets import CACHE_DIR, DEFAULT_DPI, DEFAULT_QUALITY, prepare_backgrounds
+
+# Background resolutions tried, highest first (only those up to the requested dpi)
+DPI_STEPS = (300, 200, 150, 120, 100, 85, 72, 60, 50, 40)
+
+# JPEG quality range searched; below QUALITY_FLOOR a lower resolution is preferred
+MIN_QUALITY = 30
+QUALITY_FLOOR = 60
+
+# Page callbacks draw a plain dark page when there is no background image
+LITE_BACKGROUNDS = {'cover': None, 'content': None}
+
+SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kKmM]i?[bB]?|[bB])?\s*$')
+SIZE_UNITS = {'k': 1000, 'ki': 1024, 'm': 1000 ** 2, 'mi': 1024 ** 2}
+
+
+def parse_size(text):
+    """'500000', '500K', '1.5MB' or '2MiB' in bytes (argparse type)"""
+    match = SIZE_RE.match(text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected a size such as 500000, 500K or 2MB, got {text!r}")
+    unit = (match.group(2) or 'b').lower().rstrip('b')
+    return int(float(match.group(1)) * SIZE_UNITS.get(unit, 1))
+
+
+class BudgetSearch:
+    """Search state: derivative sizes, renders and the measured overhead, shared by every step"""
+
+    def __init__(self, content=None, styles=None, linearize=False):
+        import generate_capability_statement as gcs
+        self._gcs = gcs
+        self.content = content
+        self.styles = styles if styles is not None else gcs.build_styles()
+        self.linearize = linearize
+        self.overhead = None
+        self.renders = {}      # setting -> PDF bytes
+        self.image_sizes = {}  # (dpi, quality) -> bytes of the background derivatives
+        self.rejected = set()  # settings whose render did not fit
+
+    def backgrounds(self, setting):
+        if setting == 'lite':
+            return dict(LITE_BACKGROUNDS)
+        return prepare_backgrounds(*setting)
+
+    def image_bytes(self, setting):
+        if setting == 'lite':
+            return 0
+        if setting not in self.image_sizes:
+            self.image_sizes[setting] = sum(os.path.getsize(path) for path in self.backgrounds(setting).values()
+                                            if path)
+        return self.image_sizes[setting]
+
+    def render(self, setting):
+        """PDF bytes for a (dpi, quality) setting or 'lite'; renders each setting at most once"""
+        if setting not in self.renders:
+            context = {'styles': self.styles, 'backgrounds': self.backgrounds(setting)}
+            data = self._gcs.render_capability_statement(content=self.content, context=context,
+                                                         linearize=self.linearize)
+            self.renders[setting] = data
+            overhead = len(data) - self.image_bytes(setting)
+            self.overhead = overhead if self.overhead is None else max(self.overhead, overhead)
+        return self.renders[setting]
+
+    def predicted(self, setting):
+        return self.overhead + self.image_bytes(setting)
+
+    def fits(self, setting, max_bytes):
+        return setting not in self.rejected and self.predicted(setting) <= max_bytes
+
+    def best_quality(self, dpi, min_quality, max_quality, max_bytes):
+        """Highest quality in [min_quality, max_quality] predicted to fit at `dpi`, or None"""
+        low, high, best = min_quality, max_quality, None
+        while low <= high:
+            quality = (low + high) // 2
+            if self.fits((dpi, quality), max_bytes):
+                best, low = quality, quality + 1
+            else:
+                high = quality - 1
+        return best
+
+    def candidate(self, dpi_steps, max_quality, max_bytes):
+        """The best setting predicted to fit, or 'lite'"""
+        floor = min(QUALITY_FLOOR, max_quality)
+        # First step (highest resolution) that fits at all
+        low, high = 0, len(dpi_steps)
+        while low < high:
+            middle = (low + high) // 2
+            if self.fits((dpi_steps[middle], MIN_QUALITY), max_bytes):
+                high = middle
+            else:
+                low = middle + 1
+        if low == len(dpi_steps):
+            return 'lite'
+        for dpi in dpi_steps[low:]:
+            if self.fits((dpi, floor), max_bytes):
+                return dpi, self.best_quality(dpi, floor, max_quality, max_bytes)
+        dpi = dpi_steps[-1]
+        quality = self.best_quality(dpi, MIN_QUALITY, floor - 1, max_bytes)
+        return (dpi, quality) if quality is not None else 'lite'
+
+
+def fit_to_budget(max_bytes, dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY, content=None, linearize=False,
+                  styles=None):
+    """
+    Find the best render of at most `max_bytes`. `dpi` and `quality` are the
+    most the search will use (dpi None: full resolution first).
+
+    Returns {'data', 'bytes', 'dpi', 'quality', 'lite', 'fits', 'renders',
+    'sized', 'encoded', 'discarded'}: renders done, settings sized, derivative
+    images encoded and those deleted again. When even the lite template is
+    too big, 'fits' is False and 'data' is the lite render.
+    """
+    cached = _cached_derivatives()
+    search = BudgetSearch(content, styles, linearize)
+    dpi_steps = [dpi] + [step for step in DPI_STEPS if dpi is None or step < dpi]
+
+    setting = (dpi, quality)
+    while True:
+        data = search.render(setting)
+        if len(data) <= max_bytes or setting == 'lite':
+            break
+        search.rejected.add(setting)
+        setting = search.candidate(dpi_steps, quality, max_bytes)
+
+    lite = setting == 'lite'
+    encoded = _cached_derivatives() - cached
+    keep = set() if lite else {os.path.basename(path) for path in search.backgrounds(setting).values() if path}
+    discarded = encoded - keep
+    for name in discarded:
+        os.remove(os.path.join(CACHE_DIR, name))
+    return {
+        'data': data,
+        'bytes': len(data),
+        'dpi': None if lite else setting[0],
+        'quality': None if lite else setting[1],
+        'lite': lite,
+        'fits': len(data) <= max_bytes,
+        'renders': len(search.renders),
+        'sized': len(search.image_sizes),
+        'encoded': len(encoded),
+        'discarded': len(discarded),
+    }
+
+
+def _cached_derivatives():
+    try:
+        return set(os.listdir(CACHE_DIR))
+    except FileNotFoundError:
+        return set()
+
+
+def describe(result, max_bytes):
+    if result['lite']:
+        setting = 'lite template (no background images)'
+    else:
+        resolution = 'full resolution' if result['dpi'] is None else f"{result['dpi']} dpi"
+        setting = f"backgrounds at {resolution}, JPEG quality {result['quality']}"
+    verdict = 'fits' if result['fits'] else 'does NOT fit'
+    return (f"Size budget {max_bytes:,} bytes: {setting} -> {result['bytes']:,} bytes ({verdict}; "
+            f"{result['renders']} render(s), {result['sized']} background setting(s) sized, "
+            f"{result['encoded']} image(s) encoded, {result['discarded']} discarded)")
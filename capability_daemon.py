@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Warm render daemon for the Capability Statement PDF
+
+The daemon keeps ReportLab imported, the paragraph styles built and the
+background images decoded in memory, and renders jobs submitted over a Unix
+socket. Edit-and-preview loops then pay only for layout and writing, not
+for interpreter start-up, imports and image decoding.
+
+    python capability_daemon.py serve                 # from the repo root
+    python capability_daemon.py render --output preview.pdf [--variant NAME]
+    python capability_daemon.py ping
+    python capability_daemon.py stop
+
+Edits to generate_capability_statement.py are picked up automatically: the
+module is reloaded (ReportLab itself stays imported) when its mtime changes.
+
+Protocol: one JSON object per line in each direction.
+    request  {"cmd": "render", "output": "/abs/path.pdf", "content": {...},
+              "dpi": 150, "quality": 85}
+    response {"ok": true, "output": ..., "pages": 7, "bytes": 249493, "seconds": 0.12}
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from capability_assets import DEFAULT_DPI, DEFAULT_QUALITY
+from capability_batch import load_variants
+
+SOCKET_PATH = '.cache/capability_daemon.sock'
+GENERATOR_SOURCE = 'generate_capability_statement.py'
+
+
+class RenderState:
+    """Everything the daemon keeps warm between jobs"""
+
+    def __init__(self):
+        import generate_capability_statement
+        self.generator = generate_capability_statement
+        self.generator_mtime = os.stat(GENERATOR_SOURCE).st_mtime_ns
+        self.styles = self.generator.build_styles()
+        # Decoded images, keyed by derivative path (derivative names change with their content)
+        self.readers = {}
+
+    def _refresh_generator(self):
+        mtime = os.stat(GENERATOR_SOURCE).st_mtime_ns
+        if mtime != self.generator_mtime:
+            self.generator = importlib.reload(self.generator)
+            self.generator_mtime = mtime
+            self.styles = self.generator.build_styles()
+
+    def context(self, dpi, quality):
+        from capability_assets import prepare_backgrounds
+        from reportlab.lib.utils import ImageReader
+
+        backgrounds = {}
+        for name, path in prepare_backgrounds(dpi, quality).items():
+            if path and path not in self.readers:
+                self.readers[path] = ImageReader(path)
+            backgrounds[name] = self.readers.get(path)
+        return {'styles': self.styles, 'backgrounds': backgrounds}
+
+    def render(self, job):
+        start = time.perf_counter()
+        self._refresh_generator()
+        context = self.context(job.get('dpi', DEFAULT_DPI), job.get('quality', DEFAULT_QUALITY))
+        doc = self.generator.build_document(job['output'], job.get('content'), context=context)
+        return {
+            'ok': True,
+            'output': job['output'],
+            'pages': doc.page,
+            'bytes': os.path.getsize(job['output']),
+            'seconds': round(time.perf_counter() - start, 4),
+        }
+
+
+class RenderHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                cmd = job.get('cmd', 'render')
+                if cmd == 'ping':
+                    response = {'ok': True, 'pid': os.getpid(), 'images': len(self.server.state.readers)}
+                elif cmd == 'stop':
+                    response = {'ok': True}
+                    # shutdown() waits for serve_forever, so it must run off this thread
+                    threading.Thread(target=self.server.shutdown).start()
+                elif cmd == 'render':
+                    response = self.server.state.render(job)
+                else:
+                    response = {'ok': False, 'error': f"unknown command {cmd!r}"}
+            except Exception as e:  # report every failure to the client, keep serving
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class RenderServer(socketserver.UnixStreamServer):
+    """Serial server: ReportLab keeps module-level state, so jobs run one at a time"""
+
+    def __init__(self, path):
+        super().__init__(path, RenderHandler)
+        self.state = RenderState()
+
+
+def serve(socket_path):
+    if os.path.exists(socket_path):
+        try:
+            request(socket_path, {'cmd': 'ping'})
+        except OSError:
+            os.unlink(socket_path)  # stale socket from a crashed daemon
+        else:
+            print(f"Error: a daemon is already listening on {socket_path}")
+            sys.exit(1)
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+
+    start = time.perf_counter()
+    server = RenderServer(socket_path)
+    server.state.context(DEFAULT_DPI, DEFAULT_QUALITY)
+    print(f"Render daemon ready on {socket_path} ({time.perf_counter() - start:.2f}s warm-up)")
+    try:
+        server.serve_forever(poll_interval=0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def request(socket_path, payload):
+    """Send one job to the daemon and return its decoded response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError('daemon closed the connection without replying')
+    return json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Warm render daemon for the capability statement')
+    parser.add_argument('--socket', default=SOCKET_PATH, help=f'Unix socket path (default {SOCKET_PATH})')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('serve', help='start the daemon in the foreground')
+    sub.add_parser('ping', help='check that the daemon is running')
+    sub.add_parser('stop', help='stop the daemon')
+    render = sub.add_parser('render', help='submit a render job')
+    render.add_argument('--output', default='capability_statement.pdf')
+    render.add_argument('--variant', help='variant name from --variants')
+    render.add_argument('--variants', default='capability_variants.json')
+    render.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    render.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.socket)
+        return
+
+    if args.command == 'render':
+        payload = {'cmd': 'render', 'output': os.path.abspath(args.output),
+                   'dpi': args.dpi, 'quality': args.quality}
+        if args.variant:
+            variants = {v['name']: v for v in load_variants(args.variants)}
+            if args.variant not in variants:
+                print(f"Error: unknown variant {args.variant!r}")
+                sys.exit(1)
+            payload['content'] = {k: v for k, v in variants[args.variant].items()
+                                  if k not in ('name', 'output')}
+    else:
+        payload = {'cmd': args.command}
+
+    start = time.perf_counter()
+    try:
+        response = request(args.socket, payload)
+    except OSError as e:
+        print(f"Error: cannot reach render daemon on {args.socket} ({e}); "
+              f"start it with: python capability_daemon.py serve")
+        sys.exit(1)
+    if not response.get('ok'):
+        print(f"Error: {response.get('error')}")
+        sys.exit(1)
+
+    if args.command == 'render':
+        print(f"Rendered {response['output']}: {response['pages']} pages, {response['bytes']:,} bytes "
+              f"({response['seconds'] * 1000:.0f} ms render, "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms round trip)")
+    elif args.command == 'ping':
+        print(f"Render daemon running (pid {response['pid']}, {response['images']} images resident)")
+    else:
+        print('Render daemon stopping')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Per-section fragment cache for the Capability Statement PDF
+
+The story is split into its named sections (cover, about, construction,
+decision-science, why-together), each of which starts on a new page. Every
+section is rendered on its own into a small PDF fragment, cached in
+.cache/capability_fragments under a key made of its flowables (text and
+paragraph styles), its first page template, the background images and the
+page-drawing code. A build renders only the sections whose key changed and
+merges the fragments with pikepdf, sharing the identical background images
+and forms that every fragment carries.
+
+A full build is done instead when pikepdf is not installed, or when a
+re-rendered section no longer spans the same number of pages as in the last
+build (it overflowed onto another page, or shrank); the full build records
+the new page spans for the next run.
+
+    python generate_capability_statement.py --fragments
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from contextlib import ExitStack
+
+try:
+    import pikepdf
+except ImportError:  # optional: every build is a full build without it
+    pikepdf = None
+
+import reportlab
+
+import generate_capability_statement as gcs
+from capability_assets import DEFAULT_DPI, DEFAULT_QUALITY, file_digest, prepare_backgrounds
+
+CACHE_DIR = '.cache/capability_fragments'
+LAYOUT_FILE = 'layout.json'
+
+# Bump when the fragment format or merge step changes
+FRAGMENT_VERSION = 1
+
+
+def _describe(value):
+    """Stable text for flowable and style attributes (no object ids)"""
+    if isinstance(value, (list, tuple)):
+        return [_describe(v) for v in value]
+    return repr(value)
+
+
+def _signature(flowable):
+    """Everything about one flowable that shapes its rendering"""
+    attrs = {name: _describe(value) for name, value in sorted(vars(flowable).items())
+             if not name.startswith('_') and name not in ('style', 'frags', 'blPara', 'canv')}
+    signature = {'type': type(flowable).__name__, 'attrs': attrs}
+    style = getattr(flowable, 'style', None)
+    if style is not None:
+        signature['style'] = {name: _describe(value) for name, value in sorted(vars(style).items())
+                              if name != 'parent'}
+    return signature
+
+
+def _background_id(background):
+    """
+    Content digest of a background: a path or an ImageReader over one, or
+    None. Under --full-resolution the path is the source image itself, so
+    its name says nothing about its content.
+    """
+    path = getattr(background, 'fileName', background)
+    return file_digest(path) if path else None
+
+
+def section_key(name, flowables, first_template, backgrounds):
+    """Cache key for one rendered section"""
+    payload = {
+        'version': FRAGMENT_VERSION,
+        'reportlab': reportlab.Version,
+        'section': name,
+        'template': first_template,
+        'flowables': [_signature(f) for f in flowables],
+        'backgrounds': {k: _background_id(v) for k, v in sorted(backgrounds.items())},
+        'page_code': [inspect.getsource(fn) for fn in
+                      (gcs.fill_page, gcs.draw_cover_page, gcs.draw_content_page, gcs.make_doc_template)],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+def _first_template(index):
+    return 'cover' if index == 0 else 'content'
+
+
+def render_section(path, flowables, first_template, backgrounds):
+    """Render one section into its own PDF; returns its page count"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    doc = gcs.make_doc_template(tmp_path, first_template)
+    doc.backgrounds = backgrounds
+    doc.build(list(flowables))
+    os.replace(tmp_path, path)
+    return doc.page
+
+
+def load_layout(cache_dir=CACHE_DIR):
+    try:
+        with open(os.path.join(cache_dir, LAYOUT_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_layout(layout, cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, LAYOUT_FILE)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(layout, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def _share_xobjects(pdf):
+    """
+    Point every page at one copy of each distinct image or form XObject.
+
+    Each fragment embeds its own copy of the page backgrounds; after the
+    merge they are byte-identical, so all but the first are dropped.
+    """
+    canonical = {}
+
+    def share(xobject):
+        resources = xobject.get('/Resources')
+        if resources is not None and '/XObject' in resources:
+            for name, child in list(resources.XObject.items()):
+                resources.XObject[name] = share(child)
+        key = (xobject.stream_dict.unparse(), xobject.read_raw_bytes())
+        return canonical.setdefault(key, xobject)
+
+    for page in pdf.pages:
+        resources = page.obj.get('/Resources')
+        if resources is not None and '/XObject' in resources:
+            for name, xobject in list(resources.XObject.items()):
+                resources.XObject[name] = share(xobject)
+    pdf.remove_unreferenced_resources()
+
+
+def merge_fragments(paths, out_path, linearize=False):
+    """Concatenate fragment PDFs into `out_path`; returns the page count"""
+    merged = pikepdf.new()
+    with ExitStack() as stack:
+        # sources stay open until the save: pikepdf copies stream data lazily
+        parts = [stack.enter_context(pikepdf.open(path)) for path in paths]
+        for part in parts:
+            merged.pages.extend(part.pages)
+        merged.trailer.Info = merged.copy_foreign(parts[0].trailer.Info)
+        _share_xobjects(merged)
+        tmp_path = f'{out_path}.{os.getpid()}.tmp'
+        merged.save(tmp_path, deterministic_id=True, linearize=linearize)
+    os.replace(tmp_path, out_path)
+    return len(merged.pages)
+
+
+def full_build(pdf_path, content, context):
+    """Lay out the whole story at once; returns {section: pages} as laid out"""
+    # fresh flowables: ReportLab keeps layout state on the ones it has drawn
+    sections = gcs.build_sections(context['styles'], content)
+    doc = gcs.make_doc_template(pdf_path)
+    doc.backgrounds = context['backgrounds']
+    starts = {}
+    first = {id(flowables[0]): name for name, flowables in sections if flowables}
+
+    def after_flowable(flowable):
+        name = first.get(id(flowable))
+        if name is not None:
+            starts.setdefault(name, doc.page)
+
+    doc.afterFlowable = after_flowable
+    story = []
+    for i, (_, flowables) in enumerate(sections):
+        if i:
+            story.append(gcs.PageBreak())
+        story.extend(flowables)
+    doc.build(story)
+
+    order = [name for name, _ in sections]
+    pages = {}
+    for i, name in enumerate(order):
+        end = starts.get(order[i + 1], doc.page + 1) if i + 1 < len(order) else doc.page + 1
+        pages[name] = end - starts.get(name, end)
+    return pages
+
+
+def build_fragmented(pdf_path, content=None, context=None, dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY,
+                     linearize=False, cache_dir=CACHE_DIR):
+    """
+    Build `pdf_path` from cached section fragments, re-rendering only the
+    sections whose key changed.
+
+    Returns {'rendered': [names], 'reused': [names], 'pages': n,
+    'full_build': reason or None}.
+    """
+    if context is None:
+        context = {'styles': gcs.build_styles(), 'backgrounds': prepare_backgrounds(dpi, quality)}
+    sections = gcs.build_sections(context['styles'], content)
+    os.makedirs(cache_dir, exist_ok=True)
+    layout = load_layout(cache_dir)
+    fragments = layout.setdefault('fragments', {})  # key -> page count
+    outputs = layout.setdefault('outputs', {})      # pdf path -> {section: {'key', 'pages'}}
+    previous = outputs.get(pdf_path, {})
+
+    result = {'rendered': [], 'reused': [], 'pages': 0, 'full_build': None}
+    paths, current = [], {}
+    for i, (name, flowables) in enumerate(sections):
+        template = _first_template(i)
+        key = section_key(name, flowables, template, context['backgrounds'])
+        path = os.path.join(cache_dir, f'{key}.pdf')
+        if os.path.exists(path) and key in fragments:
+            result['reused'].append(name)
+        else:
+            fragments[key] = render_section(path, flowables, template, context['backgrounds'])
+            result['rendered'].append(name)
+        pages = fragments[key]
+        old = previous.get(name)
+        if old and old['key'] != key and old['pages'] != pages and result['full_build'] is None:
+            result['full_build'] = f"section '{name}' now spans {pages} page(s), was {old['pages']}"
+        paths.append(path)
+        current[name] = {'key': key, 'pages': pages}
+
+    if pikepdf is None:
+        result['full_build'] = 'pikepdf is not installed'
+    if result['full_build']:
+        laid_out = full_build(pdf_path, content, context)
+        for name, pages in laid_out.items():
+            current[name]['pages'] = pages
+        if linearize:
+            import capability_linearize
+            capability_linearize.linearize_file(pdf_path)
+        result['pages'] = sum(laid_out.values())
+    else:
+        result['pages'] = merge_fragments(paths, pdf_path, linearize)
+
+    outputs[pdf_path] = current
+    # Keep only the fragments some output is built from
+    live = {entry['key'] for entries in outputs.values() for entry in entries.values()}
+    for key in list(fragments):
+        if key not in live:
+            del fragments[key]
+            try:
+                os.unlink(os.path.join(cache_dir, f'{key}.pdf'))
+            except FileNotFoundError:
+                pass
+    save_layout(layout, cache_dir)
+    return result
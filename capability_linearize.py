@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Linearized ("fast web view") output for the Capability Statement PDF
+
+A linearized PDF starts with a parameter dictionary and the objects of page
+1 (the cover page, its fonts and its background image), so a browser viewer
+can show the cover after downloading the first /E bytes and fetch the other
+pages with range requests instead of waiting for the whole file.
+
+Linearizing is a post-processing step over the ReportLab output. It uses
+pikepdf (pip install pikepdf) and falls back to the qpdf command-line tool
+when pikepdf is not installed. The verifier needs neither:
+
+    python capability_linearize.py capability_statement.pdf [...]
+    python capability_linearize.py --write fast.pdf capability_statement.pdf
+"""
+
+import argparse
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# The linearization dictionary must be the first object, within the first 1024 bytes
+HEADER_SCAN_BYTES = 1024
+
+LINEARIZED_DICT_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj\s*<<(.*?)>>\s*endobj', re.DOTALL)
+INT_KEY_RE = re.compile(rb'/(Linearized|L|O|E|N|T)\s+(\d+(?:\.\d+)?)')
+HINT_RE = re.compile(rb'/H\s*\[\s*(\d+)\s+(\d+)')
+
+
+def _pikepdf():
+    """
+    The pikepdf module, or None when it is not installed. Imported on first
+    use, so importing this module stays cheap for the no-op rebuild check.
+    """
+    try:
+        import pikepdf
+    except ImportError:  # optional: the qpdf binary is used instead
+        return None
+    return pikepdf
+
+
+def available():
+    """Name of the linearizer that would be used ('pikepdf', 'qpdf') or None"""
+    if _pikepdf() is not None:
+        return 'pikepdf'
+    if shutil.which('qpdf'):
+        return 'qpdf'
+    return None
+
+
+def linearize_bytes(data):
+    """Return a linearized copy of the PDF in `data`"""
+    pikepdf = _pikepdf()
+    if pikepdf is not None:
+        out = io.BytesIO()
+        with pikepdf.open(io.BytesIO(data)) as pdf:
+            # deterministic_id keeps identical inputs producing identical bytes
+            pdf.save(out, linearize=True, deterministic_id=True)
+        return out.getvalue()
+    if shutil.which('qpdf') is None:
+        raise RuntimeError('linearizing needs pikepdf (pip install pikepdf) or the qpdf tool')
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = os.path.join(tmp, 'in.pdf'), os.path.join(tmp, 'out.pdf')
+        with open(src, 'wb') as f:
+            f.write(data)
+        result = subprocess.run(['qpdf', '--linearize', '--deterministic-id', src, dst],
+                                capture_output=True, text=True)
+        # qpdf exits 3 for warnings, with a usable output file
+        if result.returncode not in (0, 3):
+            raise RuntimeError(f"qpdf failed: {result.stderr.strip()}")
+        with open(dst, 'rb') as f:
+            return f.read()
+
+
+def linearize_file(src, dst=None):
+    """Linearize `src` into `dst` (in place when dst is None); returns the output size"""
+    with open(src, 'rb') as f:
+        data = linearize_bytes(f.read())
+    dst = dst or src
+    tmp_path = f'{dst}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, dst)
+    return len(data)
+
+
+def linearization_info(head, file_size):
+    """
+    Inspect the start of a PDF (at least HEADER_SCAN_BYTES of it).
+
+    Returns {'linearized', 'valid', 'file_size', 'first_page_bytes',
+    'pages', 'first_page_object', 'hint_offset', 'hint_length'}. A file is
+    'valid' when the dictionary's /L still equals the file size (an
+    incremental update after linearizing breaks fast web view). For other
+    files first_page_bytes is the whole file: without linearization a
+    viewer must read the cross-reference table at the end first.
+    """
+    info = {'linearized': False, 'valid': False, 'file_size': file_size,
+            'first_page_bytes': file_size, 'pages': None, 'first_page_object': None,
+            'hint_offset': None, 'hint_length': None}
+    match = LINEARIZED_DICT_RE.search(head[:HEADER_SCAN_BYTES + 256])
+    if not match or match.start() > HEADER_SCAN_BYTES or b'/Linearized' not in match.group(3):
+        return info
+    values = {key.decode(): float(value) for key, value in INT_KEY_RE.findall(match.group(3))}
+    info['linearized'] = True
+    info['valid'] = int(values.get('L', -1)) == file_size
+    if 'E' in values:
+        info['first_page_bytes'] = int(values['E'])
+    if 'N' in values:
+        info['pages'] = int(values['N'])
+    if 'O' in values:
+        info['first_page_object'] = int(values['O'])
+    hint = HINT_RE.search(match.group(3))
+    if hint:
+        info['hint_offset'], info['hint_length'] = int(hint.group(1)), int(hint.group(2))
+    return info
+
+
+def inspect_file(path):
+    """linearization_info() for a file on disk (reads only its first bytes)"""
+    with open(path, 'rb') as f:
+        head = f.read(HEADER_SCAN_BYTES + 256)
+    return linearization_info(head, os.path.getsize(path))
+
+
+def describe(path, info):
+    size = info['file_size']
+    if not info['linearized']:
+        return f"{path}: not linearized; page 1 needs the whole file ({size:,} bytes)"
+    state = 'linearized' if info['valid'] else 'linearized, but modified since (/L does not match the size)'
+    share = info['first_page_bytes'] / size if size else 0
+    return (f"{path}: {state}; page 1 needs the first {info['first_page_bytes']:,} of {size:,} bytes "
+            f"({share:.0%}), {info['pages']} page(s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check (or produce) linearized capability statement PDFs')
+    parser.add_argument('pdf', nargs='+', help='PDF file(s) to inspect')
+    parser.add_argument('--write', metavar='OUT',
+                        help='linearize the (single) input into OUT ("-" rewrites it in place)')
+    args = parser.parse_args(argv)
+
+    if args.write:
+        if len(args.pdf) != 1:
+            parser.error('--write takes exactly one input PDF')
+        out = args.pdf[0] if args.write == '-' else args.write
+        try:
+            linearize_file(args.pdf[0], out)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        args.pdf = [out]
+
+    status = 0
+    for path in args.pdf:
+        try:
+            info = inspect_file(path)
+        except OSError as e:
+            print(f"Error: {path}: {e}")
+            status = 1
+            continue
+        print(describe(path, info))
+        if not (info['linearized'] and info['valid']):
+            status = 1
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Build manifest for the Capability Statement PDF
+
+Records content hashes of everything that shapes the output (generator
+sources, background assets, render settings, ReportLab version) next to the
+hash of the PDF that was produced from them. A run whose inputs all match
+the manifest can exit immediately without importing ReportLab.
+
+Stdlib only: this module is imported before the layout stack.
+"""
+
+import hashlib
+import json
+import os
+
+from capability_assets import HERO_IMAGE, LOGO_IMAGE, SHOWCASE_IMAGE, file_digest
+
+MANIFEST_PATH = '.cache/capability_statement.manifest.json'
+
+# Python sources whose contents (story text, styles, page callbacks, image
+# recipe) determine the output
+GENERATOR_SOURCES = ['generate_capability_statement.py', 'capability_assets.py', 'capability_linearize.py',
+                     'capability_fragments.py', 'capability_budget.py']
+
+ASSET_SOURCES = [SHOWCASE_IMAGE, HERO_IMAGE, LOGO_IMAGE]
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """Return the manifest dict, or an empty one if missing or unreadable"""
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """Write the manifest atomically"""
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, manifest_path)
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def hash_inputs(previous=None):
+    """
+    Return {path: {'stat': [size, mtime_ns], 'sha256': ...}} for every input.
+
+    When a file's size and mtime match the `previous` record its stored digest
+    is reused, so an unchanged tree is checked with stat calls alone. Missing
+    files are recorded with a None digest (the build skips them too).
+    """
+    previous = previous or {}
+    inputs = {}
+    for path in GENERATOR_SOURCES + ASSET_SOURCES:
+        if not os.path.exists(path):
+            inputs[path] = {'stat': None, 'sha256': None}
+            continue
+        stat = _stat_key(path)
+        old = previous.get(path)
+        if old and old.get('stat') == stat and old.get('sha256'):
+            inputs[path] = old
+        else:
+            inputs[path] = {'stat': stat, 'sha256': file_digest(path)}
+    return inputs
+
+
+def _reportlab_version():
+    # The top-level package is tiny; platypus and pdfgen are what cost time
+    try:
+        import reportlab
+    except ImportError:
+        return None
+    return reportlab.Version
+
+
+def fingerprint(inputs, settings):
+    """Single digest over input hashes, render settings and ReportLab version"""
+    payload = {
+        'inputs': {path: entry['sha256'] for path, entry in sorted(inputs.items())},
+        'settings': settings,
+        'reportlab': _reportlab_version(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_up_to_date(pdf_path, settings, manifest_path=MANIFEST_PATH):
+    """True when `pdf_path` was built from exactly the current inputs and settings"""
+    entry = load_manifest(manifest_path).get(pdf_path)
+    if not entry or not os.path.exists(pdf_path):
+        return False
+    # The output itself must be the file we produced, not a hand-edited copy
+    if entry.get('output_stat') != _stat_key(pdf_path):
+        return False
+    inputs = hash_inputs(entry.get('inputs'))
+    return entry.get('fingerprint') == fingerprint(inputs, settings)
+
+
+def record_build(pdf_path, settings, manifest_path=MANIFEST_PATH):
+    """
+    Record the inputs and output of a finished build.
+
+    Returns the output's sha256, which doubles as a stable ETag because the
+    PDF is rendered with ReportLab's invariant mode.
+    """
+    manifest = load_manifest(manifest_path)
+    previous = manifest.get(pdf_path, {})
+    inputs = hash_inputs(previous.get('inputs'))
+    output_sha256 = file_digest(pdf_path)
+    manifest[pdf_path] = {
+        'fingerprint': fingerprint(inputs, settings),
+        'inputs': inputs,
+        'settings': settings,
+        'output_sha256': output_sha256,
+        'output_size': os.path.getsize(pdf_path),
+        'output_stat': _stat_key(pdf_path),
+    }
+    save_manifest(manifest, manifest_path)
+    return output_sha256
+
+
+def output_etag(pdf_path, manifest_path=MANIFEST_PATH):
+    """Quoted ETag for a built PDF, taken from the manifest (None if unknown)"""
+    entry = load_manifest(manifest_path).get(pdf_path)
+    if not entry:
+        return None
+    return f'"{entry["output_sha256"][:32]}"'
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Serve rendered Capability Statements over HTTP from an in-memory LRU cache
+
+    GET /capability_statement.pdf?variant=<name>&dpi=<n>&quality=<n>
+
+All parameters are optional (default content, default DPI/quality). dpi and
+quality are snapped to the nearest of a few fixed steps (DPI_STEPS,
+QUALITY_STEPS), so clients cannot make the server prepare and keep render
+contexts and image derivatives for arbitrarily many settings. Rendered
+PDFs are kept in a size-bounded LRU cache keyed by the variant parameters, so
+repeated downloads cost neither a re-render nor a disk round-trip. Responses
+carry a content-hash ETag and honour If-None-Match with 304 Not Modified.
+
+    GET /stats      cache hit/miss counters as JSON
+
+Usage:
+    python capability_server.py [--port 8000] [--variants capability_variants.json]
+                                [--cache-mb 64]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from capability_assets import DEFAULT_DPI, DEFAULT_QUALITY
+from capability_batch import load_variants
+
+DEFAULT_VARIANTS = 'capability_variants.json'
+
+# Sanity limits for query parameters
+DPI_RANGE = (36, 600)
+QUALITY_RANGE = (10, 95)
+
+# Settings actually rendered: requests are snapped to the nearest step
+DPI_STEPS = (72, 100, 150, 200, 300)
+QUALITY_STEPS = (50, 70, 85, 95)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its byte values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def peek(self, key):
+        """Like get(), but neither counted as a hit or miss nor moved to the end"""
+        with self._lock:
+            return self._items.get(key)
+
+    def put(self, key, data, etag):
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key)[0])
+            if len(data) > self.max_bytes:
+                return
+            self._items[key] = (data, etag)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (old, _) = self._items.popitem(last=False)
+                self.size -= len(old)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class StatementRenderer:
+    """Renders statements on demand, caching PDFs and per-setting render contexts"""
+
+    def __init__(self, variants, cache):
+        self.variants = {v['name']: v for v in variants}
+        self.cache = cache
+        self._contexts = {}  # (dpi, quality) -> context; at most len(DPI_STEPS) * len(QUALITY_STEPS)
+        # ReportLab keeps module-level state, so renders are serialised
+        self._render_lock = threading.Lock()
+
+    def get(self, variant, dpi, quality):
+        """Return (pdf_bytes, etag), rendering on a cache miss"""
+        key = (variant, dpi, quality)
+        item = self.cache.get(key)
+        if item is not None:
+            return item
+        with self._render_lock:
+            # Another request may have rendered it while we waited (this
+            # request was already counted as a miss)
+            item = self.cache.peek(key)
+            if item is not None:
+                return item
+            data = self._render(variant, dpi, quality)
+            etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+            self.cache.put(key, data, etag)
+            return data, etag
+
+    def _render(self, variant, dpi, quality):
+        from generate_capability_statement import load_render_context, render_capability_statement
+
+        context = self._contexts.get((dpi, quality))
+        if context is None:
+            context = self._contexts[(dpi, quality)] = load_render_context(dpi, quality)
+        content = None
+        if variant is not None:
+            content = {k: v for k, v in self.variants[variant].items() if k not in ('name', 'output')}
+        return render_capability_statement(content=content, context=context)
+
+
+def _int_param(query, name, default, bounds, steps):
+    """The parameter snapped to the nearest of `steps` (the default when absent)"""
+    values = query.get(name)
+    if not values:
+        return default
+    value = int(values[0])
+    if not bounds[0] <= value <= bounds[1]:
+        raise ValueError(f"{name} must be between {bounds[0]} and {bounds[1]}")
+    return min(steps, key=lambda step: (abs(step - value), step))
+
+
+class StatementHandler(BaseHTTPRequestHandler):
+    server_version = 'BlackWaveStatement/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body):
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            body = json.dumps(self.server.renderer.cache.stats()).encode('utf-8')
+            self._send(HTTPStatus.OK, body, 'application/json', send_body=send_body)
+            return
+        if url.path != '/capability_statement.pdf':
+            self._send(HTTPStatus.NOT_FOUND, b'not found\n', 'text/plain', send_body=send_body)
+            return
+
+        query = parse_qs(url.query)
+        variant = query.get('variant', [None])[0]
+        try:
+            dpi = _int_param(query, 'dpi', DEFAULT_DPI, DPI_RANGE, DPI_STEPS)
+            quality = _int_param(query, 'quality', DEFAULT_QUALITY, QUALITY_RANGE, QUALITY_STEPS)
+            if variant is not None and variant not in self.server.renderer.variants:
+                raise ValueError(f"unknown variant {variant!r}")
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, f"{e}\n".encode('utf-8'), 'text/plain', send_body=send_body)
+            return
+
+        data, etag = self.server.renderer.get(variant, dpi, quality)
+        tags = parse_etags(self.headers.get('If-None-Match', ''))
+        if etag in tags or '*' in tags:
+            self._send(HTTPStatus.NOT_MODIFIED, b'', None, etag=etag, send_body=False)
+            return
+        self._send(HTTPStatus.OK, data, 'application/pdf', etag=etag, send_body=send_body)
+
+    def _send(self, status, body, content_type, etag=None, send_body=True):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+            # Cached copies may be reused, but only after revalidating the ETag
+            self.send_header('Cache-Control', 'no-cache')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+
+def parse_etags(header):
+    """Entity tags listed in an If-None-Match header (weak tags compare equal)"""
+    return {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve rendered capability statements over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--variants', default=DEFAULT_VARIANTS,
+                        help='JSON variant definitions (optional)')
+    parser.add_argument('--cache-mb', type=float, default=64, help='LRU cache size in MiB')
+    args = parser.parse_args(argv)
+
+    variants = []
+    if os.path.exists(args.variants):
+        try:
+            variants = load_variants(args.variants)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    server = ThreadingHTTPServer((args.host, args.port), StatementHandler)
+    server.renderer = StatementRenderer(variants, LRUCache(int(args.cache_mb * 2**20)))
+    print(f"Serving capability statements on http://{args.host}:{args.port}/capability_statement.pdf "
+          f"({len(variants)} variants)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Layout instrumentation for the Capability Statement build
+
+Opt-in timing of a ReportLab doc.build(): every flowable's wrap, split and
+drawOn calls, the page template callbacks (onPage / onPageEnd, where the
+background images are drawn), each page from begin to end and the final
+write of the PDF. Spans are exported as Chrome trace-event JSON (open it in
+chrome://tracing or https://ui.perfetto.dev) and summarised as a table of
+the slowest flowables.
+
+    python generate_capability_statement.py --trace .cache/trace.json
+"""
+
+import json
+import os
+import time
+from collections import defaultdict
+
+# Rows in the text summary
+SUMMARY_ROWS = 15
+
+# Characters of paragraph text kept in flowable labels
+LABEL_TEXT = 48
+
+
+def _label(flowable):
+    text = getattr(flowable, 'text', None)
+    style = getattr(flowable, 'style', None)
+    label = type(flowable).__name__
+    if text:
+        text = ' '.join(str(text).split())
+        label += f' "{text[:LABEL_TEXT]}{"..." if len(text) > LABEL_TEXT else ""}"'
+    if style is not None and getattr(style, 'name', None):
+        label += f' [{style.name}]'
+    return label
+
+
+class LayoutTracer:
+    """Collects timing spans from one instrumented doc.build()"""
+
+    def __init__(self):
+        self.events = []
+        self.flowables = {}  # flowable number -> label
+        self.totals = defaultdict(lambda: defaultdict(float))  # number -> phase -> seconds
+        self.calls = defaultdict(int)
+        self._doc = None
+        self._page_start = None
+        self._origin = time.perf_counter_ns()
+
+    def _span(self, name, category, start, args=None):
+        end = time.perf_counter_ns()
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': 1,
+            'ts': (start - self._origin) / 1000, 'dur': (end - start) / 1000, 'args': args or {},
+        })
+        return (end - start) / 1e9
+
+    def _timed(self, fn, name, category, args_fn=None):
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._span(name, category, start, args_fn() if args_fn else None)
+        return timed
+
+    # ------------------------------------------------------------ flowables
+
+    def _instrument_flowable(self, flowable, number, label):
+        """Time this flowable's wrap, split and drawOn (split parts are instrumented too)"""
+        if getattr(flowable, '_traced', False):
+            return flowable
+        tracer = self
+        wrap, split, draw_on = flowable.wrap, flowable.split, flowable.drawOn
+
+        def traced(phase, fn, post=None):
+            def call(*args, **kwargs):
+                start = time.perf_counter_ns()
+                result = fn(*args, **kwargs)
+                if post is not None:
+                    result = post(result)
+                seconds = tracer._span(f'{phase} {label}', phase, start,
+                                       {'flowable': number, 'page': tracer._page()})
+                tracer.totals[number][phase] += seconds
+                tracer.calls[number] += 1
+                return result
+            return call
+
+        def instrument_parts(parts):
+            return [self._instrument_flowable(part, number, label) for part in parts]
+
+        flowable.wrap = traced('wrap', wrap)
+        flowable.split = traced('split', split, instrument_parts)
+        flowable.drawOn = traced('draw', draw_on)
+        flowable._traced = True
+        return flowable
+
+    def _page(self):
+        return getattr(self._doc, 'page', None)
+
+    # ------------------------------------------------------------ document
+
+    def instrument(self, doc, story):
+        """Hook `doc` and every flowable of `story`; returns the story to build"""
+        self._doc = doc
+        for number, flowable in enumerate(story):
+            label = _label(flowable)
+            self.flowables[number] = label
+            self._instrument_flowable(flowable, number, label)
+
+        for template in doc.pageTemplates:
+            for hook in ('onPage', 'onPageEnd'):
+                callback = getattr(template, hook)
+                name = f"{hook} {template.id} ({getattr(callback, '__name__', 'callback')})"
+                setattr(template, hook, self._timed(callback, name, 'callback',
+                                                    lambda: {'page': self._page()}))
+
+        page_begin, page_end = doc.handle_pageBegin, doc.handle_pageEnd
+
+        def handle_page_begin():
+            self._page_start = time.perf_counter_ns()
+            page_begin()
+
+        def handle_page_end():
+            page = self._page()
+            page_end()
+            if self._page_start is not None:
+                self._span(f'page {page}', 'page', self._page_start, {'page': page})
+                self._page_start = None
+
+        doc.handle_pageBegin = handle_page_begin
+        doc.handle_pageEnd = handle_page_end
+
+        start_build = doc._startBuild
+
+        def traced_start_build(*args, **kwargs):
+            start_build(*args, **kwargs)
+            canv = doc.canv
+            canv.showPage = self._timed(canv.showPage, 'showPage', 'output', lambda: {'page': self._page()})
+            canv.save = self._timed(canv.save, 'write PDF', 'output')
+
+        doc._startBuild = traced_start_build
+        return story
+
+    # ------------------------------------------------------------ reports
+
+    def chrome_trace(self):
+        """The spans as a Chrome trace-event document"""
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': 1,
+                 'args': {'name': 'doc.build'}}]
+        return {'traceEvents': meta + sorted(self.events, key=lambda e: e['ts']),
+                'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+            f.write('\n')
+
+    def category_totals(self):
+        """Seconds per category, counting only outermost spans"""
+        totals = defaultdict(float)
+        spans = sorted(self.events, key=lambda e: (e['ts'], -e['dur']))
+        open_until = []
+        for event in spans:
+            while open_until and open_until[-1] <= event['ts']:
+                open_until.pop()
+            if event['cat'] != 'page' and not open_until:
+                totals[event['cat']] += event['dur'] / 1e6
+            if event['cat'] != 'page':
+                open_until.append(event['ts'] + event['dur'])
+        return dict(totals)
+
+    def summary(self, rows=SUMMARY_ROWS):
+        """Text table of the slowest flowables plus per-category and per-page totals"""
+        lines = [f"{'flowable':72s} {'wrap ms':>8s} {'split ms':>8s} {'draw ms':>8s} {'calls':>5s}"]
+        ranked = sorted(self.totals.items(), key=lambda item: -sum(item[1].values()))
+        for number, phases in ranked[:rows]:
+            label = f"#{number} {self.flowables[number]}"
+            lines.append(f"{label[:72]:72s} {phases['wrap'] * 1000:8.2f} {phases['split'] * 1000:8.2f} "
+                         f"{phases['draw'] * 1000:8.2f} {self.calls[number]:5d}")
+        pages = [e for e in self.events if e['cat'] == 'page']
+        if pages:
+            lines.append('')
+            lines.append('pages: ' + ', '.join(f"{e['args']['page']}: {e['dur'] / 1000:.1f} ms" for e in pages))
+        lines.append('time by category (outermost spans): ' + ', '.join(
+            f"{cat} {seconds * 1000:.1f} ms" for cat, seconds in sorted(self.category_totals().items(),
+                                                                       key=lambda item: -item[1])))
+        return '\n'.join(lines)
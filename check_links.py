@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import re
+import sys
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from generate_toc import MarkdownIndex, collect_files, file_digest, slugify, stat_key, unique_slugs
+
+#====================================================================================
+# Anchor index and link checker for the markdown documents and index.html
+#====================================================================================
+# $ python check_links.py                        # Documents/, README.md, index.html
+# $ python check_links.py Documents/ --duplicates  # also list duplicate anchors and headings
+#
+# The index maps each file to its anchors and its links:
+#   - markdown: heading anchors as GitHub numbers them (slugify, with -1, -2, ...
+#     for repeated headings, as generate_toc.py writes them in TOCs) plus
+#     id="..."/name="..." in raw HTML, outside fenced blocks
+#   - HTML: every id="..." (and <a name="...">), outside comments
+#   - links: [text](target) in markdown (outside fences and code spans),
+#     href="..." in HTML
+#   - repeated headings: headings whose slug repeats ("Files Touched" in every
+#     release), with the line and numbered anchor of each
+# Each anchor keeps the lines it is defined on, so a link is checked with one
+# dict lookup. A link is broken when its file or anchor does not exist, and
+# ambiguous when its anchor is defined more than once (two elements with the
+# same id or name, or an id equal to a heading anchor): browsers jump to the
+# first one. A link whose text and anchor both name a repeated heading
+# ([Files Touched](#files-touched)) is ambiguous too: it reaches the first of
+# them, whichever one the author meant.
+#
+# The index persists in .cache/anchor_index.json. Files whose size and mtime
+# are unchanged are not read; files whose content hash is unchanged are not
+# parsed; the rest are parsed in parallel.
+#====================================================================================
+
+DEFAULT_PATHS = ("Documents", "README.md", "index.html")
+INCLUDE = ("*.md", "*.html")
+
+INDEX_PATH = ".cache/anchor_index.json"
+
+# Bump when the anchors or links extracted from the same input change
+INDEX_VERSION = 4
+
+MD_LINK_RE = re.compile(r"""!?\[((?:[^\]\\]|\\.)*)\]\(\s*<?([^)\s>]+)>?(?:\s+["'][^"']*["'])?\s*\)""")
+CODE_SPAN_RE = re.compile(r"(`+).+?\1")
+ID_ATTR_RE = re.compile(r"""\sid\s*=\s*["']([^"']+)["']|<a\b[^>]*?\sname\s*=\s*["']([^"']+)["']""",
+                        flags=re.IGNORECASE)
+HREF_ATTR_RE = re.compile(r"""\shref\s*=\s*["']([^"']*)["']""", flags=re.IGNORECASE)
+COMMENT_RE = re.compile(r"<!--.*?-->", flags=re.DOTALL)
+SCHEME_RE = re.compile(r"^[a-zA-Z][\w+.-]*:|^//")
+
+def _blank(match):
+    """Replace a match with spaces, keeping its line breaks (so line numbers stay put)"""
+    return re.sub(r"[^\n]", " ", match.group(0))
+
+def _add(anchors, anchor, line):
+    anchors.setdefault(anchor, []).append(line)
+
+def scan_markdown(text):
+    """
+    ({anchor: [line, ...]}, [[line, target, text], ...], {slug: [[line, anchor, title], ...]})
+    of a markdown document: its anchors, links and repeated headings; lines are 1-based
+    """
+    index = MarkdownIndex.from_text(text)
+    anchors = {}
+    headings = {}
+    for line, title, slug, anchor in zip(index.heading_lines, index.titles, index.slugs,
+                                         unique_slugs(index.slugs)):
+        _add(anchors, anchor, line + 1)
+        headings.setdefault(slug, []).append([line + 1, anchor, title])
+    links = []
+    text = COMMENT_RE.sub(_blank, text)
+    for i, line in enumerate(text.splitlines()):
+        if index.is_fenced(i):
+            continue
+        line = CODE_SPAN_RE.sub(_blank, line)
+        for m in ID_ATTR_RE.finditer(line):
+            _add(anchors, m.group(1) or m.group(2), i + 1)
+        for link_text, target in MD_LINK_RE.findall(line):
+            links.append([i + 1, target, link_text])
+    repeated = {slug: found for slug, found in headings.items() if len(found) > 1}
+    return anchors, links, repeated
+
+def scan_html(text):
+    """({anchor: [line, ...]}, [[line, target, ""], ...], {}) of an HTML page; lines are 1-based"""
+    text = COMMENT_RE.sub(_blank, text)
+    line_starts = [0] + [m.end() for m in re.finditer("\n", text)]
+    anchors = {}
+    for m in ID_ATTR_RE.finditer(text):
+        _add(anchors, m.group(1) or m.group(2), bisect_right(line_starts, m.start()))
+    links = [[bisect_right(line_starts, m.start()), m.group(1), ""] for m in HREF_ATTR_RE.finditer(text)]
+    return anchors, links, {}
+
+def _scan_file(job):
+    """Pool worker: index one file; returns (key, entry or None, error or None)"""
+    key, path = job
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return key, None, f"{type(e).__name__}: {e}"
+    scan = scan_html if path.lower().endswith((".html", ".htm")) else scan_markdown
+    anchors, links, repeated = scan(text)
+    entry = {"stat": stat_key(path), "sha256": file_digest(path), "anchors": anchors, "links": links,
+             "repeated_headings": repeated}
+    return key, entry, None
+
+def load_index(index_path):
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("files", {})
+
+def save_index(index_path, files):
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+def _key(path):
+    """Index key of a file: its path relative to the working directory, with '/'"""
+    return os.path.relpath(path).replace(os.sep, "/")
+
+def build_index(paths=DEFAULT_PATHS, jobs=None, index_path=INDEX_PATH):
+    """
+    Bring the anchor index up to date for every markdown/HTML file under
+    `paths`. Returns (files, stats) with files = {key: entry} and stats =
+    {'parsed', 'hashed', 'unchanged'} counts.
+    """
+    cached = load_index(index_path) if index_path else {}
+    files = {}
+    stats = {"parsed": 0, "hashed": 0, "unchanged": 0}
+    todo = []
+    for path in collect_files(paths, INCLUDE):
+        key = _key(path)
+        entry = cached.get(key)
+        if entry:
+            stat = stat_key(path)
+            if entry["stat"] == stat:
+                files[key] = entry
+                stats["unchanged"] += 1
+                continue
+            if entry["sha256"] == file_digest(path):
+                entry["stat"] = stat  # touched but unchanged
+                files[key] = entry
+                stats["hashed"] += 1
+                continue
+        todo.append((key, str(path)))
+
+    if len(todo) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(_scan_file, todo, chunksize=max(1, len(todo) // 64)))
+    else:
+        outcomes = [_scan_file(job) for job in todo]
+    for key, entry, error in outcomes:
+        if error:
+            print(f"Error: {key}: {error}")
+            continue
+        files[key] = entry
+        stats["parsed"] += 1
+
+    if index_path:
+        # keep the entries of files outside `paths` for runs over other paths
+        kept = {key: entry for key, entry in cached.items() if key not in files and os.path.exists(key)}
+        save_index(index_path, {**kept, **files})
+    return files, stats
+
+def resolve(files, source, target, text=""):
+    """
+    Check one link of `source` (`text` is the link text, "" for HTML).
+    Returns None when it resolves, else ('broken' or 'ambiguous', message).
+    """
+    if not target or target == "#" or SCHEME_RE.match(target):
+        return None
+    parts = urlsplit(target)
+    anchor = unquote(parts.fragment)
+    if parts.path:
+        path = os.path.normpath(os.path.join(os.path.dirname(source), unquote(parts.path)))
+        key = _key(path)
+        if key not in files and not os.path.exists(path):
+            return "broken", f"{target}: {key} does not exist"
+    else:
+        key = source
+    if not anchor:
+        return None
+    entry = files.get(key)
+    if entry is None:
+        return None  # not an indexed document (a PDF, an image, a file outside the paths checked)
+    lines = entry["anchors"].get(anchor)
+    if lines is None:
+        return "broken", f"{target}: no anchor #{anchor} in {key}"
+    if len(lines) > 1:
+        return "ambiguous", (f"{target}: #{anchor} is defined {len(lines)} times in {key} "
+                             f"(lines {', '.join(map(str, lines))}); the link goes to the first")
+    repeated = entry["repeated_headings"].get(anchor)
+    if repeated and slugify(text) == anchor:
+        others = ", ".join(f"#{other}" for _, other, _ in repeated[1:])
+        return "ambiguous", (f"{target}: {len(repeated)} headings in {key} match '{text}' "
+                             f"(lines {', '.join(str(line) for line, _, _ in repeated)}); "
+                             f"the link goes to the first, the others are {others}")
+    return None
+
+def check_links(files):
+    """[(source, line, kind, message)] for every broken or ambiguous link"""
+    problems = []
+    for source, entry in sorted(files.items()):
+        for line, target, text in entry["links"]:
+            outcome = resolve(files, source, target, text)
+            if outcome:
+                problems.append((source, line, *outcome))
+    return problems
+
+def duplicate_anchors(files):
+    """[(key, anchor, lines)] for every anchor defined more than once"""
+    return [(key, anchor, lines) for key, entry in sorted(files.items())
+            for anchor, lines in sorted(entry["anchors"].items()) if len(lines) > 1]
+
+def repeated_headings(files):
+    """[(key, title, [[line, anchor, title], ...])] for every heading slug repeated in a file (title of the first)"""
+    return [(key, found[0][2], found) for key, entry in sorted(files.items())
+            for _, found in sorted(entry["repeated_headings"].items())]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the links and anchors of the markdown documents and HTML pages.")
+    parser.add_argument("paths", nargs="*", metavar="PATH",
+                        help=f"files or directories (default: {' '.join(DEFAULT_PATHS)})")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="also list every anchor defined more than once and every "
+                             "repeated heading title, linked or not")
+    parser.add_argument("--no-cache", action="store_true", help=f"ignore and do not update {INDEX_PATH}")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or [p for p in DEFAULT_PATHS if Path(p).exists()]
+    missing = [p for p in paths if not Path(p).exists()]
+    if missing:
+        print(f"Error: {missing[0]} not found")
+        sys.exit(1)
+
+    files, stats = build_index(paths, args.jobs, None if args.no_cache else INDEX_PATH)
+    problems = check_links(files)
+    for source, line, kind, message in problems:
+        print(f"{source}:{line}: {kind} link {message}")
+    if args.duplicates:
+        for key, anchor, lines in duplicate_anchors(files):
+            print(f"{key}: duplicate anchor #{anchor} (lines {', '.join(map(str, lines))})")
+        for key, title, found in repeated_headings(files):
+            places = ", ".join(f"line {line} #{anchor}" for line, anchor, _ in found)
+            print(f"{key}: repeated heading '{title}' ({places})")
+
+    links = sum(len(entry["links"]) for entry in files.values())
+    anchors = sum(len(entry["anchors"]) for entry in files.values())
+    broken = sum(kind == "broken" for _, _, kind, _ in problems)
+    print(f"{links} link(s) checked against {anchors} anchor(s) in {len(files)} file(s) "
+          f"({stats['parsed']} parsed, {stats['hashed'] + stats['unchanged']} from the index): "
+          f"{broken} broken, {len(problems) - broken} ambiguous")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
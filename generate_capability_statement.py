@@ -3,6 +3,73 @@
 Generate Black Wave Capability Statement PDF
 """
 
+import argparse
+import io
+import os
+import sys
+
+import capability_manifest
+from capability_assets import (
+    DEFAULT_DPI,
+    DEFAULT_QUALITY,
+    HERO_IMAGE,
+    LOGO_IMAGE,
+    SHOWCASE_IMAGE,
+    prepare_backgrounds,
+)
+
+def parse_max_bytes(text):
+    """--max-bytes value in bytes (capability_budget is only imported when the flag is given)"""
+    import capability_budget
+    return capability_budget.parse_size(text)
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description='Generate the Black Wave Capability Statement PDF')
+    parser.add_argument('--output', default='capability_statement.pdf', help='output PDF path')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help=f'background image resolution (default {DEFAULT_DPI})')
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY,
+                        help=f'JPEG quality for background images (default {DEFAULT_QUALITY})')
+    parser.add_argument('--full-resolution', action='store_true',
+                        help='draw the original background images without downscaling')
+    parser.add_argument('--linearize', action='store_true',
+                        help='write a linearized ("fast web view") PDF whose cover page shows '
+                             'before the whole file has downloaded (needs pikepdf or qpdf)')
+    parser.add_argument('--fragments', action='store_true',
+                        help='re-render only the sections whose content changed and merge cached '
+                             'per-section fragments (needs pikepdf; otherwise a full build)')
+    parser.add_argument('--trace', metavar='JSON',
+                        help='time the layout (wrap/split/draw per flowable, page callbacks, output) '
+                             'and write a Chrome trace to JSON; implies a full rebuild')
+    parser.add_argument('--lite', action='store_true',
+                        help='lite template: plain dark pages without background images')
+    parser.add_argument('--max-bytes', type=parse_max_bytes, metavar='SIZE',
+                        help='fit the PDF in SIZE bytes (e.g. 500K, 2MB): search background resolution '
+                             'and JPEG quality up to --dpi/--quality, falling back to the lite template')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild even if the build manifest says the PDF is current')
+    return parser.parse_args(argv)
+
+def build_settings(args):
+    """Render settings recorded in the build manifest"""
+    return {
+        'dpi': None if args.full_resolution else args.dpi,
+        'quality': args.quality,
+        'linearize': args.linearize,
+        'fragments': args.fragments,
+        'lite': args.lite,
+        'max_bytes': args.max_bytes,
+    }
+
+if __name__ == '__main__':
+    # Consult the build manifest before importing the ReportLab layout stack,
+    # so a run with nothing to do finishes in milliseconds
+    _args = parse_args()
+    if not (_args.force or _args.trace) and capability_manifest.is_up_to_date(_args.output, build_settings(_args)):
+        print(f"Capability statement PDF up to date: {_args.output}")
+        sys.exit(0)
+
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -13,7 +80,11 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
-import os
+from reportlab import rl_config
+
+# Embed images as binary streams: ASCII85 inflates them by 25% and, without
+# the C accelerator, its pure-Python encoder dominates the render time
+rl_config.useA85 = 0
 
 # Color scheme matching website
 COLOR_BG = HexColor('#050505')
@@ -21,162 +92,186 @@ COLOR_TEXT = HexColor('#e6ddc7')
 COLOR_ACCENT = HexColor('#c89a3c')
 COLOR_MUTED = HexColor('#aca08a')
 
-# Image paths
-SHOWCASE_IMAGE = 'assets/img/BW_website-service_showcase_2.png'
-HERO_IMAGE = 'assets/img/BW_website-hero.png'
-LOGO_IMAGE = 'assets/img/Final_Logo.png'
+def fill_page(canvas_obj):
+    """Plain dark page for the lite template (no background images)"""
+    width, height = letter
+    canvas_obj.saveState()
+    canvas_obj.setFillColor(COLOR_BG)
+    canvas_obj.rect(0, 0, width, height, stroke=0, fill=1)
+    canvas_obj.restoreState()
 
 def draw_cover_page(canvas_obj, doc):
     """Draw the showcase image as full-page background for page 1"""
     width, height = letter
+    cover = doc.backgrounds.get('cover')
     
-    if os.path.exists(SHOWCASE_IMAGE):
+    if not cover:
+        # lite template: the light text still needs a dark page
+        fill_page(canvas_obj)
+    else:
         canvas_obj.saveState()
         # Draw image to fill entire page
-        canvas_obj.drawImage(SHOWCASE_IMAGE, 0, 0, width=width, height=height, 
+        canvas_obj.drawImage(cover, 0, 0, width=width, height=height, 
                            preserveAspectRatio=True, mask='auto')
         canvas_obj.restoreState()
 
+# Name of the form XObject holding the flattened content-page background
+CONTENT_BACKGROUND_FORM = 'contentBackground'
+
 def draw_content_page(canvas_obj, doc):
-    """Draw hero background and logo for pages 2+"""
-    width, height = letter
-    
-    canvas_obj.saveState()
-    
-    # Draw hero image as background with dark overlay
-    if os.path.exists(HERO_IMAGE):
-        canvas_obj.drawImage(HERO_IMAGE, 0, 0, width=width, height=height, 
-                           preserveAspectRatio=True, mask='auto')
-        # Add dark overlay to make text readable
-        canvas_obj.setFillColor(HexColor('#000000'))
-        canvas_obj.setFillAlpha(0.85)
-        canvas_obj.rect(0, 0, width, height, fill=1, stroke=0)
-    
-    # Draw logo in top left corner
-    if os.path.exists(LOGO_IMAGE):
-        logo_size = 1.2 * inch
-        logo_x = 0.5 * inch
-        logo_y = height - 0.5 * inch - logo_size
-        canvas_obj.drawImage(LOGO_IMAGE, logo_x, logo_y, width=logo_size, height=logo_size, 
-                           preserveAspectRatio=True, mask='auto')
-    
-    canvas_obj.restoreState()
+    """
+    Draw the content-page background for pages 2+
 
-def create_capability_statement():
-    """Generate the Black Wave Capability Statement PDF"""
-    
-    # Create PDF document with custom page templates
-    pdf_path = 'capability_statement.pdf'
-    
-    # Create frames for content (will be set after doc creation)
-    left_margin = 0.75*inch
-    right_margin = 0.75*inch
-    top_margin = 0.75*inch
-    bottom_margin = 0.75*inch
+    The hero, dark overlay and logo are pre-composited into one image by
+    capability_assets; it is registered once per document as a form XObject
+    and every content page references that form.
+    """
     width, height = letter
+    background = doc.backgrounds.get('content')
+    if not background:
+        fill_page(canvas_obj)
+        return
     
-    frame = Frame(
-        left_margin,
-        bottom_margin,
-        width - left_margin - right_margin,
-        height - top_margin - bottom_margin,
-        leftPadding=0,
-        bottomPadding=0,
-        rightPadding=0,
-        topPadding=0,
-        id='normal'
-    )
-    
-    # Create page templates
-    cover_template = PageTemplate(id='cover', frames=[frame], onPage=draw_cover_page)
-    content_template = PageTemplate(id='content', frames=[frame], onPage=draw_content_page)
+    if not canvas_obj.hasForm(CONTENT_BACKGROUND_FORM):
+        canvas_obj.beginForm(CONTENT_BACKGROUND_FORM)
+        canvas_obj.drawImage(background, 0, 0, width=width, height=height)
+        canvas_obj.endForm()
     
-    doc = BaseDocTemplate(
-        pdf_path,
-        pagesize=letter,
-        rightMargin=right_margin,
-        leftMargin=left_margin,
-        topMargin=top_margin,
-        bottomMargin=bottom_margin,
-        pageTemplates=[cover_template, content_template]
-    )
-    
-    # Container for the 'Flowable' objects
-    story = []
-    
-    # Define styles
+    canvas_obj.doForm(CONTENT_BACKGROUND_FORM)
+
+# ============ Variable content ============
+# Everything a tailored (agency-specific) statement may override. Variant
+# definitions for capability_batch.py replace any of these keys.
+DEFAULT_CONTENT = {
+    'differentiators': [
+        "Service-Disabled Veteran-Owned Small Business (SDVOSB)",
+        "Experience supporting federal, DoD, and research environments",
+        "Hands-on construction background plus advanced analytics expertise",
+        "25+ years of mission-aligned delivery",
+    ],
+    'construction_capabilities': [
+        "Construction management services",
+        "Site work and civil construction",
+        "Infrastructure, utilities, and ISP/OSP",
+        "Mission-critical and secure facilities",
+        "General construction and renovations",
+        "Tenant improvements and build-outs",
+    ],
+    'construction_highlights': [
+        {
+            'title': "Renovation of Mission Support Facility",
+            'client': "Federal Agency",
+            'role': "Prime Contractor",
+            'summary': "Multi-phase renovation of an active mission support facility, including interior build-out "
+                       "and systems coordination. Maintained operations with minimal downtime and delivered on time "
+                       "despite constrained access windows.",
+        },
+        {
+            'title': "Secure Operations Center Build-Out",
+            'client': "DoD Installation",
+            'role': "Subcontractor",
+            'summary': "Build-out of a secure operations space with specialized mechanical, electrical, and IT "
+                       "infrastructure requirements. Coordinated with multiple trades and security stakeholders, "
+                       "meeting strict commissioning and acceptance milestones.",
+        },
+    ],
+    'decision_capabilities': [
+        "Strategic resource allocation optimization",
+        "Efficient operational & logistics planning",
+        "Executive dashboards & scenario analysis",
+        "Work packaging and phasing optimization",
+        "AI-enabled planning for capital projects",
+        "GenAI-supported workflows for project analysis",
+    ],
+    'decision_highlights': [
+        {
+            'title': "AI-Enabled Planning for Capital Projects",
+            'client': "Federal Program Office",
+            'role': "Decision Science Advisor",
+            'summary': "Developed GenAI-supported workflows for analyzing project options, schedule risk, and "
+                       "resource trade-offs. Reduced planning cycle time by approximately 40% and created reusable "
+                       "decision frameworks for future projects.",
+        },
+        {
+            'title': "Logistics & Work Packaging Optimization",
+            'client': "DoD Facilities Portfolio",
+            'role': "Analytics Lead",
+            'summary': "Applied analytics and GenAI tooling to evaluate work packaging, staging, and material "
+                       "flows across multiple sites. Improved material utilization and reduced idle time, enabling "
+                       "clearer communication to field teams and leadership.",
+        },
+    ],
+    'contact': {
+        'text': "For more information about Black Wave's capabilities or to discuss your project needs, "
+                "please visit our website or contact us directly.",
+        'lines': [],
+        'designation': "Service-Disabled Veteran-Owned Small Business (SDVOSB)",
+    },
+}
+
+def build_styles():
+    """Build the paragraph styles used by the story (shared across renders)"""
     styles = getSampleStyleSheet()
     
     # Custom styles with better contrast for overlay backgrounds
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=28,
-        textColor=COLOR_ACCENT,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold',
-        backColor=HexColor('#000000'),
-        borderPadding=10
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=20,
-        textColor=COLOR_ACCENT,
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold',
-        backColor=HexColor('#000000'),
-        borderPadding=8
-    )
-    
-    subheading_style = ParagraphStyle(
-        'CustomSubheading',
-        parent=styles['Heading3'],
-        fontSize=14,
-        textColor=COLOR_ACCENT,
-        spaceAfter=8,
-        spaceBefore=12,
-        fontName='Helvetica-Bold',
-        backColor=HexColor('#000000'),
-        borderPadding=6
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=COLOR_TEXT,
-        spaceAfter=12,
-        alignment=TA_JUSTIFY,
-        leading=14,
-        backColor=HexColor('#000000'),
-        borderPadding=8
-    )
-    
-    bullet_style = ParagraphStyle(
-        'CustomBullet',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=COLOR_TEXT,
-        spaceAfter=8,
-        leftIndent=20,
-        bulletIndent=10,
-        leading=13,
-        backColor=HexColor('#000000'),
-        borderPadding=6
-    )
-    
-    # ============ PAGE 1: Cover with Showcase Image ============
-    # Use cover template (showcase image background)
-    story.append(Spacer(1, 2*inch))
-    
-    # Add text overlay on showcase image with semi-transparent background
-    story.append(Paragraph(
-        "Black Wave",
-        ParagraphStyle(
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=28,
+            textColor=COLOR_ACCENT,
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            backColor=HexColor('#000000'),
+            borderPadding=10
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=20,
+            textColor=COLOR_ACCENT,
+            spaceAfter=12,
+            spaceBefore=20,
+            fontName='Helvetica-Bold',
+            backColor=HexColor('#000000'),
+            borderPadding=8
+        ),
+        'subheading': ParagraphStyle(
+            'CustomSubheading',
+            parent=styles['Heading3'],
+            fontSize=14,
+            textColor=COLOR_ACCENT,
+            spaceAfter=8,
+            spaceBefore=12,
+            fontName='Helvetica-Bold',
+            backColor=HexColor('#000000'),
+            borderPadding=6
+        ),
+        'body': ParagraphStyle(
+            'CustomBody',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=COLOR_TEXT,
+            spaceAfter=12,
+            alignment=TA_JUSTIFY,
+            leading=14,
+            backColor=HexColor('#000000'),
+            borderPadding=8
+        ),
+        'bullet': ParagraphStyle(
+            'CustomBullet',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=COLOR_TEXT,
+            spaceAfter=8,
+            leftIndent=20,
+            bulletIndent=10,
+            leading=13,
+            backColor=HexColor('#000000'),
+            borderPadding=6
+        ),
+        'cover_title': ParagraphStyle(
             'CoverTitle',
             parent=styles['Heading1'],
             fontSize=36,
@@ -186,12 +281,8 @@ def create_capability_statement():
             fontName='Helvetica-Bold',
             backColor=HexColor('#000000'),
             borderPadding=15
-        )
-    ))
-    
-    story.append(Paragraph(
-        "Construction & Decision Science",
-        ParagraphStyle(
+        ),
+        'cover_subtitle': ParagraphStyle(
             'CoverSubtitle',
             parent=styles['Normal'],
             fontSize=18,
@@ -200,12 +291,8 @@ def create_capability_statement():
             spaceAfter=40,
             backColor=HexColor('#000000'),
             borderPadding=10
-        )
-    ))
-    
-    story.append(Paragraph(
-        "Capability Statement",
-        ParagraphStyle(
+        ),
+        'capability_title': ParagraphStyle(
             'CapabilityTitle',
             parent=styles['Normal'],
             fontSize=24,
@@ -215,13 +302,66 @@ def create_capability_statement():
             fontName='Helvetica-Bold',
             backColor=HexColor('#000000'),
             borderPadding=12
-        )
-    ))
+        ),
+        'contact': ParagraphStyle(
+            'Contact',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=COLOR_ACCENT,
+            alignment=TA_CENTER,
+            spaceAfter=20,
+            backColor=HexColor('#000000'),
+            borderPadding=8
+        ),
+    }
+
+def _bullets(items, style):
+    return [Paragraph(f"• {item}", style) for item in items]
+
+def _highlights(highlights, style):
+    """Past performance entries, separated by small spacers"""
+    flowables = []
+    for i, item in enumerate(highlights):
+        if i:
+            flowables.append(Spacer(1, 0.2*inch))
+        flowables.append(Paragraph(
+            f"<b>{item['title']}</b><br/>"
+            f"{item['client']} • Role: {item['role']}<br/>"
+            f"{item['summary']}",
+            style
+        ))
+    return flowables
+
+def build_sections(styles, content=None):
+    """
+    The story as named sections, each starting on a new page: a list of
+    (name, flowables). `content` overrides keys of DEFAULT_CONTENT.
+    """
+    content = {**DEFAULT_CONTENT, **(content or {})}
+    contact = {**DEFAULT_CONTENT['contact'], **content['contact']}
+    
+    heading_style = styles['heading']
+    subheading_style = styles['subheading']
+    body_style = styles['body']
+    bullet_style = styles['bullet']
+    
+    # Container for the 'Flowable' objects of the current section
+    sections = []
+    story = []
+    
+    # ============ PAGE 1: Cover with Showcase Image ============
+    # Use cover template (showcase image background)
+    story.append(Spacer(1, 2*inch))
+    
+    # Add text overlay on showcase image with semi-transparent background
+    story.append(Paragraph("Black Wave", styles['cover_title']))
+    story.append(Paragraph("Construction & Decision Science", styles['cover_subtitle']))
+    story.append(Paragraph("Capability Statement", styles['capability_title']))
     
     # Switch to content template for remaining pages
     story.append(NextPageTemplate('content'))
-    story.append(PageBreak())
-    story.append(Spacer(1, 0.2*inch))
+    sections.append(('cover', story))
+    story = [Spacer(1, 0.2*inch)]
     
     # ============ PAGE 2: About Black Wave ============
     story.append(Paragraph("About Black Wave", heading_style))
@@ -245,10 +385,7 @@ def create_capability_statement():
     
     story.append(Paragraph("What Sets Us Apart", subheading_style))
     
-    story.append(Paragraph("• Service-Disabled Veteran-Owned Small Business (SDVOSB)", bullet_style))
-    story.append(Paragraph("• Experience supporting federal, DoD, and research environments", bullet_style))
-    story.append(Paragraph("• Hands-on construction background plus advanced analytics expertise", bullet_style))
-    story.append(Paragraph("• 25+ years of mission-aligned delivery", bullet_style))
+    story.extend(_bullets(content['differentiators'], bullet_style))
     
     story.append(Spacer(1, 0.3*inch))
     
@@ -259,7 +396,8 @@ def create_capability_statement():
         body_style
     ))
     
-    story.append(PageBreak())
+    sections.append(('about', story))
+    story = []
     
     # ============ PAGE 3: Construction Services ============
     story.append(Spacer(1, 0.2*inch))
@@ -275,12 +413,7 @@ def create_capability_statement():
     
     story.append(Paragraph("Our Construction Capabilities", subheading_style))
     
-    story.append(Paragraph("• Construction management services", bullet_style))
-    story.append(Paragraph("• Site work and civil construction", bullet_style))
-    story.append(Paragraph("• Infrastructure, utilities, and ISP/OSP", bullet_style))
-    story.append(Paragraph("• Mission-critical and secure facilities", bullet_style))
-    story.append(Paragraph("• General construction and renovations", bullet_style))
-    story.append(Paragraph("• Tenant improvements and build-outs", bullet_style))
+    story.extend(_bullets(content['construction_capabilities'], bullet_style))
     
     story.append(Spacer(1, 0.3*inch))
     
@@ -308,31 +441,13 @@ def create_capability_statement():
         body_style
     ))
     
-    story.append(Spacer(1, 0.3*inch))
-    
-    story.append(Paragraph("Past Performance Highlights", subheading_style))
-    
-    story.append(Paragraph(
-        "<b>Renovation of Mission Support Facility</b><br/>"
-        "Federal Agency • Role: Prime Contractor<br/>"
-        "Multi-phase renovation of an active mission support facility, including interior build-out "
-        "and systems coordination. Maintained operations with minimal downtime and delivered on time "
-        "despite constrained access windows.",
-        body_style
-    ))
-    
-    story.append(Spacer(1, 0.2*inch))
+    if content['construction_highlights']:
+        story.append(Spacer(1, 0.3*inch))
+        story.append(Paragraph("Past Performance Highlights", subheading_style))
+        story.extend(_highlights(content['construction_highlights'], body_style))
     
-    story.append(Paragraph(
-        "<b>Secure Operations Center Build-Out</b><br/>"
-        "DoD Installation • Role: Subcontractor<br/>"
-        "Build-out of a secure operations space with specialized mechanical, electrical, and IT "
-        "infrastructure requirements. Coordinated with multiple trades and security stakeholders, "
-        "meeting strict commissioning and acceptance milestones.",
-        body_style
-    ))
-    
-    story.append(PageBreak())
+    sections.append(('construction', story))
+    story = []
     
     # ============ PAGE 4: Decision Science Services ============
     story.append(Spacer(1, 0.2*inch))
@@ -348,12 +463,7 @@ def create_capability_statement():
     
     story.append(Paragraph("Our Decision Science Capabilities", subheading_style))
     
-    story.append(Paragraph("• Strategic resource allocation optimization", bullet_style))
-    story.append(Paragraph("• Efficient operational & logistics planning", bullet_style))
-    story.append(Paragraph("• Executive dashboards & scenario analysis", bullet_style))
-    story.append(Paragraph("• Work packaging and phasing optimization", bullet_style))
-    story.append(Paragraph("• AI-enabled planning for capital projects", bullet_style))
-    story.append(Paragraph("• GenAI-supported workflows for project analysis", bullet_style))
+    story.extend(_bullets(content['decision_capabilities'], bullet_style))
     
     story.append(Spacer(1, 0.3*inch))
     
@@ -448,31 +558,13 @@ def create_capability_statement():
         body_style
     ))
     
-    story.append(Spacer(1, 0.3*inch))
-    
-    story.append(Paragraph("Past Performance Highlights", subheading_style))
-    
-    story.append(Paragraph(
-        "<b>AI-Enabled Planning for Capital Projects</b><br/>"
-        "Federal Program Office • Role: Decision Science Advisor<br/>"
-        "Developed GenAI-supported workflows for analyzing project options, schedule risk, and "
-        "resource trade-offs. Reduced planning cycle time by approximately 40% and created reusable "
-        "decision frameworks for future projects.",
-        body_style
-    ))
+    if content['decision_highlights']:
+        story.append(Spacer(1, 0.3*inch))
+        story.append(Paragraph("Past Performance Highlights", subheading_style))
+        story.extend(_highlights(content['decision_highlights'], body_style))
     
-    story.append(Spacer(1, 0.2*inch))
-    
-    story.append(Paragraph(
-        "<b>Logistics & Work Packaging Optimization</b><br/>"
-        "DoD Facilities Portfolio • Role: Analytics Lead<br/>"
-        "Applied analytics and GenAI tooling to evaluate work packaging, staging, and material "
-        "flows across multiple sites. Improved material utilization and reduced idle time, enabling "
-        "clearer communication to field teams and leadership.",
-        body_style
-    ))
-    
-    story.append(PageBreak())
+    sections.append(('decision-science', story))
+    story = []
     
     # ============ PAGE 5: Why Both Together ============
     story.append(Spacer(1, 0.2*inch))
@@ -520,32 +612,202 @@ def create_capability_statement():
     # Contact information
     story.append(Paragraph("Contact Information", subheading_style))
     
-    story.append(Paragraph(
-        "For more information about Black Wave's capabilities or to discuss your project needs, "
-        "please visit our website or contact us directly.",
-        body_style
-    ))
+    story.append(Paragraph(contact['text'], body_style))
+    
+    for line in contact['lines']:
+        story.append(Paragraph(line, body_style))
     
     story.append(Spacer(1, 0.2*inch))
     
-    story.append(Paragraph(
-        "<b>Service-Disabled Veteran-Owned Small Business (SDVOSB)</b>",
-        ParagraphStyle(
-            'Contact',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=COLOR_ACCENT,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            backColor=HexColor('#000000'),
-            borderPadding=8
-        )
-    ))
+    story.append(Paragraph(f"<b>{contact['designation']}</b>", styles['contact']))
+    sections.append(('why-together', story))
+    
+    return sections
+
+def build_story(styles, content=None):
+    """Build the flowable story; `content` overrides keys of DEFAULT_CONTENT"""
+    story = []
+    for i, (_, flowables) in enumerate(build_sections(styles, content)):
+        if i:
+            story.append(PageBreak())
+        story.extend(flowables)
+    return story
+
+def load_render_context(dpi=DEFAULT_DPI, quality=DEFAULT_QUALITY):
+    """
+    Build the expensive, reusable parts of a render once: paragraph styles and
+    decoded background images. Pass the result to build_document() to render
+    many statements without re-decoding images or rebuilding styles.
+    """
+    backgrounds = {
+        name: ImageReader(path) if path else None
+        for name, path in prepare_backgrounds(dpi, quality).items()
+    }
+    return {'styles': build_styles(), 'backgrounds': backgrounds}
+
+def make_doc_template(pdf_path, first_template='cover'):
+    """
+    The letter-size doc template with the cover and content page templates;
+    `first_template` is the one the first page uses.
+    """
+    # Create frames for content (will be set after doc creation)
+    left_margin = 0.75*inch
+    right_margin = 0.75*inch
+    top_margin = 0.75*inch
+    bottom_margin = 0.75*inch
+    width, height = letter
+    
+    frame = Frame(
+        left_margin,
+        bottom_margin,
+        width - left_margin - right_margin,
+        height - top_margin - bottom_margin,
+        leftPadding=0,
+        bottomPadding=0,
+        rightPadding=0,
+        topPadding=0,
+        id='normal'
+    )
     
-    # Build PDF
+    # Create page templates
+    cover_template = PageTemplate(id='cover', frames=[frame], onPage=draw_cover_page)
+    content_template = PageTemplate(id='content', frames=[frame], onPage=draw_content_page)
+    templates = [cover_template, content_template]
+    templates.sort(key=lambda template: template.id != first_template)
+    
+    return BaseDocTemplate(
+        pdf_path,
+        pagesize=letter,
+        rightMargin=right_margin,
+        leftMargin=left_margin,
+        topMargin=top_margin,
+        bottomMargin=bottom_margin,
+        pageTemplates=templates,
+        # Fixed timestamps and document IDs: identical inputs give identical bytes
+        invariant=True
+    )
+
+def build_document(pdf_path, content=None, context=None, dpi=DEFAULT_DPI,
+                   quality=DEFAULT_QUALITY, tracer=None):
+    """
+    Lay out and write one statement to `pdf_path` (a path or a binary
+    file-like object); returns the finished doc template (doc.page holds the
+    page count). A capability_trace.LayoutTracer passed as `tracer` records
+    timing spans for the build.
+    """
+    doc = make_doc_template(pdf_path)
+    
+    if context is None:
+        context = {'styles': build_styles(), 'backgrounds': prepare_backgrounds(dpi, quality)}
+    
+    # Page callbacks read their (cached, pre-downscaled) images from the doc
+    doc.backgrounds = context['backgrounds']
+    
+    story = build_story(context['styles'], content)
+    if tracer is not None:
+        story = tracer.instrument(doc, story)
     doc.build(story)
+    return doc
+
+def render_capability_statement(stream=None, content=None, context=None, dpi=DEFAULT_DPI,
+                                quality=DEFAULT_QUALITY, linearize=False):
+    """
+    Render a statement in memory and return the PDF bytes.
+
+    When `stream` (any binary file-like object) is given the bytes are also
+    written to it, so callers never need a path on disk. `linearize`
+    post-processes the output for fast web view (see capability_linearize).
+    """
+    buffer = io.BytesIO()
+    build_document(buffer, content, context, dpi, quality)
+    data = buffer.getvalue()
+    if linearize:
+        import capability_linearize
+        data = capability_linearize.linearize_bytes(data)
+    if stream is not None:
+        stream.write(data)
+    return data
+
+def create_capability_statement(pdf_path='capability_statement.pdf', dpi=DEFAULT_DPI,
+                                quality=DEFAULT_QUALITY, content=None, linearize=False,
+                                fragments=False, tracer=None, lite=False, max_bytes=None):
+    """
+    Generate the Black Wave Capability Statement PDF
+
+    Background images come from the derivative cache in capability_assets,
+    sized for a letter page at `dpi` (None draws the full-resolution sources).
+    With `linearize` the cover page and its resources are written first, so
+    page 1 renders from the first bytes of a download. With `fragments` only
+    the sections that changed are re-rendered (see capability_fragments);
+    a `tracer` always gets a full build to instrument. `lite` drops the
+    background images. With `max_bytes` the best render of at most that size
+    is written, `dpi` and `quality` being the most it may use (see
+    capability_budget); returns None when not even the lite template fits.
+    """
+    import capability_budget
+    import capability_linearize
+    if max_bytes is not None:
+        result = capability_budget.fit_to_budget(max_bytes, dpi, quality, content, linearize)
+        print(capability_budget.describe(result, max_bytes))
+        if not result['fits']:
+            return None
+        tmp_path = f'{pdf_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(result['data'])
+        os.replace(tmp_path, pdf_path)
+        print(f"Capability statement PDF generated: {pdf_path}")
+        return pdf_path
+
+    context = None
+    if lite:
+        context = {'styles': build_styles(), 'backgrounds': dict(capability_budget.LITE_BACKGROUNDS)}
+    if fragments and tracer is None:
+        import capability_fragments
+        result = capability_fragments.build_fragmented(pdf_path, content, context, dpi=dpi, quality=quality,
+                                                       linearize=linearize)
+        print(f"Sections re-rendered: {', '.join(result['rendered']) or 'none'} "
+              f"({len(result['reused'])} reused from {capability_fragments.CACHE_DIR})")
+        if result['full_build']:
+            print(f"Full build: {result['full_build']}")
+    else:
+        build_document(pdf_path, content, context, dpi=dpi, quality=quality, tracer=tracer)
+        if linearize:
+            capability_linearize.linearize_file(pdf_path)
+    if linearize:
+        info = capability_linearize.inspect_file(pdf_path)
+        print(f"Linearized: page 1 needs the first {info['first_page_bytes']:,} of "
+              f"{info['file_size']:,} bytes")
     print(f"Capability statement PDF generated: {pdf_path}")
     return pdf_path
 
+def main(argv=None):
+    import capability_linearize
+    args = parse_args(argv)
+    settings = build_settings(args)
+    if args.linearize and capability_linearize.available() is None:
+        print("Error: --linearize needs pikepdf (pip install pikepdf) or the qpdf tool")
+        sys.exit(1)
+    if args.max_bytes is not None and (args.fragments or args.trace or args.lite):
+        print("Error: --max-bytes chooses the render itself; it cannot be combined with "
+              "--fragments, --trace or --lite")
+        sys.exit(1)
+    tracer = None
+    if args.trace:
+        from capability_trace import LayoutTracer
+        tracer = LayoutTracer()
+    written = create_capability_statement(args.output, dpi=settings['dpi'], quality=settings['quality'],
+                                          linearize=settings['linearize'], fragments=settings['fragments'],
+                                          tracer=tracer, lite=settings['lite'],
+                                          max_bytes=settings['max_bytes'])
+    if written is None:
+        print(f"Error: {args.output} was not written; even the lite template exceeds the size budget")
+        sys.exit(1)
+    if tracer is not None:
+        tracer.write_chrome_trace(args.trace)
+        print(tracer.summary())
+        print(f"Chrome trace written to {args.trace}")
+    etag = capability_manifest.record_build(args.output, settings)
+    print(f"Build manifest updated (sha256 {etag[:16]})")
+
 if __name__ == '__main__':
-    create_capability_statement()
+    main()
@@ -1,5 +1,18 @@
+import argparse
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
 import re
+import shutil
 import sys
+import tempfile
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
 
 #====================================================================================
@@ -15,14 +28,32 @@ from pathlib import Path
 # $ python markdowns/generate_toc.py markdowns/concept.md
 #
 # $ python markdowns/generate_toc.py markdowns/Cheatsheet/terminal_codes_latex.md
+#
+# Whole trees (recursive, parallel, unchanged files skipped via .cache/toc_cache.json):
+# $ python generate_toc.py Documents/ --exclude "drafts/*"
+# $ python generate_toc.py Documents/ --check      # exit 1 if any TOC is stale
+# $ python generate_toc.py Documents/CHANGELOG.md --watch   # regenerate on every save
 #====================================================================================
 
 FENCE_RE = re.compile(r"^(```|~~~)")
+HEADER_RE = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+TOC_END_RE = re.compile(r"^#{1,2}\s+")
+H1_RE = re.compile(r"^#\s+")
+
+FENCE_TOKENS = ("```", "~~~")
+DEFAULT_TOC_HEADING = "## Table of Contents"
+
+# Line boundaries recognised by str.splitlines()
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+# Files at least this large are rewritten through the mmap-backed streaming path
+MMAP_THRESHOLD = 16 * 1024 * 1024
 
 def fence_mask(lines):
     """
     Return a list[bool] same length as lines where True means the line is
     inside a fenced code block (``` or ~~~).
+    MarkdownIndex.is_fenced() answers the same without a list entry per line.
     """
     mask = []
     in_fence = False
@@ -64,6 +95,283 @@ def slugify(header_text: str) -> str:
 
     return text
 
+def unique_anchor(counts, slug):
+    """
+    GitHub's anchor for the next heading with `slug`: a repeated slug gets
+    -1, -2, ... ("files-touched", "files-touched-1"). `counts` holds the
+    anchors of the document's earlier headings and is updated.
+    """
+    anchor = slug
+    while anchor in counts:
+        counts[slug] += 1
+        anchor = f"{slug}-{counts[slug]}"
+    counts[anchor] = 0
+    return anchor
+
+def unique_slugs(slugs):
+    """GitHub's anchors for a document's heading slugs, in document order"""
+    counts = {}
+    return [unique_anchor(counts, slug) for slug in slugs]
+
+def _toc_heading_re(toc_heading):
+    """Regex matching the TOC heading line (case-insensitive), e.g. '## Table of Contents'"""
+    compiled = _TOC_RE_CACHE.get(toc_heading)
+    if compiled is None:
+        heading_text = toc_heading.lstrip("# ").strip()
+        compiled = re.compile(rf"^##\s+{re.escape(heading_text)}\s*$", flags=re.IGNORECASE)
+        _TOC_RE_CACHE[toc_heading] = compiled
+    return compiled
+
+_TOC_RE_CACHE = {}
+
+# Kinds of the H1/H2 "marks" that delimit the TOC region
+MARK_TOC, MARK_H1, MARK_H2 = 0, 1, 2
+
+Heading = namedtuple("Heading", "line offset level title slug")
+
+class MarkdownIndex:
+    """
+    Compact index of a markdown document, built in one pass.
+
+    Fenced blocks are a sorted array of (start, end) line intervals (end is
+    exclusive and includes the closing fence line) and headings are parallel
+    arrays of line, offset, level, title and slug, so a large document costs
+    a few machine words per heading and fence instead of an object per line.
+    Offsets are character offsets into the text (byte offsets for mmap'd
+    files) of the start of each line.
+
+    fence_starts, fence_ends:  array('q') of fence intervals
+    heading_lines, heading_offsets, heading_levels, titles, slugs:
+                               the headings outside fences (commented-out ones skipped)
+    mark_lines, mark_offsets, mark_kinds:
+                               H1/H2 lines outside fences, kind MARK_TOC (the TOC
+                               heading), MARK_H1 or MARK_H2; they start and end the TOC
+    toc_start:  line of the existing TOC heading, or None
+    toc_end:    line where the existing TOC ends (next H1/H2, or line_count)
+    first_h1:   line of the first H1 outside fences, or None
+    insert_at:  first non-blank line after first_h1 (where a new TOC goes)
+    line_count: lines indexed (the line a partial scan stopped at)
+    offsets:    offsets of the toc_start/toc_end/insert_at lines, when they exist
+    """
+
+    __slots__ = ("fence_starts", "fence_ends", "heading_lines", "heading_offsets",
+                 "heading_levels", "titles", "slugs", "mark_lines", "mark_offsets", "mark_kinds",
+                 "toc_start", "toc_end", "first_h1", "insert_at", "line_count", "offsets")
+
+    def __init__(self):
+        self.fence_starts = array("q")
+        self.fence_ends = array("q")
+        self.heading_lines = array("q")
+        self.heading_offsets = array("q")
+        self.heading_levels = array("b")
+        self.titles = []
+        self.slugs = []
+        self.mark_lines = array("q")
+        self.mark_offsets = array("q")
+        self.mark_kinds = array("b")
+        self.toc_start = None
+        self.toc_end = None
+        self.first_h1 = None
+        self.insert_at = None
+        self.line_count = 0
+        self.offsets = {}
+
+    @classmethod
+    def from_text(cls, md_text, toc_heading=DEFAULT_TOC_HEADING):
+        """Index a document held in memory (line numbers as in md_text.splitlines())"""
+        if not _newline_breaks_only(md_text):
+            return _scan(_text_lines(md_text), toc_heading)
+        line_count = md_text.count("\n") + (md_text[-1:] not in ("", "\n"))
+        return _scan(_candidate_lines(md_text), toc_heading, line_count=line_count)
+
+    def __len__(self):
+        return len(self.heading_lines)
+
+    def heading(self, i):
+        return Heading(self.heading_lines[i], self.heading_offsets[i], self.heading_levels[i],
+                       self.titles[i], self.slugs[i])
+
+    @property
+    def headings(self):
+        """(level, title, line) for every heading, as a list"""
+        return list(zip(self.heading_levels, self.titles, self.heading_lines))
+
+    @property
+    def fences(self):
+        """Fenced blocks as a list of (start, end) line intervals"""
+        return list(zip(self.fence_starts, self.fence_ends))
+
+    def is_fenced(self, line):
+        """True if `line` is part of a fenced block (fence lines included); O(log n)"""
+        i = bisect_right(self.fence_starts, line) - 1
+        return i >= 0 and line < self.fence_ends[i]
+
+    def section_at(self, offset):
+        """The Heading whose section contains `offset`, or None before the first heading; O(log n)"""
+        i = bisect_right(self.heading_offsets, offset) - 1
+        return self.heading(i) if i >= 0 else None
+
+_LINE_RE = re.compile(f"[^{LINE_BREAKS}]*(?:\r\n|[{LINE_BREAKS}])|[^{LINE_BREAKS}]+")
+# A line that can be a heading or a fence (matched at the line start), and
+# the line break before one (a literal first character keeps finditer fast)
+_CANDIDATE_RE = re.compile(r"#|[^\S\n]*(?:```|~~~)")
+_NEXT_CANDIDATE_RE = re.compile(r"\n(?=#|[^\S\n]*(?:```|~~~))")
+_NON_BLANK_RE = re.compile(r"^[^\n]*?\S", flags=re.MULTILINE)
+
+def _newline_breaks_only(md_text):
+    """True if md_text only breaks lines with "\\n" or "\\r\\n" (`in` scans far faster than a regex)"""
+    if any(ch in md_text for ch in LINE_BREAKS[2:]):
+        return False
+    return "\r" not in md_text or md_text.count("\r") == md_text.count("\r\n")
+
+def _text_lines(md_text):
+    """(line number, offset, line) for each line of md_text (line keeps its line break)"""
+    for i, m in enumerate(_LINE_RE.finditer(md_text)):
+        yield i, m.start(), m.group()
+
+def _candidate_lines(md_text):
+    """
+    (line number, offset, line) for the lines of md_text that _scan acts on:
+    headings, fence lines and the first non-blank line after each H1. Lines
+    in between are counted with str.count, never sliced out. md_text must
+    only break lines with "\\n" or "\\r\\n".
+    """
+    find, count = md_text.find, md_text.count
+    starts = (m.end() for m in _NEXT_CANDIDATE_RE.finditer(md_text))
+    if _CANDIDATE_RE.match(md_text):
+        starts = chain((0,), starts)
+    i = pos = 0
+    for start in starts:
+        i += count("\n", pos, start)
+        pos = start
+        end = find("\n", start) + 1 or len(md_text)
+        line = md_text[start:end]
+        yield i, start, line
+        if H1_RE.match(line):
+            after = _NON_BLANK_RE.search(md_text, end)
+            if after and not _CANDIDATE_RE.match(md_text, after.start()):
+                start = after.start()
+                i += count("\n", pos, start)
+                pos = start
+                yield i, start, md_text[start:find("\n", start) + 1 or len(md_text)]
+
+def _scan(items, toc_heading=DEFAULT_TOC_HEADING, first_line=0, until=None, line_count=None):
+    """
+    Single pass over (line number, offset, line) triples classifying fences,
+    headings and the existing TOC region at once; returns a MarkdownIndex.
+    `line` may be str or bytes; bytes lines are only decoded when they can
+    be a heading (they start with '#').
+
+    Partial scans (used to re-index an edited range) start at line
+    `first_line`, must start outside any fence, and stop before the first
+    line i, outside a fence, for which `until(i)` is true.
+
+    Sparse scans (_candidate_lines) skip the lines that are neither a
+    heading, a fence nor the first non-blank line after an H1, and pass the
+    document's `line_count`.
+    """
+    toc_re = _toc_heading_re(toc_heading)
+    index = MarkdownIndex()
+    offsets = index.offsets
+    add_fence_start = index.fence_starts.append
+    add_fence_end = index.fence_ends.append
+
+    fence_token = None  # token that opened the current fence (``` or ~~~)
+    awaiting_insert = False  # skipping blank lines after the first H1
+    i = first_line - 1
+    for i, offset, line in items:
+        if until is not None and fence_token is None and until(i):
+            i -= 1
+            break
+
+        if isinstance(line, bytes):
+            stripped = line.strip()
+            token = stripped[:3].decode("ascii", "replace") if stripped[:1] in (b"`", b"~") else None
+            is_heading_candidate = line[:1] == b"#"
+        else:
+            stripped = line.strip()
+            token = stripped[:3] if stripped[:1] in ("`", "~") else None
+            is_heading_candidate = line[:1] == "#"
+
+        if awaiting_insert:
+            if stripped:
+                index.insert_at = i
+                offsets["insert_at"] = offset
+                awaiting_insert = False
+
+        if token in FENCE_TOKENS:
+            if fence_token is None:
+                fence_token = token
+                add_fence_start(i)
+            elif token == fence_token:
+                # only close if same token type
+                add_fence_end(i + 1)
+                fence_token = None
+            continue
+        if fence_token is not None or not is_heading_candidate:
+            continue
+
+        if isinstance(line, bytes):
+            line = line.decode("utf-8").rstrip("\r\n")
+        else:
+            line = line.rstrip(LINE_BREAKS)
+
+        # H1/H2 lines delimit the TOC region: it starts at the TOC heading
+        # and ends at the next H1/H2
+        if TOC_END_RE.match(line):
+            if toc_re.match(line):
+                kind = MARK_TOC
+            elif H1_RE.match(line):
+                kind = MARK_H1
+            else:
+                kind = MARK_H2
+            index.mark_lines.append(i)
+            index.mark_offsets.append(offset)
+            index.mark_kinds.append(kind)
+            if index.toc_start is None:
+                if kind == MARK_TOC:
+                    index.toc_start = i
+                    offsets["toc_start"] = offset
+            elif index.toc_end is None:
+                index.toc_end = i
+                offsets["toc_end"] = offset
+            if kind == MARK_H1 and index.first_h1 is None:
+                index.first_h1 = i
+                awaiting_insert = True
+
+        m = HEADER_RE.match(line)
+        if m:
+            hashes, title = m.groups()
+            # skip headings that are commented out
+            if not title.startswith("<!--"):
+                index.heading_lines.append(i)
+                index.heading_offsets.append(offset)
+                index.heading_levels.append(len(hashes))
+                index.titles.append(title)
+                index.slugs.append(slugify(title))
+
+    index.line_count = i + 1 if line_count is None else line_count
+    if fence_token is not None:
+        # unterminated fence runs to the end of the document
+        add_fence_end(index.line_count)
+    if index.toc_start is not None and index.toc_end is None:
+        index.toc_end = index.line_count
+    if awaiting_insert:
+        index.insert_at = index.line_count
+    return index
+
+def index_lines(lines, toc_heading=DEFAULT_TOC_HEADING):
+    """
+    Index a list (or any iterable) of lines without line breaks; see
+    MarkdownIndex. Offsets assume lines are joined by a single "\\n".
+    """
+    def items():
+        offset = 0
+        for i, line in enumerate(lines):
+            yield i, offset, line
+            offset += len(line) + 1
+    return _scan(items(), toc_heading)
+
 def extract_headings(md_lines):
     """
     Return a list of (level, text) for headings like
@@ -71,33 +379,31 @@ def extract_headings(md_lines):
        - We ignore level 1 (# ...) in the TOC by default unless you want it..
        - Skips headings inside fenced code blocks and HTML comments.
     """
-    in_fence = fence_mask(md_lines)
-    headings = []
-    header_pattern = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
-    for i, line in enumerate(md_lines):
-        if in_fence[i]:
-            continue
-        m = header_pattern.match(line)
-        if m:
-            hashes, title = m.groups()
-            # skip headings that are code fences or commented out
-            if not title.startswith("<!--"):
-                headings.append((len(hashes), title))
-    return headings
+    index = index_lines(md_lines)
+    return list(zip(index.heading_levels, index.titles))
 
-def build_toc(headings, include_h1=False, toc_title="## Table of Contents"):
+def build_toc(headings, include_h1=False, toc_title=DEFAULT_TOC_HEADING):
     """
     Build a markdown TOC. Indent deeper levels.
     include_h1=False means we skip level-1 headings in the TOC.
+    `headings` is a MarkdownIndex (its slugs are reused) or (level, title)
+    pairs; extra tuple fields (line numbers) are ignored. Repeated headings
+    link to GitHub's numbered anchors (see unique_slugs), counted over every
+    heading, H1s included.
     """
     toc_lines = [toc_title]
 
-    for level, title in headings:
+    if isinstance(headings, MarkdownIndex):
+        entries = zip(headings.heading_levels, headings.titles, unique_slugs(headings.slugs))
+    else:
+        headings = [(level, title) for level, title, *_ in headings]
+        anchors = unique_slugs(slugify(title) for _, title in headings)
+        entries = ((level, title, anchor) for (level, title), anchor in zip(headings, anchors))
+
+    for level, title, anchor in entries:
         if level == 1 and not include_h1:
             continue
 
-        anchor = slugify(title)
-
         # indent with 2 spaces per depth beyond level 2
         # so:
         # ## Heading (level 2) -> no indent
@@ -110,83 +416,324 @@ def build_toc(headings, include_h1=False, toc_title="## Table of Contents"):
     toc_lines.append("")  # trailing newline
     return "\n".join(toc_lines)
 
-def insert_or_replace_toc(md_text, toc_block, toc_heading="## Table of Contents"):
+_OTHER_BREAKS_RE = re.compile(f"[{LINE_BREAKS[1:]}]")
+
+def _as_lines(chunk):
+    """Whole lines of text, each re-terminated by a single "\\n" """
+    if _OTHER_BREAKS_RE.search(chunk):
+        return "".join(line + "\n" for line in chunk.splitlines())
+    return chunk if not chunk or chunk.endswith("\n") else chunk + "\n"
+
+def insert_or_replace_toc(md_text, toc_block, toc_heading=DEFAULT_TOC_HEADING, index=None):
     """
     If a TOC section already exists (starts with '## Table of Contents'
     and goes until the next heading of same or higher level), replace it.
     Otherwise insert right after the first top-level heading (# ...) if found,
     else at the very top.
-    """
-
-    lines = md_text.splitlines()
-    in_fence = fence_mask(lines)
-
-    # 1) Find an existing TOC heading outside fences
-    toc_start_idx = None
-    heading_text = toc_heading.lstrip("# ").strip()
-    toc_re = re.compile(rf"^##\s+{re.escape(heading_text)}\s*$", flags=re.IGNORECASE)
 
-    for i, line in enumerate(lines):
-        if in_fence[i]:
-            continue
-        if toc_re.match(line):
-            toc_start_idx = i
-            break
+    Pass MarkdownIndex.from_text(md_text) as `index` to avoid indexing it again.
+    The text around the TOC is sliced by offset rather than split into lines.
+    """
+    if index is None:
+        index = MarkdownIndex.from_text(md_text, toc_heading)
 
-    if toc_start_idx is not None:
-        # Find where TOC ends: next H1 or H2 outside fences
-        toc_end_idx = len(lines)
-        for j in range(toc_start_idx + 1, len(lines)):
-            if in_fence[j]:
-                continue
-            if re.match(r"^#{1,2}\s+", lines[j]):
-                toc_end_idx = j
-                break
-        new_lines = lines[:toc_start_idx] + toc_block.splitlines() + lines[toc_end_idx:]
-        return "\n".join(new_lines) + "\n"
+    # 1) Replace an existing TOC (found outside fences)
+    if index.toc_start is not None:
+        head = md_text[:index.offsets["toc_start"]]
+        tail = md_text[index.offsets.get("toc_end", len(md_text)):]
+        return _as_lines(head) + _as_lines(toc_block) + _as_lines(tail)
 
     # 2) Insert after first H1 (# ...) outside fences
-    first_h1_idx = None
-    for i, line in enumerate(lines):
-        if in_fence[i]:
-            continue
-        if re.match(r"^#\s+", line):
-            first_h1_idx = i
-            break
-
-    if first_h1_idx is not None:
-        insert_at = first_h1_idx + 1
-        while insert_at < len(lines) and lines[insert_at].strip() == "":
-            insert_at += 1
-        new_lines = lines[:insert_at] + ["", toc_block, ""] + lines[insert_at:]
-        return "\n".join(new_lines) + "\n"
+    if index.first_h1 is not None:
+        at = index.offsets.get("insert_at", len(md_text))
+        return _as_lines(md_text[:at]) + "\n" + toc_block + "\n\n" + _as_lines(md_text[at:])
 
     # 3) Fallback: prepend
     return toc_block + "\n\n" + md_text
 
+def _write_atomic(path, chunks):
+    """Stream byte chunks to a temp file next to `path`, then atomically replace it"""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        shutil.copymode(path, tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+def _mmap_lines(mm):
+    """Yield (line number, offset, line) for every line of a mapped file (line keeps its newline)"""
+    readline = mm.readline
+    i = offset = 0
+    while True:
+        line = readline()
+        if not line:
+            return
+        yield i, offset, line
+        i += 1
+        offset += len(line)
+
+def _ensure_newline(data, eol=b"\n"):
+    return data if not data or data.endswith(b"\n") else data + eol
+
+def _update_large_file(md_path, include_h1, toc_heading, write=True):
+    """
+    mmap-backed path for very large files: scan once over the mapping, then
+    stream the unchanged prefix/suffix byte ranges around the new TOC into a
+    temp file. Memory stays bounded by the heading table, not the file size.
+    Original line endings are kept byte-for-byte.
+    """
+    with open(md_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index = _scan(_mmap_lines(mm), toc_heading)
+        toc_block = build_toc(index, include_h1=include_h1, toc_title=toc_heading)
+        size = len(mm)
+        # write the TOC with the file's own line ending
+        first_nl = mm.find(b"\n")
+        eol = b"\r\n" if first_nl > 0 and mm[first_nl - 1:first_nl] == b"\r" else b"\n"
+        toc = toc_block.encode("utf-8").replace(b"\n", eol)
+
+        if index.toc_start is not None:
+            start = index.offsets["toc_start"]
+            end = index.offsets.get("toc_end", size)
+            if mm[start:end] == toc and mm[size - 1:size] == b"\n":
+                return False
+            segments = [(0, start), toc, (end, size)]
+        elif index.first_h1 is not None:
+            at = index.offsets.get("insert_at", size)
+            segments = [(0, at), eol + toc + eol + eol, (at, size)]
+        else:
+            segments = [toc + eol + eol, (0, size)]
+        # replaced/inserted documents always end every line with a newline
+        terminate = index.toc_start is not None or index.first_h1 is not None
+
+        def chunks(block=1 << 20):
+            for segment in segments:
+                if isinstance(segment, bytes):
+                    yield segment
+                    continue
+                lo, hi = segment
+                for pos in range(lo, hi, block):
+                    chunk = mm[pos:min(pos + block, hi)]
+                    if terminate and pos + block >= hi:
+                        chunk = _ensure_newline(chunk, eol)
+                    yield chunk
+
+        if write:
+            _write_atomic(md_path, chunks())
+    return True
+
+def update_toc_file(md_path, include_h1=False, toc_heading=DEFAULT_TOC_HEADING, write=True):
+    """
+    Regenerate the TOC of a markdown file in place.
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python generate_toc.py your_file.md")
-        sys.exit(1)
-
-    md_path = Path(sys.argv[1])
-    if not md_path.exists():
-        print(f"Error: {md_path} not found")
-        sys.exit(1)
+    Returns True when the file was rewritten and False when its TOC was
+    already current (the file is not touched). With write=False nothing is
+    written and the return value says whether the TOC is stale. Files of
+    MMAP_THRESHOLD bytes or more take the bounded-memory mmap path.
+    """
+    md_path = Path(md_path)
+    if md_path.stat().st_size >= MMAP_THRESHOLD:
+        return _update_large_file(md_path, include_h1, toc_heading, write)
 
     md_text = md_path.read_text(encoding="utf-8")
-    lines = md_text.splitlines()
+    index = MarkdownIndex.from_text(md_text, toc_heading)
+    toc_block = build_toc(index, include_h1=include_h1, toc_title=toc_heading)
+    new_md = insert_or_replace_toc(md_text, toc_block, toc_heading, index=index)
+    if new_md == md_text:
+        return False
 
-    headings = extract_headings(lines)
-    toc_block = build_toc(headings, include_h1=False)
+    if write:
+        _write_atomic(md_path, [new_md.encode("utf-8")])
+    return True
 
-    new_md = insert_or_replace_toc(md_text, toc_block)
+#====================================================================================
+# Directory-tree mode: many files over a process pool, with a change cache
+#====================================================================================
 
-    # overwrite the same file (you can change this to write to a new file)
-    md_path.write_text(new_md, encoding="utf-8")
-    print(f"TOC updated in {md_path}")
+CACHE_PATH = ".cache/toc_cache.json"
+
+# Bump when TOC output changes for the same input, to invalidate cached results
+CACHE_VERSION = 2
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 hex digest of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stat_key(path):
+    """[size, mtime_ns]: a file whose stat_key is unchanged is assumed unchanged"""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def load_cache(cache_path, settings):
+    """Return {path: {'stat': [size, mtime_ns], 'sha256': ...}} of files whose TOC was current"""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != CACHE_VERSION or data.get("settings") != settings:
+        return {}
+    return data.get("files", {})
+
+def save_cache(cache_path, settings, files):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "settings": settings, "files": files}, f, indent=1)
+    os.replace(tmp_path, cache_path)
+
+def collect_files(paths, include=("*.md",), exclude=()):
+    """
+    Expand files and directories (recursively) into a sorted list of markdown
+    files. Directory entries must match an `include` glob and no `exclude`
+    glob; both are matched against the path relative to the directory and
+    against the bare file name. Files named explicitly are always kept.
+    """
+    found = set()
+    for path in map(Path, paths):
+        if path.is_file():
+            found.add(path)
+            continue
+        for candidate in path.rglob("*"):
+            if not candidate.is_file():
+                continue
+            rel = candidate.relative_to(path).as_posix()
+            names = (rel, candidate.name)
+            if not any(fnmatch.fnmatch(n, pat) for pat in include for n in names):
+                continue
+            if any(fnmatch.fnmatch(n, pat) for pat in exclude for n in names):
+                continue
+            found.add(candidate)
+    return sorted(found)
+
+def _process_file(job):
+    """Pool worker: update (or check) one file; returns its new cache entry"""
+    path, include_h1, toc_heading, write = job
+    try:
+        changed = update_toc_file(path, include_h1, toc_heading, write)
+    except (OSError, UnicodeDecodeError) as e:
+        return path, None, None, f"{type(e).__name__}: {e}"
+    if changed and not write:
+        return path, True, None, None  # stale: nothing to cache
+    entry = {"stat": stat_key(path), "sha256": file_digest(path)}
+    return path, changed, entry, None
+
+def process_tree(paths, include=("*.md",), exclude=(), jobs=None, check=False,
+                 include_h1=False, toc_heading=DEFAULT_TOC_HEADING, cache_path=CACHE_PATH):
+    """
+    Update (or with check=True, only test) the TOC of every matching file.
+
+    Files whose size and mtime match the cache are skipped without being
+    read; files whose content hash matches are skipped without being
+    parsed. The rest fan out over a process pool. Returns a dict with
+    'changed', 'current', 'skipped' and 'errors' lists of paths.
+    """
+    settings = {"include_h1": include_h1, "toc_heading": toc_heading}
+    cache = load_cache(cache_path, settings) if cache_path else {}
+    files = collect_files(paths, include, exclude)
+
+    result = {"changed": [], "current": [], "skipped": [], "errors": []}
+    todo = []
+    for path in files:
+        key = str(path.resolve())
+        entry = cache.get(key)
+        if entry:
+            stat = stat_key(path)
+            if entry["stat"] == stat:
+                result["skipped"].append(path)
+                continue
+            if entry["sha256"] == file_digest(path):
+                entry["stat"] = stat  # touched but unchanged
+                result["skipped"].append(path)
+                continue
+        todo.append((path, include_h1, toc_heading, not check))
+
+    if len(todo) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(_process_file, todo, chunksize=max(1, len(todo) // 64)))
+    else:
+        outcomes = [_process_file(job) for job in todo]
+
+    for path, changed, entry, error in outcomes:
+        key = str(path.resolve())
+        if error:
+            result["errors"].append((path, error))
+            cache.pop(key, None)
+            continue
+        result["changed" if changed else "current"].append(path)
+        if entry:
+            cache[key] = entry
+        else:
+            cache.pop(key, None)
+
+    if cache_path:
+        save_cache(cache_path, settings, cache)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate or update the Table of Contents of markdown files.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="markdown file(s) or directories to process recursively")
+    parser.add_argument("--include", action="append", metavar="GLOB",
+                        help="glob for files inside directories (default: *.md, repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="glob to skip inside directories (repeatable)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--check", action="store_true",
+                        help="report stale TOCs and exit non-zero instead of writing")
+    parser.add_argument("--include-h1", action="store_true", help="list level-1 headings too")
+    parser.add_argument("--no-cache", action="store_true", help=f"ignore and do not update {CACHE_PATH}")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and regenerate TOCs whenever the files change")
+    parser.add_argument("--debounce", type=float, default=0.2, metavar="SECONDS",
+                        help="with --watch, wait this long after the last change (default 0.2)")
+    parser.add_argument("--poll", action="store_true", help="with --watch, poll instead of using inotify")
+    args = parser.parse_args(argv)
+
+    missing = [p for p in args.paths if not Path(p).exists()]
+    if missing:
+        print(f"Error: {missing[0]} not found")
+        sys.exit(1)
+
+    if args.watch:
+        from toc_watch import watch
+        include = tuple(args.include or ("*.md",))
+        watch(collect_files(args.paths, include, tuple(args.exclude)), include_h1=args.include_h1,
+              debounce=args.debounce, poll=args.poll)
+        return
+
+    result = process_tree(
+        args.paths,
+        include=tuple(args.include or ("*.md",)),
+        exclude=tuple(args.exclude),
+        jobs=args.jobs,
+        check=args.check,
+        include_h1=args.include_h1,
+        cache_path=None if args.no_cache else CACHE_PATH,
+    )
+
+    for path, error in result["errors"]:
+        print(f"Error: {path}: {error}")
+    for path in result["changed"]:
+        print(f"TOC out of date in {path}" if args.check else f"TOC updated in {path}")
+    up_to_date = len(result["current"]) + len(result["skipped"])
+    if up_to_date and (len(args.paths) > 1 or Path(args.paths[0]).is_dir()):
+        print(f"{up_to_date} file(s) already up to date ({len(result['skipped'])} unchanged since last run)")
+    elif up_to_date:
+        print(f"TOC already up to date in {args.paths[0]}")
+
+    if result["errors"] or (args.check and result["changed"]):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
-
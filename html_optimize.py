@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Image loading hints for index.html
+
+    python html_optimize.py [--root .] [--page index.html] [--write]
+
+Every <img> gets the intrinsic width and height of its image file, so the
+browser reserves its box before the image arrives and nothing below it
+shifts. Images after the first screen (site_css.first_screen: the header
+and hero) get loading="lazy" and decoding="async" and are only fetched as
+they scroll into view.
+
+The largest image of the first screen is the LCP (Largest Contentful Paint)
+candidate. An <img> gets fetchpriority="high". A CSS background, like the
+hero's, is invisible to the browser until the stylesheet has been downloaded
+and parsed, so a <link rel="preload" as="image" fetchpriority="high"> for it
+is added to <head>; for an image-set() background the first (AVIF) candidate
+is preloaded with its type, which browsers that cannot decode it skip.
+
+Attributes that are already present are kept, so the pass can run again
+over its own output. build_site.py applies it while building dist/; run on
+its own it prints what would change and the bytes fetched before first paint
+(everything the page requests on load, i.e. all but lazy images and linked
+documents), before and after. --write saves the page.
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from page_budget import DEFERRED_INITIATORS, _local_path, measure_page
+from site_css import critical_css, first_screen, minify_css
+from site_images import COMMENT_RE, IMG_TAG_RE, SRC_ATTR_RE
+
+ATTR_RE = re.compile(r'''\s([\w:-]+)(?:\s*=\s*(["'])(.*?)\2)?''', re.DOTALL)
+TAG_CLOSE_RE = re.compile(r'\s*/?>$')
+STYLESHEET_RE = re.compile(r'<link\b[^>]*\brel\s*=\s*["\']stylesheet["\'][^>]*>', re.IGNORECASE)
+HREF_ATTR_RE = re.compile(r'''\shref\s*=\s*(["'])(.*?)\1''', re.IGNORECASE)
+
+CSS_RULE_BODY_RE = re.compile(r'\{([^{}]*)\}')
+BACKGROUND_RE = re.compile(r'background(?:-image)?\s*:\s*([^;}]*)', re.IGNORECASE)
+URL_RE = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+IMAGE_SET_FIRST_RE = re.compile(
+    r'''image-set\(\s*url\(\s*(["']?)([^"')]+)\1\s*\)(?:\s*type\(\s*["']([^"']+)["']\s*\))?''')
+
+
+def tag_attributes(tag):
+    """{lowercased name: value} for the attributes of one start tag"""
+    body = TAG_CLOSE_RE.sub('', re.sub(r'^<[\w-]+', '', tag))
+    return {m.group(1).lower(): m.group(3) or '' for m in ATTR_RE.finditer(body)}
+
+
+def add_attributes(tag, attrs):
+    """
+    Append the attributes of `attrs` that `tag` does not have yet. A tag
+    written one attribute per line gets the new ones on lines of their own.
+    """
+    present = tag_attributes(tag)
+    new = [(name, value) for name, value in attrs.items() if name not in present]
+    if not new:
+        return tag
+    close = TAG_CLOSE_RE.search(tag)
+    head, tail = tag[:close.start()], tag[close.start():]
+    lines = tag.split('\n')
+    if len(lines) > 2:
+        indent = re.match(r'[ \t]*', lines[1]).group(0)
+        return head + ''.join(f'\n{indent}{name}="{value}"' for name, value in new) + tail
+    return head + ''.join(f' {name}="{value}"' for name, value in new) + tail
+
+
+def image_size(path):
+    """(width, height) in pixels, or None when the file cannot be read as an image"""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:  # reads the header only
+            return img.size
+    except (OSError, ValueError):
+        return None
+
+
+def fold_offset(html):
+    """Offset in `html` where the first screen ends"""
+    body = html.find('<body')
+    if body < 0:
+        return len(html)
+    return body + len(first_screen(html))
+
+
+def linked_css(html, root):
+    """The contents of the page's local stylesheets"""
+    sheets = []
+    for link in STYLESHEET_RE.findall(html):
+        href = HREF_ATTR_RE.search(link)
+        path = _local_path(root, root, href.group(2)) if href else None
+        if path and os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                sheets.append(f.read())
+    return '\n'.join(sheets)
+
+
+def background_images(css, fragment):
+    """
+    Background images of the rules that apply to `fragment`, as
+    {'url', 'preload', 'type'}: `url` is the plain url() (used to size the
+    image), `preload` the URL a browser fetches first (the first image-set()
+    candidate when there is one) and `type` that candidate's MIME type.
+    """
+    found = []
+    for body in CSS_RULE_BODY_RE.findall(critical_css(minify_css(css), fragment)):
+        plain, preferred = None, None
+        for value in BACKGROUND_RE.findall(body):
+            image_set = IMAGE_SET_FIRST_RE.search(value)
+            if image_set:
+                preferred = preferred or image_set
+            elif plain is None:
+                url = URL_RE.search(value)
+                plain = url.group(2) if url else None
+        if plain or preferred:
+            found.append({
+                'url': plain or preferred.group(2),
+                'preload': preferred.group(2) if preferred else plain,
+                'type': preferred.group(3) if preferred else None,
+            })
+    return found
+
+
+def _preload_link(image, indent):
+    type_attr = f' type="{image["type"]}"' if image['type'] else ''
+    return (f'{indent}<link rel="preload" as="image" href="{image["preload"]}"{type_attr} '
+            f'fetchpriority="high" />\n')
+
+
+def optimize_html(html, root='.', css=None):
+    """
+    Add image loading hints to `html`, whose URLs resolve against `root`.
+    `css` is the stylesheet text (default: the page's linked stylesheets).
+
+    Returns (html, changes) with changes = {'sized': [urls], 'lazy': [urls],
+    'lcp': url or None, 'lcp_source': 'img' / 'css' / None, 'preload': href
+    or None}.
+    """
+    if css is None:
+        css = linked_css(html, root)
+    comments = [m.span() for m in COMMENT_RE.finditer(html)]
+    fold = fold_offset(html)
+    changes = {'sized': [], 'lazy': [], 'lcp': None, 'lcp_source': None, 'preload': None}
+
+    # The LCP candidate: the largest image of the first screen, <img> or background
+    images = []
+    for match in IMG_TAG_RE.finditer(html):
+        if any(start <= match.start() < end for start, end in comments):
+            continue
+        src = SRC_ATTR_RE.search(match.group(0))
+        path = _local_path(root, root, src.group(2)) if src else None
+        size = image_size(path) if path and os.path.isfile(path) else None
+        images.append((match, src.group(2) if src else None, size))
+    candidates = [((size[0] * size[1]) if size else 0, 'img', match.start()) for match, _, size in images
+                  if match.start() < fold]
+    backgrounds = background_images(css, first_screen(html))
+    for i, image in enumerate(backgrounds):
+        path = _local_path(root, root, image['url'])
+        size = image_size(path) if path and os.path.isfile(path) else None
+        candidates.append(((size[0] * size[1]) if size else 0, 'css', i))
+    lcp = max(candidates, key=lambda c: c[0], default=None)
+    if lcp is not None and lcp[0] == 0:
+        lcp = None
+
+    out, last = [], 0
+    for match, src, size in images:
+        attrs = {}
+        if size:
+            attrs['width'], attrs['height'] = size
+        if match.start() >= fold:
+            attrs['loading'] = 'lazy'
+            attrs['decoding'] = 'async'
+        elif lcp is not None and lcp[1:] == ('img', match.start()):
+            attrs['fetchpriority'] = 'high'
+        else:
+            attrs['decoding'] = 'async'
+        tag = add_attributes(match.group(0), attrs)
+        if tag != match.group(0):
+            present = tag_attributes(match.group(0))
+            if size and 'width' not in present:
+                changes['sized'].append(src)
+            if attrs.get('loading') and 'loading' not in present:
+                changes['lazy'].append(src)
+        out.append(html[last:match.start()])
+        out.append(tag)
+        last = match.end()
+    out.append(html[last:])
+    html = ''.join(out)
+
+    if lcp is not None:
+        if lcp[1] == 'img':
+            changes['lcp'] = next(src for match, src, _ in images if match.start() == lcp[2])
+            changes['lcp_source'] = 'img'
+        else:
+            image = backgrounds[lcp[2]]
+            changes['lcp'], changes['lcp_source'] = image['url'], 'css'
+            preloaded = re.search(r'<link\b[^>]*\brel\s*=\s*["\']preload["\'][^>]*\bhref\s*=\s*["\']'
+                                  + re.escape(image['preload']) + '["\']', html)
+            head_end = html.find('</head>')
+            if preloaded is None and head_end >= 0:
+                # after the <meta> tags, ahead of the first <link> (stylesheets, fonts)
+                first_link = html.find('<link', 0, head_end)
+                at = first_link if first_link >= 0 else head_end
+                metas = list(re.finditer(r'<meta\b[^>]*>', html[:at], re.IGNORECASE))
+                if metas:
+                    line_start = html.rfind('\n', 0, metas[-1].start()) + 1
+                    at = html.find('\n', metas[-1].end()) + 1 or metas[-1].end()
+                else:
+                    line_start = at = html.rfind('\n', 0, at) + 1
+                indent = re.match(r'[ \t]*', html[line_start:]).group(0)
+                html = html[:at] + _preload_link(image, indent) + html[at:]
+                changes['preload'] = image['preload']
+    return html, changes
+
+
+def early_bytes(run):
+    """Transfer bytes of everything a page run (page_budget.measure_page) fetches on load"""
+    return sum(r['transfer'] for r in run['resources'].values()
+               if r['initiator'] not in DEFERRED_INITIATORS)
+
+
+def print_report(changes, before, after):
+    for url in changes['sized']:
+        print(f"width/height: {url}")
+    for url in changes['lazy']:
+        print(f"lazy:         {url}")
+    if changes['lcp']:
+        how = f"preload {changes['preload']}" if changes['preload'] else 'already preloaded'
+        if changes['lcp_source'] == 'img':
+            how = 'fetchpriority="high"'
+        print(f"LCP image:    {changes['lcp']} ({'CSS background' if changes['lcp_source'] == 'css' else '<img>'}; "
+              f"{how})")
+    print()
+    print(f"{'':24s} {'before':>12s} {'after':>12s}")
+    for label, fn in (('fetched on load (KiB)', early_bytes),
+                      ('deferred (KiB)', lambda run: run['totals']['total']['transfer'] - early_bytes(run))):
+        print(f"{label:24s} {fn(before) / 1024:12,.1f} {fn(after) / 1024:12,.1f}")
+    saved = early_bytes(before) - early_bytes(after)
+    print(f"Bytes before first paint: {early_bytes(before):,} -> {early_bytes(after):,} ({-saved:+,})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add image loading hints to index.html')
+    parser.add_argument('--root', default='.', help="site directory holding the page (default '.')")
+    parser.add_argument('--page', default='index.html', help='page to optimize (default index.html)')
+    parser.add_argument('--write', action='store_true', help='save the optimized page (default: report only)')
+    args = parser.parse_args(argv)
+
+    path = os.path.join(args.root, args.page)
+    if not os.path.isfile(path):
+        print(f"Error: {path} not found")
+        sys.exit(1)
+    with open(path, encoding='utf-8') as f:
+        original = f.read()
+
+    html, changes = optimize_html(original, args.root)
+    before = measure_page(args.root, args.page, html=original)
+    after = measure_page(args.root, args.page, html=html)
+    print_report(changes, before, after)
+
+    if args.write and html != original:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Page-weight budget check for the website
+
+    python page_budget.py [--root dist] [--budget image=800] [--viewport 1440]
+    python page_budget.py --trend               # page weight over the recorded runs
+
+index.html is parsed and every local resource it pulls in is resolved: the
+images (the <picture>/srcset candidate a browser of --viewport CSS pixels
+would pick), stylesheets and the url()/image-set() images they use, scripts
+and linked documents such as the capability statement PDF. For each one the
+raw size and the compressed transfer size are computed: precompressed .gz/.br
+siblings are used when they exist (dist/), otherwise gzip -9 (and brotli,
+when installed) is applied in memory to text types. Images and PDFs that do
+not shrink are counted as-is.
+
+Transfer bytes are checked against a budget per resource type and for the
+whole page (see BUDGETS; override with --budgets FILE.json or --budget
+TYPE=KiB). Every run is appended to .cache/page_budget/history.json, and the
+exit status is 1 when a budget is exceeded.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+try:
+    import brotli
+except ImportError:  # optional: brotli sizes are skipped without it
+    brotli = None
+
+from build_common import COMPRESSIBLE_EXTENSIONS, git_commit
+
+HISTORY_PATH = '.cache/page_budget/history.json'
+
+# Transfer-size budgets in KiB, per resource type plus 'total' for the whole page
+BUDGETS = {
+    'html': 30,
+    'css': 20,
+    'script': 10,
+    'image': 800,
+    'font': 150,
+    'document': 1400,
+    'total': 2200,
+}
+
+RESOURCE_TYPES = {
+    '.html': 'html', '.htm': 'html',
+    '.css': 'css',
+    '.js': 'script', '.mjs': 'script',
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.gif': 'image', '.webp': 'image',
+    '.avif': 'image', '.svg': 'image', '.ico': 'image',
+    '.woff': 'font', '.woff2': 'font', '.ttf': 'font', '.otf': 'font',
+    '.pdf': 'document',
+}
+
+# Viewport width in CSS pixels used to pick srcset candidates (device pixel ratio 1)
+DEFAULT_VIEWPORT = 1440
+
+# Initiators of resources that are not fetched on load (lazy images, linked documents)
+DEFERRED_INITIATORS = ('img (lazy)', 'a')
+
+# Keep this many runs in the history file
+HISTORY_LIMIT = 500
+
+
+def resource_type(path):
+    return RESOURCE_TYPES.get(os.path.splitext(path)[1].lower(), 'other')
+
+
+# ---------------------------------------------------------------- responsive images
+
+CSS_LENGTH_RE = re.compile(r'([+-]?(?:\d+(?:\.\d*)?|\.\d+))(px|vw|rem|em)?', re.IGNORECASE)
+SIZES_ENTRY_RE = re.compile(r'\s*(\([^()]*\)(?:\s+and\s+\([^()]*\))*)?\s*(.*?)\s*')
+
+
+def _css_length(value, viewport):
+    """A px, em/rem (16px), vw or unitless length in CSS pixels; None for anything else (calc(), %, ch...)"""
+    match = CSS_LENGTH_RE.fullmatch(value.strip())
+    if not match:
+        return None
+    number, unit = float(match.group(1)), (match.group(2) or '').lower()
+    if unit == 'vw':
+        return number * viewport / 100
+    if unit in ('em', 'rem'):
+        return number * 16
+    return number
+
+
+def _media_matches(media, viewport):
+    """Evaluate the (min-width)/(max-width) conditions of a media query; others are assumed true"""
+    for kind, value in re.findall(r'\(\s*(min|max)-width\s*:\s*([^)]+)\)', media or ''):
+        width = _css_length(value, viewport)
+        if width is None:
+            continue
+        if (kind == 'min' and viewport < width) or (kind == 'max' and viewport > width):
+            return False
+    return True
+
+
+def slot_width(sizes, viewport):
+    """
+    Rendered width in CSS pixels given a `sizes` attribute (the first
+    matching entry wins); the viewport width when that entry's length is
+    not one _css_length() evaluates
+    """
+    for entry in (sizes or '100vw').split(','):
+        match = SIZES_ENTRY_RE.fullmatch(entry)
+        if match.group(2) and _media_matches(match.group(1), viewport):
+            width = _css_length(match.group(2), viewport)
+            return viewport if width is None else width
+    return viewport
+
+
+def pick_candidate(srcset, sizes, viewport):
+    """The srcset URL a browser would fetch: the narrowest candidate covering the slot"""
+    candidates = []
+    for item in srcset.split(','):
+        parts = item.split()
+        if not parts:
+            continue
+        descriptor = parts[1] if len(parts) > 1 else '1x'
+        if descriptor.endswith('w'):
+            width = float(descriptor[:-1])
+        else:  # density descriptor: 1x fits a slot of any width
+            width = float(descriptor.rstrip('x')) * viewport
+        candidates.append((width, parts[0]))
+    if not candidates:
+        return None
+    needed = slot_width(sizes, viewport)
+    fitting = [c for c in candidates if c[0] >= needed]
+    return min(fitting)[1] if fitting else max(candidates)[1]
+
+
+# ---------------------------------------------------------------- page parsing
+
+CSS_URL_RE = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+IMAGE_SET_RE = re.compile(r'image-set\(')
+
+
+def css_references(css):
+    """
+    Local url()s a stylesheet actually loads. Within a rule the last
+    declaration of a property wins, and an image-set() loads its first
+    candidate only (every browser that supports it supports AVIF/WebP).
+    """
+    urls = []
+    for body in re.findall(r'\{([^{}]*)\}', re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)):
+        winners = {}
+        for declaration in body.split(';'):
+            prop, sep, value = declaration.partition(':')
+            if sep and 'url(' in value:
+                winners[prop.strip().lower()] = value
+        for value in winners.values():
+            image_set = IMAGE_SET_RE.search(value)
+            found = CSS_URL_RE.search(value, image_set.end() if image_set else 0)
+            if found:
+                urls.append(found.group(2))
+    # @import and @font-face sources outside rule bodies are rare here but count too
+    urls.extend(re.findall(r'''@import\s+(?:url\()?\s*["']([^"']+)["']''', css))
+    return urls
+
+
+class _PageParser(HTMLParser):
+    """Collects (url, initiator) pairs for everything index.html loads or links to"""
+
+    def __init__(self, viewport):
+        super().__init__(convert_charrefs=True)
+        self.viewport = viewport
+        self.refs = []
+        self.inline_css = []
+        self._picture_pick = None  # URL chosen from the <source>s of the open <picture>
+        self._in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        a = {name: (value or '') for name, value in attrs}
+        if tag == 'picture':
+            self._picture_pick = None
+        elif tag == 'source' and 'srcset' in a and self._picture_pick is None:
+            if _media_matches(a.get('media'), self.viewport):
+                self._picture_pick = pick_candidate(a['srcset'], a.get('sizes'), self.viewport)
+        elif tag == 'img':
+            url = self._picture_pick
+            if url is None and a.get('srcset'):
+                url = pick_candidate(a['srcset'], a.get('sizes'), self.viewport)
+            url = url or a.get('src')
+            if url:
+                self.refs.append((url, 'img (lazy)' if a.get('loading', '').lower() == 'lazy' else 'img'))
+        elif tag == 'link':
+            rel = a.get('rel', '').lower().split()
+            if a.get('href') and {'stylesheet', 'preload', 'icon'} & set(rel):
+                self.refs.append((a['href'], 'link'))
+        elif tag == 'script' and a.get('src'):
+            self.refs.append((a['src'], 'script'))
+        elif tag == 'a' and a.get('href') and resource_type(urlsplit(a['href']).path) == 'document':
+            self.refs.append((a['href'], 'a'))
+        elif tag == 'style':
+            self._in_style = True
+        if a.get('style'):
+            self.inline_css.append('x{' + a['style'] + '}')
+
+    def handle_endtag(self, tag):
+        if tag == 'picture':
+            self._picture_pick = None
+        elif tag == 'style':
+            self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            self.inline_css.append(data)
+
+
+def _local_path(root, base_dir, url):
+    """Filesystem path for a same-site URL, or None for external/data URLs"""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    rel = unquote(parts.path)
+    base = root if rel.startswith('/') else base_dir
+    return os.path.normpath(os.path.join(base, rel.lstrip('/')))
+
+
+def collect_resources(root, page='index.html', viewport=DEFAULT_VIEWPORT, html=None):
+    """
+    Resolve everything `page` loads. Returns (resources, external): resources
+    maps root-relative paths to {'type', 'initiator', 'path'}; external lists
+    third-party URLs, which are reported but not weighed. `html` replaces the
+    page's file contents (to weigh a rewritten page before it is saved).
+    """
+    page_path = os.path.join(root, page)
+    if html is None:
+        with open(page_path, encoding='utf-8') as f:
+            html = f.read()
+    parser = _PageParser(viewport)
+    parser.feed(html)
+    parser.close()
+
+    resources = {page: {'type': 'html', 'initiator': 'page', 'path': page_path}}
+    external = []
+    queue = [(url, initiator, root) for url, initiator in parser.refs]
+    queue += [(url, 'inline css', root) for css in parser.inline_css for url in css_references(css)]
+    while queue:
+        url, initiator, base_dir = queue.pop(0)
+        path = _local_path(root, base_dir, url)
+        if path is None:
+            if not url.startswith(('data:', '#', 'mailto:', 'tel:')):
+                external.append(url)
+            continue
+        key = os.path.relpath(path, root)
+        if key in resources:
+            continue
+        kind = resource_type(path)
+        resources[key] = {'type': kind, 'initiator': initiator, 'path': path}
+        if kind == 'css' and os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                css = f.read()
+            queue += [(ref, key, os.path.dirname(path)) for ref in css_references(css)]
+    return resources, external
+
+
+# ---------------------------------------------------------------- weighing
+
+def _compressed_sizes(data):
+    sizes = {'gz': len(gzip.compress(data, compresslevel=9, mtime=0)), 'br': None}
+    if brotli is not None:
+        sizes['br'] = len(brotli.compress(data, quality=11))
+    return sizes
+
+
+def weigh(path):
+    """{'bytes', 'gz', 'br', 'transfer'} for one file (None sizes when not applicable)"""
+    raw = os.path.getsize(path)
+    sizes = {'bytes': raw, 'gz': None, 'br': None}
+    siblings = {ext: f'{path}.{ext}' for ext in ('gz', 'br')}
+    if any(os.path.exists(p) for p in siblings.values()):
+        for ext, sibling in siblings.items():
+            if os.path.exists(sibling):
+                sizes[ext] = os.path.getsize(sibling)
+    elif path.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+        with open(path, 'rb') as f:
+            sizes.update(_compressed_sizes(f.read()))
+    sizes['transfer'] = min(v for v in sizes.values() if v is not None)
+    return sizes
+
+
+def measure_page(root, page='index.html', viewport=DEFAULT_VIEWPORT, html=None):
+    """
+    Weigh every resource of the page; returns the run record (without budget
+    results). With `html`, the page itself is weighed from that text.
+    """
+    resources, external = collect_resources(root, page, viewport, html)
+    missing = []
+    for key, info in resources.items():
+        path = info.pop('path')
+        if key == page and html is not None:
+            data = html.encode('utf-8')
+            info.update({'bytes': len(data), **_compressed_sizes(data)})
+            info['transfer'] = min(v for v in (info['bytes'], info['gz'], info['br']) if v is not None)
+        elif os.path.isfile(path):
+            info.update(weigh(path))
+        else:
+            missing.append(key)
+    for key in missing:
+        del resources[key]
+
+    totals = {}
+    for info in resources.values():
+        t = totals.setdefault(info['type'], {'count': 0, 'bytes': 0, 'transfer': 0})
+        t['count'] += 1
+        t['bytes'] += info['bytes']
+        t['transfer'] += info['transfer']
+    totals['total'] = {k: sum(t[k] for t in list(totals.values())) for k in ('count', 'bytes', 'transfer')}
+    return {'root': root, 'viewport': viewport, 'resources': resources, 'totals': totals,
+            'missing': missing, 'external': sorted(set(external))}
+
+
+def check_budgets(totals, budgets):
+    """Messages for every type (or the total) whose transfer bytes exceed its budget"""
+    problems = []
+    for kind, limit_kib in budgets.items():
+        used = totals.get(kind, {}).get('transfer', 0)
+        if used > limit_kib * 1024:
+            problems.append(f"{kind}: {used / 1024:,.1f} KiB > budget {limit_kib:,} KiB "
+                            f"(+{used / 1024 - limit_kib:,.1f} KiB)")
+    return problems
+
+
+def load_history(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def append_history(path, run):
+    history = load_history(path)
+    history.append(run)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history[-HISTORY_LIMIT:], f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------------- output
+
+def _kib(n):
+    return f"{n / 1024:,.1f}" if n is not None else '-'
+
+
+def print_report(run, budgets):
+    print(f"{'resource':60s} {'type':9s} {'raw KiB':>10s} {'gzip':>9s} {'brotli':>9s} {'transfer':>9s}")
+    ordered = sorted(run['resources'].items(), key=lambda item: -item[1]['transfer'])
+    for key, r in ordered:
+        print(f"{key:60s} {r['type']:9s} {_kib(r['bytes']):>10s} {_kib(r['gz']):>9s} {_kib(r['br']):>9s} "
+              f"{_kib(r['transfer']):>9s}")
+    print()
+    print(f"{'type':9s} {'files':>5s} {'raw KiB':>10s} {'transfer':>10s} {'budget':>10s}")
+    for kind, t in sorted(run['totals'].items(), key=lambda item: item[0] == 'total'):
+        budget = f"{budgets[kind]:,}" if kind in budgets else '-'
+        flag = ' over' if kind in budgets and t['transfer'] > budgets[kind] * 1024 else ''
+        print(f"{kind:9s} {t['count']:5d} {_kib(t['bytes']):>10s} {_kib(t['transfer']):>10s} {budget:>10s}{flag}")
+    for key in run['missing']:
+        print(f"Warning: {key} is referenced but does not exist")
+    if run['external']:
+        print(f"Not weighed (third-party): {', '.join(run['external'])}")
+
+
+def print_trend(history, limit):
+    print(f"{'timestamp':25s} {'commit':10s} {'root':8s} {'total KiB':>10s} {'image KiB':>10s} {'status':>7s}")
+    previous = {}
+    for run in history[-limit:]:
+        totals = run['totals']
+        total = totals['total']['transfer']
+        change = ''
+        if run['root'] in previous:
+            change = f" ({(total - previous[run['root']]) / 1024:+,.1f})"
+        previous[run['root']] = total
+        print(f"{run['timestamp']:25s} {(run.get('commit') or '-')[:10]:10s} {run['root']:8s} "
+              f"{_kib(total):>10s} {_kib(totals.get('image', {}).get('transfer', 0)):>10s} "
+              f"{'ok' if run['passed'] else 'OVER':>7s}{change}")
+
+
+def _parse_budget(text):
+    kind, sep, value = text.partition('=')
+    if not sep or kind not in BUDGETS:
+        raise argparse.ArgumentTypeError(f"expected TYPE=KiB with TYPE one of {', '.join(BUDGETS)}")
+    return kind, float(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the page weight of the website against budgets')
+    parser.add_argument('--root', default='.', help="site directory holding index.html (default '.'; "
+                                                    "use dist to check the build)")
+    parser.add_argument('--page', default='index.html', help='page to weigh (default index.html)')
+    parser.add_argument('--viewport', type=int, default=DEFAULT_VIEWPORT,
+                        help=f'viewport width for srcset selection (default {DEFAULT_VIEWPORT})')
+    parser.add_argument('--budgets', help='JSON file of {type: KiB} overriding the defaults')
+    parser.add_argument('--budget', type=_parse_budget, action='append', default=[],
+                        help='override one budget, e.g. image=600 (repeatable)')
+    parser.add_argument('--history', default=HISTORY_PATH, help=f'history file (default {HISTORY_PATH})')
+    parser.add_argument('--no-history', action='store_true', help='do not record this run')
+    parser.add_argument('--trend', type=int, nargs='?', const=20, metavar='N',
+                        help='print the last N recorded runs (default 20) and exit')
+    parser.add_argument('--json', action='store_true', help='print the run record as JSON')
+    args = parser.parse_args(argv)
+
+    if args.trend:
+        history = load_history(args.history)
+        if not history:
+            print(f"No runs recorded in {args.history}")
+            sys.exit(1)
+        print_trend(history, args.trend)
+        return
+
+    budgets = dict(BUDGETS)
+    if args.budgets:
+        with open(args.budgets, encoding='utf-8') as f:
+            budgets.update(json.load(f))
+    budgets.update(args.budget)
+
+    if not os.path.isfile(os.path.join(args.root, args.page)):
+        print(f"Error: {os.path.join(args.root, args.page)} not found")
+        sys.exit(1)
+
+    run = measure_page(args.root, args.page, args.viewport)
+    problems = check_budgets(run['totals'], budgets)
+    run = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'commit': git_commit(),
+           'budgets': budgets, 'passed': not problems, **run}
+
+    if args.json:
+        print(json.dumps(run, indent=2))
+    else:
+        print_report(run, budgets)
+    if not args.no_history:
+        append_history(args.history, run)
+
+    if problems:
+        print('Over budget:')
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    if not args.json:
+        print(f"Within budget ({_kib(run['totals']['total']['transfer'])} KiB transferred)")
+
+
+if __name__ == '__main__':
+    main()
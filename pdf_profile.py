@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Profile where the bytes of a PDF go
+
+    python pdf_profile.py capability_statement.pdf data/kelliAI_sheet.pdf
+    python pdf_profile.py capability_statement.pdf --json .cache/pdf_profile.json
+    python pdf_profile.py dist/capability_statement.pdf --compare .cache/pdf_profile.json
+
+Walks the object graph (pikepdf) and attributes every object's bytes to one
+category: images (image XObjects and their soft masks), fonts (font
+dictionaries, descriptors, embedded font programs, ToUnicode maps), content
+(page content streams, form XObjects, patterns and graphics states),
+metadata (XMP and the document info dictionary), tagging (the structure
+tree of tagged PDFs) and structure (catalog, page tree, annotations, cross
+reference data and whatever else is left). Objects packed in object
+streams get their share of the compressed stream.
+
+Image XObjects (and font programs) embedded more than once with identical
+data are flagged, and every placement of an image (found by following the transformation
+matrix through page and form content streams) is reported with its
+effective DPI. The report can be written as JSON; --fail-on-duplicates and
+--compare (against an earlier JSON report) exit 1 on redundant or grown
+payload, so a build can gate on them.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+
+try:
+    import pikepdf
+except ImportError:  # optional dependency; main() explains how to install it
+    pikepdf = None
+
+CATEGORIES = ('images', 'fonts', 'content', 'metadata', 'tagging', 'structure')
+
+# Keys that lead back up the page or structure tree rather than into an object's own data
+BACK_REFERENCES = frozenset(('/Parent', '/P', '/Pg', '/Obj', '/StructParent', '/StructParents'))
+
+# Approximate per-object overhead of "N 0 obj ... endobj" plus its xref entry
+OBJECT_OVERHEAD = 40
+
+# Placements printed per image in the text report
+PLACEMENTS_SHOWN = 3
+
+
+def _object_sizes(pdf):
+    """
+    {objgen: bytes} for every indirect object. Objects inside object streams
+    get a share of the compressed stream proportional to their serialized
+    length; the object streams themselves are not counted separately.
+    """
+    sizes = {}
+    packed = {}
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Object) or not obj.is_indirect:
+            continue
+        if isinstance(obj, pikepdf.Stream):
+            if obj.get('/Type') == '/ObjStm':
+                packed[obj.objgen] = obj
+                continue
+            sizes[obj.objgen] = len(obj.stream_dict.unparse()) + len(obj.read_raw_bytes()) + OBJECT_OVERHEAD
+        else:
+            sizes[obj.objgen] = len(obj.unparse()) + OBJECT_OVERHEAD
+
+    for stream in packed.values():
+        data = stream.read_bytes()
+        first = int(stream.First)
+        header = data[:first].split()
+        numbers = [int(n) for n in header[0::2]]
+        offsets = [int(n) for n in header[1::2]] + [len(data) - first]
+        body = max(len(data) - first, 1)
+        compressed = len(stream.read_raw_bytes()) + len(stream.stream_dict.unparse()) + OBJECT_OVERHEAD
+        for k, number in enumerate(numbers):
+            sizes[(number, 0)] = compressed * (offsets[k + 1] - offsets[k]) / body
+    return sizes
+
+
+class _Attribution:
+    """Claims indirect objects for categories; the first claim wins"""
+
+    def __init__(self):
+        self.owner = {}
+
+    def claim(self, obj, category, follow=True):
+        """Claim `obj` and, with `follow`, everything it references that is still unclaimed"""
+        stack = [obj]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, pikepdf.Object):
+                continue
+            if item.is_indirect:
+                if item.objgen in self.owner:
+                    continue
+                self.owner[item.objgen] = category
+                if not follow:
+                    continue
+            if isinstance(item, pikepdf.Stream):
+                item = item.stream_dict
+            if isinstance(item, pikepdf.Dictionary):
+                stack.extend(value for key, value in item.items() if key not in BACK_REFERENCES)
+            elif isinstance(item, pikepdf.Array):
+                stack.extend(item)
+
+
+def _resources(obj):
+    res = obj.get('/Resources')
+    return res if isinstance(res, pikepdf.Dictionary) else None
+
+
+def _claim_resources(attr, resources, seen):
+    """Claim fonts, images and graphics resources, descending into forms and patterns"""
+    if resources is None or resources.objgen in seen and resources.is_indirect:
+        return
+    if resources.is_indirect:
+        seen.add(resources.objgen)
+    for font in resources.get('/Font', {}).values():
+        attr.claim(font, 'fonts')
+    for xobject in resources.get('/XObject', {}).values():
+        if xobject.get('/Subtype') == '/Image':
+            attr.claim(xobject, 'images')
+        elif xobject.get('/Subtype') == '/Form':
+            _claim_resources(attr, _resources(xobject), seen)
+            attr.claim(xobject, 'content')
+    for key in ('/Pattern', '/Shading', '/ExtGState', '/ColorSpace', '/Properties'):
+        for value in resources.get(key, {}).values():
+            if isinstance(value, (pikepdf.Dictionary, pikepdf.Stream)):
+                _claim_resources(attr, _resources(value), seen)
+            attr.claim(value, 'content')
+    attr.claim(resources, 'content', follow=False)
+
+
+def _multiply(m, n):
+    """Matrix product m x n of PDF [a b c d e f] matrices"""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D,
+            e * A + f * C + E, e * B + f * D + F)
+
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _placements(stream_owner, resources, ctm, page_number, found, depth=0):
+    """Record (page, image objgen, ctm) for every image drawn by a content stream, following forms"""
+    if resources is None or depth > 12:
+        return
+    xobjects = resources.get('/XObject', {})
+    stack = []
+    for operands, operator in pikepdf.parse_content_stream(stream_owner):
+        op = str(operator)
+        if op == 'q':
+            stack.append(ctm)
+        elif op == 'Q':
+            ctm = stack.pop() if stack else IDENTITY
+        elif op == 'cm':
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif op == 'Do':
+            xobject = xobjects.get(str(operands[0]))
+            if xobject is None:
+                continue
+            if xobject.get('/Subtype') == '/Image':
+                found.append((page_number, xobject.objgen, ctm))
+            elif xobject.get('/Subtype') == '/Form':
+                matrix = tuple(float(v) for v in xobject.get('/Matrix', IDENTITY))
+                _placements(xobject, _resources(xobject) or resources, _multiply(matrix, ctm),
+                            page_number, found, depth + 1)
+
+
+def _names(value):
+    """'DCTDecode' for /DCTDecode, 'FlateDecode+DCTDecode' for arrays, 'none' when absent"""
+    if value is None:
+        return 'none'
+    if isinstance(value, pikepdf.Array):
+        return '+'.join(str(v).lstrip('/') for v in value)
+    return str(value).lstrip('/')
+
+
+def _font_name(font):
+    base = str(font.get('/BaseFont', '')).lstrip('/')
+    return base or str(font.get('/Name', '?')).lstrip('/')
+
+
+def profile(path):
+    """Profile one PDF; returns the JSON-serializable report"""
+    file_size = os.path.getsize(path)
+    with pikepdf.open(path) as pdf:
+        sizes = _object_sizes(pdf)
+        attr = _Attribution()
+
+        # most specific roles first: anything they reference belongs to them
+        seen = set()
+        for page in pdf.pages:
+            _claim_resources(attr, _resources(page.obj), seen)
+        for page in pdf.pages:
+            if '/Contents' in page.obj:
+                attr.claim(page.obj.Contents, 'content')
+        if '/Metadata' in pdf.Root:
+            attr.claim(pdf.Root.Metadata, 'metadata')
+        if '/Info' in pdf.trailer:
+            attr.claim(pdf.trailer.Info, 'metadata')
+        for page in pdf.pages:
+            if '/Metadata' in page.obj:
+                attr.claim(page.obj.Metadata, 'metadata')
+        if '/StructTreeRoot' in pdf.Root:
+            attr.claim(pdf.Root.StructTreeRoot, 'tagging')
+
+        categories = {name: {'bytes': 0, 'objects': 0} for name in CATEGORIES}
+        for objgen, size in sizes.items():
+            entry = categories[attr.owner.get(objgen, 'structure')]
+            entry['bytes'] += size
+            entry['objects'] += 1
+        # xref tables, headers and dead revisions are whatever is left
+        categories['structure']['bytes'] += file_size - sum(sizes.values())
+        for entry in categories.values():
+            entry['bytes'] = round(entry['bytes'])
+            entry['share'] = round(entry['bytes'] / file_size, 4) if file_size else 0
+
+        found = []
+        for number, page in enumerate(pdf.pages, start=1):
+            if '/Contents' in page.obj:
+                _placements(page.obj, _resources(page.obj), IDENTITY, number, found)
+
+        images = {}
+        duplicates = {}
+        for obj in pdf.objects:
+            if not isinstance(obj, pikepdf.Stream) or obj.get('/Subtype') != '/Image':
+                continue
+            raw = obj.read_raw_bytes()
+            width, height = int(obj.get('/Width', 0)), int(obj.get('/Height', 0))
+            digest = hashlib.sha256(raw).hexdigest()
+            images[obj.objgen] = {
+                'object': f'{obj.objgen[0]} {obj.objgen[1]} R',
+                'width': width,
+                'height': height,
+                'bits': int(obj.get('/BitsPerComponent', 0)),
+                'filter': _names(obj.get('/Filter')),
+                'colorspace': str(obj.get('/ColorSpace', '?'))[:40] if '/ColorSpace' in obj else None,
+                'soft_mask': '/SMask' in obj,
+                'bytes': round(sizes.get(obj.objgen, len(raw))),
+                'sha256': digest[:16],
+                'placements': [],
+            }
+            duplicates.setdefault((digest, width, height), []).append(obj.objgen)
+
+        for obj in pdf.objects:
+            if isinstance(obj, pikepdf.Stream) and obj.objgen in images:
+                for key in ('/SMask', '/Mask'):
+                    mask = obj.get(key)
+                    if isinstance(mask, pikepdf.Stream) and mask.objgen in images:
+                        images[mask.objgen]['mask_of'] = images[obj.objgen]['object']
+
+        for page_number, objgen, ctm in found:
+            image = images.get(objgen)
+            if image is None:
+                continue
+            a, b, c, d = ctm[:4]
+            width_pt, height_pt = math.hypot(a, b), math.hypot(c, d)
+            image['placements'].append({
+                'page': page_number,
+                'width_pt': round(width_pt, 1),
+                'height_pt': round(height_pt, 1),
+                'dpi_x': round(image['width'] * 72 / width_pt, 1) if width_pt else None,
+                'dpi_y': round(image['height'] * 72 / height_pt, 1) if height_pt else None,
+            })
+        for image in images.values():
+            dpis = [min(p['dpi_x'] or 0, p['dpi_y'] or 0) for p in image['placements']]
+            image['min_dpi'] = min(dpis) if dpis else None
+
+        duplicate_groups = []
+        for objgens in duplicates.values():
+            if len(objgens) > 1:
+                each = images[objgens[0]]['bytes']
+                duplicate_groups.append({
+                    'kind': 'image',
+                    'objects': [images[o]['object'] for o in objgens],
+                    'width': images[objgens[0]]['width'],
+                    'height': images[objgens[0]]['height'],
+                    'bytes_each': each,
+                    'wasted_bytes': each * (len(objgens) - 1),
+                })
+
+        fonts = []
+        programs = {}
+        for objgen, category in attr.owner.items():
+            obj = pdf.get_object(objgen)
+            if category != 'fonts' or not isinstance(obj, pikepdf.Dictionary) or obj.get('/Type') != '/Font':
+                continue
+            if obj.get('/Subtype') in ('/CIDFontType0', '/CIDFontType2'):
+                continue  # listed through its Type0 parent
+            descriptor = obj.get('/FontDescriptor')
+            if descriptor is None and '/DescendantFonts' in obj:
+                descriptor = obj.DescendantFonts[0].get('/FontDescriptor')
+            program = None
+            if descriptor is not None:
+                program = next((descriptor[k] for k in ('/FontFile', '/FontFile2', '/FontFile3')
+                                if k in descriptor), None)
+            if program is not None:
+                digest = hashlib.sha256(program.read_raw_bytes()).hexdigest()
+                programs.setdefault(digest, {})[program.objgen] = _font_name(obj)
+            fonts.append({
+                'name': _font_name(obj),
+                'subtype': str(obj.get('/Subtype', '')).lstrip('/'),
+                'embedded': program is not None,
+                'program_bytes': round(sizes.get(program.objgen, 0)) if program is not None else 0,
+            })
+
+        # the same font program embedded under several font dictionaries
+        for embedded in programs.values():
+            if len(embedded) > 1:
+                objgens = list(embedded)
+                each = round(sizes.get(objgens[0], 0))
+                duplicate_groups.append({
+                    'kind': 'font',
+                    'name': next(iter(embedded.values())),
+                    'objects': [f'{o[0]} {o[1]} R' for o in objgens],
+                    'bytes_each': each,
+                    'wasted_bytes': each * (len(objgens) - 1),
+                })
+
+        largest = sorted(sizes.items(), key=lambda item: -item[1])[:10]
+        report = {
+            'file': path,
+            'bytes': file_size,
+            'pdf_version': pdf.pdf_version,
+            'pages': len(pdf.pages),
+            'objects': len(sizes),
+            'categories': categories,
+            'images': sorted(images.values(), key=lambda image: -image['bytes']),
+            'duplicates': sorted(duplicate_groups, key=lambda group: -group['wasted_bytes']),
+            'duplicate_bytes': sum(group['wasted_bytes'] for group in duplicate_groups),
+            'fonts': sorted(fonts, key=lambda font: -font['program_bytes']),
+            'largest_objects': [{'object': f'{o[0]} {o[1]} R', 'category': attr.owner.get(o, 'structure'),
+                                 'bytes': round(size)} for o, size in largest],
+        }
+    return report
+
+
+def compare(baseline, report, threshold):
+    """Messages for payload that grew beyond `threshold` (or new duplicate images) vs a baseline report"""
+    problems = []
+    if report['bytes'] > baseline['bytes'] * (1 + threshold):
+        problems.append(f"total: {baseline['bytes']:,} -> {report['bytes']:,} bytes "
+                        f"(+{report['bytes'] / baseline['bytes'] - 1:.0%})")
+    for name, entry in report['categories'].items():
+        old = baseline['categories'].get(name, {}).get('bytes', 0)
+        # small categories are noisy in relative terms; require 4 KiB of growth too
+        if entry['bytes'] > old * (1 + threshold) and entry['bytes'] - old > 4096:
+            problems.append(f"{name}: {old:,} -> {entry['bytes']:,} bytes")
+    if report['duplicate_bytes'] > baseline.get('duplicate_bytes', 0):
+        problems.append(f"duplicates: {baseline.get('duplicate_bytes', 0):,} -> "
+                        f"{report['duplicate_bytes']:,} redundant bytes")
+    return problems
+
+
+def _unplaced(image):
+    return f"soft mask of {image['mask_of']}" if image.get('mask_of') else 'not placed'
+
+
+def print_report(report):
+    size = report['bytes']
+    print(f"{report['file']}: {size:,} bytes, PDF {report['pdf_version']}, {report['pages']} page(s), "
+          f"{report['objects']} objects")
+    for name, entry in sorted(report['categories'].items(), key=lambda item: -item[1]['bytes']):
+        print(f"  {name:10s} {entry['bytes']:>12,} {entry['share']:7.1%} {entry['objects']:6d} objects")
+    if report['images']:
+        print(f"  {'image':10s} {'pixels':>11s} {'filter':>14s} {'bytes':>10s}  placements (page: size pt @ dpi)")
+        for image in report['images']:
+            shown = ', '.join(f"{p['page']}: {p['width_pt']:.0f}x{p['height_pt']:.0f} @ "
+                              f"{min(p['dpi_x'] or 0, p['dpi_y'] or 0):.0f}"
+                              for p in image['placements'][:PLACEMENTS_SHOWN])
+            more = len(image['placements']) - PLACEMENTS_SHOWN
+            shown += f" (+{more} more)" if more > 0 else ''
+            print(f"  {image['object']:10s} {image['width']:>5d}x{image['height']:<5d} {image['filter'][:14]:>14s} "
+                  f"{image['bytes']:>10,}  {shown or _unplaced(image)}")
+    for group in report['duplicates']:
+        what = (f"image {group['width']}x{group['height']}" if group['kind'] == 'image'
+                else f"font program {group['name']}")
+        print(f"  Duplicate {what} embedded {len(group['objects'])} times "
+              f"({', '.join(group['objects'])}): {group['wasted_bytes']:,} redundant bytes")
+    for font in report['fonts']:
+        embedded = f"embedded, {font['program_bytes']:,} bytes" if font['embedded'] else 'not embedded'
+        print(f"  font {font['name']} ({font['subtype']}, {embedded})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Attribute the bytes of PDF files to images, fonts, '
+                                                 'content and metadata')
+    parser.add_argument('pdf', nargs='+', help='PDF file(s) to profile')
+    parser.add_argument('--json', metavar='OUT', help="write the report(s) as JSON ('-' for stdout)")
+    parser.add_argument('--fail-on-duplicates', action='store_true',
+                        help='exit 1 when an image or font program is embedded more than once')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='earlier --json report; exit 1 when payload grew beyond --threshold')
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help='allowed growth for --compare (default 0.05)')
+    args = parser.parse_args(argv)
+
+    if pikepdf is None:
+        print("Error: pdf_profile.py needs pikepdf (pip install pikepdf)")
+        sys.exit(1)
+
+    reports = []
+    for path in args.pdf:
+        try:
+            reports.append(profile(path))
+        except (OSError, pikepdf.PdfError) as e:
+            print(f"Error: {path}: {e}")
+            sys.exit(1)
+
+    if args.json == '-':
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+        if args.json:
+            os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(reports, f, indent=2)
+                f.write('\n')
+            print(f"Report written to {args.json}")
+
+    problems = []
+    if args.fail_on_duplicates:
+        problems += [f"{r['file']}: {r['duplicate_bytes']:,} bytes of duplicate images/fonts"
+                     for r in reports if r['duplicates']]
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baselines = {r['file']: r for r in json.load(f)}
+        for report in reports:
+            baseline = baselines.get(report['file'])
+            if baseline is None and len(baselines) == len(reports) == 1:
+                baseline = next(iter(baselines.values()))  # one file against one baseline, e.g. a new path
+            if baseline is None:
+                print(f"Note: {report['file']} is not in {args.compare}")
+                continue
+            problems += [f"{report['file']} {p}" for p in compare(baseline, report, args.threshold)]
+    if problems:
+        print('Payload regressions:', file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Production-like static server for the dist/ build (stdlib asyncio)
+
+    python serve_dist.py [--port 8080] [--root dist] [--log]
+
+Behaves like a well-configured CDN origin, so load behaviour can be measured
+locally:
+    - content-hashed assets (name.0123456789.ext) are sent with
+      `Cache-Control: public, max-age=31536000, immutable`; everything else
+      with `no-cache` (revalidate every time)
+    - strong ETags and Last-Modified; If-None-Match / If-Modified-Since
+      answer 304 Not Modified
+    - precompressed `.br` / `.gz` siblings are chosen from Accept-Encoding
+      (with `Vary: Accept-Encoding`), never compressed on the fly
+    - single-range `Range: bytes=...` requests (206 / 416, If-Range), so PDF
+      viewers can fetch the capability statement progressively
+    - HTTP/1.1 keep-alive with an idle timeout; small files are served from
+      memory and large ones with sendfile, so thousands of concurrent
+      connections stay cheap
+"""
+
+import argparse
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import resource
+import sys
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote, urlsplit
+
+from build_common import DIST_DIR
+from capability_server import parse_etags
+
+# Names produced by site_images.py / build_site.py: stem.<10 hex>.ext or stem-<w>w.<10 hex>.ext
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{10}\.[A-Za-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Sidecar encodings in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Files up to this size are kept in memory; larger ones go out with sendfile
+MEMORY_LIMIT = 256 * 1024
+
+IDLE_TIMEOUT = 15.0
+MAX_HEADER_BYTES = 16 * 1024
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('text/javascript', '.js')
+
+
+class Entry:
+    """One representation of a file (identity or a precompressed sibling)"""
+
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'data')
+
+    def __init__(self, path, stat, suffix):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        with open(path, 'rb') as f:
+            data = f.read() if stat.st_size <= MEMORY_LIMIT else None
+            if data is None:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            else:
+                digest = hashlib.sha256(data)
+        self.data = data
+        self.etag = f'"{digest.hexdigest()[:32]}{suffix}"'
+
+
+class FileCache:
+    """Stat-validated cache of file representations, so hashing happens once per change"""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self._entries = {}
+
+    def lookup(self, url_path):
+        """Map a URL path to an existing file under the root, or None"""
+        rel = unquote(url_path).lstrip('/')
+        if '\x00' in rel:
+            return None  # os.path would raise ValueError
+        if not rel or rel.endswith('/'):
+            rel += 'index.html'
+        path = os.path.realpath(os.path.join(self.root, rel))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def entry(self, path, suffix=''):
+        """Entry for `path` (None when it does not exist)"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            return None
+        entry = self._entries.get(path)
+        if entry is None or entry.size != stat.st_size or entry.mtime != stat.st_mtime:
+            entry = self._entries[path] = Entry(path, stat, suffix)
+        return entry
+
+
+def _accepted_encodings(header):
+    """Content codings the client accepts (q > 0)"""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, 'unsatisfiable',
+    or None when the header should be ignored (malformed or multi-range).
+    """
+    match = re.fullmatch(r'\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*', header)
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return 'unsatisfiable'
+    if end < start:
+        return None
+    return start, end
+
+
+class StaticServer:
+    def __init__(self, root, log=False):
+        self.files = FileCache(root)
+        self.log = log
+        self.requests = 0
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        ConnectionError):
+                    return
+                keep_alive = await self._respond(head, writer)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _respond(self, head, writer):
+        """Answer one request; returns whether the connection stays open"""
+        self.requests += 1
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            self._send(writer, 400, {}, b'bad request\n', version='HTTP/1.1')
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = 'close' not in connection if version == 'HTTP/1.1' else 'keep-alive' in connection
+        extra = {'Connection': 'keep-alive' if keep_alive else 'close'}
+
+        if method not in ('GET', 'HEAD'):
+            # The request body (Content-Length or chunked) is never read, so
+            # the connection is closed rather than parsing it as a request
+            extra['Connection'] = 'close'
+            extra['Allow'] = 'GET, HEAD'
+            self._send(writer, 405, extra, b'method not allowed\n', version=version)
+            return False
+        path = self.files.lookup(urlsplit(target).path)
+        if path is None:
+            self._send(writer, 404, extra, b'not found\n', head_only=method == 'HEAD', version=version)
+            return keep_alive
+
+        status = 200
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/json':
+            content_type += '; charset=utf-8'
+        extra['Content-Type'] = content_type
+        extra['Cache-Control'] = IMMUTABLE if HASHED_NAME_RE.search(path) else REVALIDATE
+        extra['Accept-Ranges'] = 'bytes'
+
+        # Pick the representation: ranges always address the identity bytes
+        entry = self.files.entry(path)
+        range_header = headers.get('range')
+        sidecars = [(coding, ext) for coding, ext in ENCODINGS if os.path.exists(path + ext)]
+        if sidecars:
+            extra['Vary'] = 'Accept-Encoding'
+            if range_header is None:
+                accepted = _accepted_encodings(headers.get('accept-encoding', ''))
+                for coding, ext in sidecars:
+                    if coding in accepted:
+                        entry = self.files.entry(path + ext, suffix=f'-{ext[1:]}')
+                        extra['Content-Encoding'] = coding
+                        break
+
+        extra['ETag'] = entry.etag
+        extra['Last-Modified'] = formatdate(entry.mtime, usegmt=True)
+        if self._not_modified(headers, entry):
+            for name in ('Content-Type', 'Content-Encoding', 'Accept-Ranges'):
+                extra.pop(name, None)
+            self._send(writer, 304, extra, b'', head_only=True, version=version)
+            return keep_alive
+
+        start, end = 0, entry.size - 1
+        if range_header is not None and headers.get('if-range', entry.etag) == entry.etag:
+            span = parse_range(range_header, entry.size)
+            if span == 'unsatisfiable':
+                extra['Content-Range'] = f'bytes */{entry.size}'
+                self._send(writer, 416, extra, b'', version=version)
+                return keep_alive
+            if span is not None:
+                start, end = span
+                status = 206
+                extra['Content-Range'] = f'bytes {start}-{end}/{entry.size}'
+
+        length = end - start + 1 if entry.size else 0
+        extra['Content-Length'] = str(length)
+        writer.write(self._head(status, extra, version))
+        if method == 'GET' and length:
+            if entry.data is not None:
+                writer.write(entry.data[start:end + 1])
+            else:
+                await writer.drain()
+                with open(entry.path, 'rb') as f:
+                    await asyncio.get_running_loop().sendfile(writer.transport, f, start, length)
+        if self.log:
+            print(f"{method} {target} {status} {length} {extra.get('Content-Encoding', '-')}")
+        return keep_alive
+
+    @staticmethod
+    def _not_modified(headers, entry):
+        if 'if-none-match' in headers:
+            tags = parse_etags(headers['if-none-match'])
+            return entry.etag in tags or '*' in tags
+        if 'if-modified-since' in headers:
+            try:
+                since = parsedate_to_datetime(headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(entry.mtime) <= since
+        return False
+
+    @staticmethod
+    def _head(status, headers, version):
+        reason = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+                  404: 'Not Found', 405: 'Method Not Allowed', 416: 'Range Not Satisfiable'}[status]
+        lines = [f'{version} {status} {reason}', f'Date: {formatdate(usegmt=True)}',
+                 'Server: BlackWaveStatic/1.0']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def _send(self, writer, status, headers, body, head_only=False, version='HTTP/1.1'):
+        if status != 304:
+            headers.setdefault('Content-Type', 'text/plain')
+            headers['Content-Length'] = str(len(body))
+        writer.write(self._head(status, headers, version))
+        if body and not head_only:
+            writer.write(body)
+
+
+def _raise_file_limit():
+    """Allow as many open sockets as the hard limit permits (one per keep-alive client)"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        target = hard if hard != resource.RLIM_INFINITY else 65536
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+async def serve(root, host, port, log=False):
+    server = StaticServer(root, log=log)
+    listener = await asyncio.start_server(server.handle, host, port, backlog=4096,
+                                          limit=MAX_HEADER_BYTES)
+    print(f"Serving {root}/ on http://{host}:{port}/ (up to {_raise_file_limit()} open files)")
+    start = time.perf_counter()
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        print(f"{server.requests} requests in {time.perf_counter() - start:.0f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the dist/ build like a production static host')
+    parser.add_argument('--root', default=DIST_DIR, help=f'directory to serve (default {DIST_DIR})')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--log', action='store_true', help='print one line per request')
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(os.path.join(args.root, 'index.html')):
+        print(f"Error: {args.root}/index.html not found; build it with: python build_site.py")
+        sys.exit(1)
+    try:
+        asyncio.run(serve(args.root, args.host, args.port, args.log))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Service worker and precache manifest for dist/
+
+    python service_worker.py [--dist dist]
+
+Every deployable file of dist/ (pages, stylesheets, scripts, images, the
+capability statement PDF; not the .gz/.br siblings) is listed in a precache
+manifest with a revision: the first 10 hex digits of its sha256. The
+manifest is embedded in dist/sw.js and also written to
+dist/precache-manifest.json for inspection.
+
+The worker caches each file under its URL plus its revision, and serves
+every listed URL cache-first, so a repeat visit makes no request at all for
+unchanged content:
+
+  install   downloads the files the page needs to render (index.html, its
+            stylesheet and script, and the images it loads on a desktop
+            viewport, as page_budget.py resolves them) unless that revision
+            is already cached; after a deploy only the changed files are
+            downloaded
+  fetch     answers from the cache; a listed file that is not cached yet
+            (a lazy image, another srcset width, the PDF) is fetched once,
+            stored, and served from the cache from then on. Requests with a
+            Range header go to the network, so the PDF viewer still gets
+            206 partial responses and the linearized PDF's first page
+            shows before the whole file has downloaded
+  activate  deletes the cached revisions that are no longer in the
+            manifest
+
+Any change to the site changes sw.js, which browsers check on every visit
+(serve_dist.py sends it with Cache-Control: no-cache). The new worker waits
+until the open tabs of the old one are closed, so a page never mixes files
+of two deploys. build_site.py runs this step last and adds the
+registration snippet to index.html.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from build_common import DIST_DIR
+from capability_assets import file_digest
+from page_budget import DEFERRED_INITIATORS, collect_resources
+
+WORKER_NAME = 'sw.js'
+MANIFEST_NAME = 'precache-manifest.json'
+
+# Not deployed as separate resources, or not cacheable by the worker itself
+SKIP_SUFFIXES = ('.gz', '.br', '.tmp', '.map')
+SKIP_NAMES = (WORKER_NAME, MANIFEST_NAME, 'CNAME')
+
+# Inserted before </body> of index.html by build_site.py
+REGISTER_SNIPPET = ("<script>if('serviceWorker'in navigator)addEventListener('load',function(){"
+                    f"navigator.serviceWorker.register('{WORKER_NAME}')}})</script>")
+
+WORKER_TEMPLATE = """\
+// Generated by service_worker.py; do not edit.
+'use strict';
+
+const MANIFEST = __PRECACHE_MANIFEST__;
+const CACHE = 'bw-precache';
+
+// Absolute URL -> manifest entry; a directory URL stands for its index.html
+const ENTRIES = new Map(MANIFEST.entries.map((entry) => [new URL(entry.url, self.registration.scope).href, entry]));
+
+function cacheKey(url, entry) {
+  return url + '?__rev=' + entry.revision;
+}
+
+function lookup(request) {
+  const url = new URL(request.url);
+  url.hash = '';
+  url.search = '';
+  if (url.pathname.endsWith('/')) {
+    url.pathname += 'index.html';
+  }
+  const entry = ENTRIES.get(url.href);
+  return entry ? [url.href, entry] : null;
+}
+
+async function store(cache, url, entry) {
+  // no-cache: revalidate with the server rather than trust the HTTP cache
+  const response = await fetch(url, { cache: 'no-cache' });
+  if (response.ok && !response.redirected) {
+    await cache.put(cacheKey(url, entry), response.clone());
+  }
+  return response;
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const wanted = [...ENTRIES].filter(([, entry]) => entry.precache);
+    await Promise.all(wanted.map(async ([url, entry]) => {
+      if (!(await cache.match(cacheKey(url, entry)))) {
+        const response = await store(cache, url, entry);
+        if (!response.ok) {
+          throw new Error('precache failed: ' + url + ' (' + response.status + ')');
+        }
+      }
+    }));
+  })());
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const live = new Set([...ENTRIES].map(([url, entry]) => cacheKey(url, entry)));
+    await Promise.all((await cache.keys())
+      .filter((request) => !live.has(request.url))
+      .map((request) => cache.delete(request)));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', (event) => {
+  if (event.request.method !== 'GET') {
+    return;
+  }
+  // Range requests (the PDF viewer reading a linearized file piece by piece)
+  // go to the network: the cache holds whole 200 responses, and answering a
+  // range with one would make the viewer wait for the whole file.
+  if (event.request.headers.has('range')) {
+    return;
+  }
+  const found = lookup(event.request);
+  if (!found) {
+    return;
+  }
+  const [url, entry] = found;
+  event.respondWith((async () => {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match(cacheKey(url, entry));
+    return cached || store(cache, url, entry);
+  })());
+});
+"""
+
+
+def deployable_files(dist_dir=DIST_DIR):
+    """dist-relative paths (with '/') of every file the worker may cache, sorted"""
+    found = []
+    for directory, _, names in os.walk(dist_dir):
+        for name in names:
+            if name.endswith(SKIP_SUFFIXES) or name in SKIP_NAMES:
+                continue
+            rel = os.path.relpath(os.path.join(directory, name), dist_dir)
+            found.append(rel.replace(os.sep, '/'))
+    return sorted(found)
+
+
+def install_files(dist_dir=DIST_DIR):
+    """Files index.html needs to render: everything it loads except lazy images and linked documents"""
+    if not os.path.isfile(os.path.join(dist_dir, 'index.html')):
+        return set()
+    resources, _ = collect_resources(dist_dir)
+    return {key.replace(os.sep, '/') for key, info in resources.items()
+            if info['initiator'] not in DEFERRED_INITIATORS}
+
+
+def build_manifest(dist_dir=DIST_DIR):
+    """
+    {'version', 'entries': [{'url', 'revision', 'bytes', 'precache'}]};
+    the version is a digest of every entry's URL and revision.
+    """
+    precache = install_files(dist_dir)
+    entries = []
+    for rel in deployable_files(dist_dir):
+        path = os.path.join(dist_dir, rel)
+        entries.append({'url': rel, 'revision': file_digest(path)[:10], 'bytes': os.path.getsize(path),
+                        'precache': rel in precache})
+    listing = ''.join(f"{e['url']} {e['revision']}\n" for e in entries).encode('utf-8')
+    return {'version': hashlib.sha256(listing).hexdigest()[:10], 'entries': entries}
+
+
+def render_worker(manifest):
+    """The text of sw.js for `manifest` (sizes are left out of the worker)"""
+    entries = [{k: e[k] for k in ('url', 'revision', 'precache')} for e in manifest['entries']]
+    embedded = json.dumps({'version': manifest['version'], 'entries': entries}, indent=1)
+    return WORKER_TEMPLATE.replace('__PRECACHE_MANIFEST__', embedded)
+
+
+def write_service_worker(dist_dir=DIST_DIR):
+    """Write sw.js and precache-manifest.json into `dist_dir`; returns the manifest"""
+    manifest = build_manifest(dist_dir)
+    for name, text in ((MANIFEST_NAME, json.dumps(manifest, indent=1) + '\n'),
+                       (WORKER_NAME, render_worker(manifest))):
+        path = os.path.join(dist_dir, name)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    return manifest
+
+
+def previous_manifest(dist_dir=DIST_DIR):
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def print_summary(manifest, previous=None):
+    entries = manifest['entries']
+    precached = [e for e in entries if e['precache']]
+    print(f"{WORKER_NAME}: manifest {manifest['version']}, {len(entries)} file(s) "
+          f"({sum(e['bytes'] for e in entries) / 1024:,.0f} KiB); "
+          f"{len(precached)} precached on install ({sum(e['bytes'] for e in precached) / 1024:,.0f} KiB), "
+          f"the rest cached on first use")
+    if previous is not None:
+        old = {e['url']: e['revision'] for e in previous.get('entries', [])}
+        changed = [e for e in entries if old.get(e['url']) != e['revision']]
+        print(f"Changed since the last manifest: {len(changed)} file(s), "
+              f"{sum(e['bytes'] for e in changed) / 1024:,.0f} KiB to download for returning visitors")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the service worker and precache manifest for dist/')
+    parser.add_argument('--dist', default=DIST_DIR, help=f'built site (default {DIST_DIR})')
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(os.path.join(args.dist, 'index.html')):
+        print(f"Error: {args.dist}/index.html not found (run build_site.py first)")
+        sys.exit(1)
+    previous = previous_manifest(args.dist)
+    print_summary(write_service_worker(args.dist), previous)
+
+
+if __name__ == '__main__':
+    main()
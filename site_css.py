@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+CSS helpers for the website build: a conservative minifier and critical-CSS
+extraction for the first screen (build_site.py, html_optimize.py)
+"""
+
+import re
+
+# The first screen: everything in <body> up to the end of the hero section
+CRITICAL_END_MARKER = 'id="hero"'
+
+CSS_TOKEN_RE = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/|\s+|[^"'/\s]+|/''', re.DOTALL)
+
+
+def minify_css(css):
+    """Drop comments and redundant whitespace; strings are kept verbatim"""
+    out = []
+    for token in CSS_TOKEN_RE.findall(css):
+        if token.startswith('/*'):
+            continue
+        if token.isspace():
+            out.append(' ')
+        else:
+            out.append(token)
+    text = ''.join(out)
+    # whitespace is never needed next to these (but is before ':' in "a :hover" and around '(')
+    parts = re.split(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', text)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', parts[i])
+        part = re.sub(r':\s+', ':', part)
+        parts[i] = part.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def split_css_blocks(css):
+    """Split minified CSS into top-level (prelude, body) blocks; body is None for statements"""
+    blocks = []
+    i = 0
+    n = len(css)
+    while i < n:
+        start = i
+        while i < n and css[i] not in '{;':
+            if css[i] in '"\'':
+                i = css.index(css[i], i + 1) + 1
+                continue
+            i += 1
+        if i >= n:
+            break
+        prelude = css[start:i].strip()
+        if css[i] == ';':
+            blocks.append((prelude, None))
+            i += 1
+            continue
+        depth = 0
+        body_start = i + 1
+        while i < n:
+            ch = css[i]
+            if ch in '"\'':
+                i = css.index(ch, i + 1) + 1
+                continue
+            if ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    break
+            i += 1
+        blocks.append((prelude, css[body_start:i]))
+        i += 1
+    return blocks
+
+
+def _used_names(html):
+    """Tags, classes and ids used in an HTML fragment"""
+    tags = {t.lower() for t in re.findall(r'<([a-zA-Z][\w-]*)', html)} | {'html', 'body'}
+    classes = set()
+    for value in re.findall(r'\sclass\s*=\s*"([^"]*)"', html):
+        classes.update(value.split())
+    ids = set(re.findall(r'\sid\s*=\s*"([^"]*)"', html))
+    return tags, classes, ids
+
+
+def _selector_is_used(selector, tags, classes, ids):
+    selector = re.sub(r'::?[\w-]+(\([^)]*\))?', '', selector)  # pseudo-classes/elements
+    selector = re.sub(r'\[[^\]]*\]', '', selector)  # attribute selectors
+    if not all(name in classes for name in re.findall(r'\.([\w-]+)', selector)):
+        return False
+    if not all(name in ids for name in re.findall(r'#([\w-]+)', selector)):
+        return False
+    type_names = re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', selector)
+    return all(name.lower() in tags for name in type_names)
+
+
+def critical_css(css, html_fragment):
+    """
+    Rules of minified `css` that can apply to `html_fragment`: a rule is kept
+    when one of its selectors only names tags, classes and ids used there.
+    @media blocks are filtered recursively; other at-rules are left to the
+    full stylesheet.
+    """
+    tags, classes, ids = _used_names(html_fragment)
+    out = []
+    for prelude, body in split_css_blocks(css):
+        if body is None:
+            continue
+        if prelude.startswith('@media'):
+            inner = critical_css(body, html_fragment)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith('@font-face'):
+            out.append(f"{prelude}{{{body}}}")
+        elif not prelude.startswith('@'):
+            if any(_selector_is_used(s, tags, classes, ids) for s in prelude.split(',')):
+                out.append(f"{prelude}{{{body}}}")
+    return ''.join(out)
+
+
+def first_screen(html):
+    """The HTML from <body> to the end of the hero section (the above-the-fold markup)"""
+    body = html.find('<body')
+    marker = html.find(CRITICAL_END_MARKER)
+    if body < 0 or marker < 0:
+        return html
+    end = html.find('</section>', marker)
+    return html[body:end if end >= 0 else len(html)]
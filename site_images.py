@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Build responsive image derivatives for the website
+
+Every image in assets/img/ is encoded as AVIF and WebP at several widths
+(never wider than the source) on a thread pool. Outputs get content-hashed
+names, so they can be cached forever, and are written to dist/assets/img/
+next to an untouched copy of the original, which stays as the fallback.
+Encoded derivatives are cached in .cache/site_images keyed by the source's
+content hash plus the encoding settings, so a rebuild only re-encodes
+images whose source changed.
+
+index.html and styles.css are copied to dist/ with every <img> wrapped in a
+<picture> offering AVIF/WebP srcset candidates, and every background url()
+followed by an image-set() equivalent (browsers that don't support it keep
+the original declaration).
+
+Usage:
+    python site_images.py [--jobs N] [--dist dist]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from build_common import DIST_DIR
+from capability_assets import file_digest
+
+SOURCE_DIR = 'assets/img'
+CACHE_DIR = '.cache/site_images'
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Candidate widths in pixels; the source width is added when it is smaller than the largest
+WIDTHS = (320, 640, 960, 1280, 1920)
+
+# Encoder quality per output format (AVIF and WebP quality scales differ)
+FORMATS = {'avif': 55, 'webp': 80}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+# Rendered width of each image, for the `sizes` attribute (default: full viewport)
+SIZES = {
+    'Final_Logo.png': '76px',  # .logo-icon is 44px tall
+    'BW_website-service_showcase_2.png': '(max-width: 460px) 100vw, 420px',
+}
+DEFAULT_SIZES = '100vw'
+
+# Widest derivative used for CSS backgrounds (image-set picks by format, not width)
+BACKGROUND_WIDTH = 1920
+
+# Bump when the encoding recipe changes so stale cache entries are ignored
+RECIPE_VERSION = 1
+
+
+def candidate_widths(source_width, widths=WIDTHS):
+    """Widths to encode for a source image, never upscaling"""
+    chosen = [w for w in widths if w < source_width]
+    if source_width <= max(widths):
+        chosen.append(source_width)
+    return chosen or [source_width]
+
+
+def derivative_key(source_digest, width, fmt, quality):
+    settings = {'recipe': RECIPE_VERSION, 'source': source_digest, 'width': width,
+                'format': fmt, 'quality': quality}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+def _encode(img, size, fmt, quality, out_path):
+    """Resize and encode one derivative (Pillow releases the GIL while doing both)"""
+    from PIL import Image
+
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+    tmp_path = f'{out_path}.{os.getpid()}.{id(img)}.tmp'
+    if fmt == 'avif':
+        img.save(tmp_path, 'AVIF', quality=quality)
+    else:
+        img.save(tmp_path, 'WEBP', quality=quality, method=6)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _publish(cache_path, dist_img_dir, stem, width, fmt):
+    """Copy a cached derivative into dist/ under a content-hashed name"""
+    with open(cache_path, 'rb') as f:
+        data = f.read()
+    name = f"{stem}-{width}w.{hashlib.sha256(data).hexdigest()[:10]}.{fmt}"
+    out_path = os.path.join(dist_img_dir, name)
+    if not os.path.exists(out_path):
+        with open(out_path, 'wb') as f:
+            f.write(data)
+    return name, len(data)
+
+
+def build_images(source_dir=SOURCE_DIR, dist_dir=DIST_DIR, cache_dir=CACHE_DIR, jobs=None):
+    """
+    Encode (or reuse) every derivative and publish them into dist_dir.
+
+    Returns (manifest, counts). The manifest is keyed by source URL
+    ('assets/img/X.png'):
+        {'width', 'height', 'bytes', 'fallback',
+         'variants': {fmt: [{'url', 'width', 'height', 'bytes'}, ...]}}
+    and counts says how many derivatives were 'encoded' and 'reused'.
+    """
+    from PIL import Image
+
+    sources = sorted(name for name in os.listdir(source_dir)
+                     if name.lower().endswith(SOURCE_EXTENSIONS))
+    dist_img_dir = os.path.join(dist_dir, source_dir)
+    os.makedirs(dist_img_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    manifest = {}
+    pending = []  # (source name, width, height, fmt, cache path)
+    encoded = 0
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = []
+        for name in sources:
+            src = os.path.join(source_dir, name)
+            digest = file_digest(src)
+            with Image.open(src) as probe:
+                width, height = probe.size  # header only, no decode
+            loaded = None
+            for w in candidate_widths(width):
+                h = max(1, round(height * w / width))
+                for fmt, quality in FORMATS.items():
+                    cache_path = os.path.join(cache_dir, f"{derivative_key(digest, w, fmt, quality)}.{fmt}")
+                    pending.append((name, w, h, fmt, cache_path))
+                    if os.path.exists(cache_path):
+                        continue
+                    if loaded is None:
+                        # decode once per changed source; workers only read it
+                        loaded = Image.open(src)
+                        loaded.load()
+                        if loaded.mode not in ('RGB', 'RGBA'):
+                            loaded = loaded.convert('RGBA' if loaded.has_transparency_data else 'RGB')
+                    futures.append(pool.submit(_encode, loaded, (w, h), fmt, quality, cache_path))
+                    encoded += 1
+            shutil.copyfile(src, os.path.join(dist_img_dir, name))
+            manifest[f"{source_dir}/{name}"] = {
+                'width': width, 'height': height, 'bytes': os.path.getsize(src),
+                'fallback': f"{source_dir}/{name}", 'variants': {fmt: [] for fmt in FORMATS},
+            }
+        for future in futures:
+            future.result()
+
+    published = set(sources)
+    for name, w, h, fmt, cache_path in pending:
+        stem = os.path.splitext(name)[0]
+        out_name, size = _publish(cache_path, dist_img_dir, stem, w, fmt)
+        published.add(out_name)
+        manifest[f"{source_dir}/{name}"]['variants'][fmt].append(
+            {'url': f"{source_dir}/{out_name}", 'width': w, 'height': h, 'bytes': size})
+
+    # Drop derivatives from earlier builds that no longer match a source
+    for name in os.listdir(dist_img_dir):
+        if name not in published:
+            os.unlink(os.path.join(dist_img_dir, name))
+    return manifest, {'encoded': encoded, 'reused': len(pending) - encoded}
+
+
+def _srcset(entry, fmt):
+    return ', '.join(f"{v['url']} {v['width']}w" for v in entry['variants'][fmt])
+
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_ATTR_RE = re.compile(r'''\ssrc\s*=\s*(["'])(.*?)\1''', re.IGNORECASE | re.DOTALL)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+
+
+def rewrite_html(html, manifest):
+    """Wrap each <img> with a known source in a <picture> offering AVIF and WebP srcsets"""
+    comments = [m.span() for m in COMMENT_RE.finditer(html)]
+
+    def replace(match):
+        tag = match.group(0)
+        if any(start <= match.start() < end for start, end in comments) or 'srcset' in tag.lower():
+            return tag
+        src = SRC_ATTR_RE.search(tag)
+        entry = manifest.get(src.group(2).removeprefix('./')) if src else None
+        if entry is None:
+            return tag
+        line_start = html.rfind('\n', 0, match.start()) + 1
+        indent = re.match(r'[ \t]*', html[line_start:]).group(0)
+        sizes = SIZES.get(os.path.basename(entry['fallback']), DEFAULT_SIZES)
+        sources = ''.join(
+            f'\n{indent}  <source type="{MIME_TYPES[fmt]}" srcset="{_srcset(entry, fmt)}" sizes="{sizes}" />'
+            for fmt in FORMATS if entry['variants'][fmt])
+        inner = tag.replace('\n', '\n  ')
+        return f"<picture>{sources}\n{indent}  {inner}\n{indent}</picture>"
+
+    return IMG_TAG_RE.sub(replace, html)
+
+
+CSS_URL_DECL_RE = re.compile(
+    r'''(?P<indent>[ \t]*)(?P<prop>background(?:-image)?)\s*:\s*(?P<value>[^;{}]*?'''
+    r'''url\(\s*(?P<q>["']?)(?P<url>[^"')]+)(?P=q)\s*\)[^;{}]*);''')
+
+
+def rewrite_css(css, manifest):
+    """Follow each background url() of a known image with an image-set() of its derivatives"""
+
+    def replace(match):
+        entry = manifest.get(match.group('url').removeprefix('./'))
+        if entry is None:
+            return match.group(0)
+        candidates = []
+        for fmt in FORMATS:
+            fitting = [v for v in entry['variants'][fmt] if v['width'] <= BACKGROUND_WIDTH]
+            if fitting:
+                candidates.append(f'url("{fitting[-1]["url"]}") type("{MIME_TYPES[fmt]}")')
+        if not candidates:
+            return match.group(0)
+        url_call = re.search(r'url\([^)]*\)', match.group('value')).group(0)
+        value = match.group('value').replace(url_call, f"image-set({', '.join(candidates)})")
+        return f"{match.group(0)}\n{match.group('indent')}{match.group('prop')}: {value};"
+
+    return CSS_URL_DECL_RE.sub(replace, css)
+
+
+def print_report(manifest):
+    print(f"{'image':36s} {'source':>10s} {'avif':>18s} {'webp':>18s}")
+    for url, entry in manifest.items():
+        cells = []
+        for fmt in FORMATS:
+            sizes = [v['bytes'] for v in entry['variants'][fmt]]
+            cells.append(f"{min(sizes) / 1024:.0f}-{max(sizes) / 1024:.0f} KiB" if sizes else '-')
+        print(f"{os.path.basename(url):36s} {entry['bytes'] / 1024:7.0f} KiB {cells[0]:>18s} {cells[1]:>18s}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build responsive image derivatives for the website')
+    parser.add_argument('--dist', default=DIST_DIR, help=f'output directory (default {DIST_DIR})')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='encoder threads (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(SOURCE_DIR):
+        print(f"Error: {SOURCE_DIR} not found (run from the repo root)")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    manifest, info = build_images(dist_dir=args.dist, jobs=args.jobs)
+    for page, rewrite in (('index.html', rewrite_html), ('styles.css', rewrite_css)):
+        with open(page, encoding='utf-8') as f:
+            text = f.read()
+        with open(os.path.join(args.dist, page), 'w', encoding='utf-8') as f:
+            f.write(rewrite(text, manifest))
+    print_report(manifest)
+    print(f"{info['encoded']} derivative(s) encoded, {info['reused']} reused from {CACHE_DIR} "
+          f"({time.perf_counter() - start:.1f}s); wrote {args.dist}/index.html and {args.dist}/styles.css")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+from check_links import build_index, check_links, repeated_headings, scan_markdown
+from generate_toc import build_toc, unique_slugs
+
+REPEATED = """\
+# Changelog
+
+## v0.2
+### Files Touched
+- a
+
+## v0.3
+### Files Touched
+- b
+
+## v0.4
+### Files Touched
+- c
+"""
+
+def test_unique_slugs_numbers_repeats_like_github():
+    assert unique_slugs(["files-touched", "files-touched", "files-touched"]) == [
+        "files-touched", "files-touched-1", "files-touched-2"]
+    # a heading that already looks numbered takes the next free suffix
+    assert unique_slugs(["a", "a-1", "a"]) == ["a", "a-1", "a-2"]
+
+def test_repeated_headings_get_numbered_anchors():
+    anchors, _, _ = scan_markdown(REPEATED)
+    assert anchors["files-touched"] == [4]
+    assert anchors["files-touched-1"] == [8]
+    assert anchors["files-touched-2"] == [12]
+
+def test_toc_links_match_checker_anchors():
+    toc = build_toc([(3, "Files Touched"), (3, "Files Touched")])
+    assert "(#files-touched)" in toc and "(#files-touched-1)" in toc
+
+def test_links_to_repeated_headings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "doc.md").write_text(REPEATED + "\n[first](#files-touched) [second](#files-touched-1) "
+                                     "[third](#files-touched-2) [none](#files-touched-3)\n",
+                                     encoding="utf-8")
+    files, _ = build_index(["doc.md"], jobs=1, index_path=None)
+    problems = check_links(files)
+    assert [(kind, message.split(":")[0]) for _, _, kind, message in problems] == [
+        ("broken", "#files-touched-3")]
+
+def test_explicit_id_collision_is_ambiguous(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "doc.md").write_text('## Setup\n<a name="setup"></a>\n\n[setup](#setup)\n', encoding="utf-8")
+    files, _ = build_index(["doc.md"], jobs=1, index_path=None)
+    assert [kind for _, _, kind, _ in check_links(files)] == ["ambiguous"]
+
+def test_toc_style_link_to_repeated_heading_is_ambiguous(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "doc.md").write_text("- [Files Touched](#files-touched)\n" + REPEATED, encoding="utf-8")
+    files, _ = build_index(["doc.md"], jobs=1, index_path=None)
+    assert [(line, kind) for _, line, kind, _ in check_links(files)] == [(1, "ambiguous")]
+    assert [(title, [anchor for _, anchor, _ in found]) for _, title, found in repeated_headings(files)] == [
+        ("Files Touched", ["files-touched", "files-touched-1", "files-touched-2"])]
@@ -0,0 +1,339 @@
+#====================================================================================
+# Watch markdown files and keep their Table of Contents current as they are edited.
+#====================================================================================
+# $ python generate_toc.py Documents/CHANGELOG.md --watch
+# $ python generate_toc.py Documents/ --watch --debounce 0.5
+#
+# Each watched document keeps its heading/fence index in memory. A save only
+# re-scans the edited line range (plus any fenced block it touches), bursts of
+# saves are debounced, the file is rewritten only when the generated TOC
+# differs, and the events caused by our own writes are ignored.
+#
+# Uses inotify (via ctypes) on Linux and falls back to polling os.stat elsewhere.
+#====================================================================================
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from generate_toc import (DEFAULT_TOC_HEADING, MARK_H1, MARK_TOC, _scan, _write_atomic,
+                          build_toc, insert_or_replace_toc)
+
+DEFAULT_DEBOUNCE = 0.2
+POLL_INTERVAL = 0.5
+
+def _line_items(lines, first_line=0, first_offset=0):
+    """(line number, offset, line) triples for lines that keep their line breaks"""
+    offset = first_offset
+    for i, line in enumerate(lines, first_line):
+        yield i, offset, line
+        offset += len(line)
+
+def _spliced(values, keep, part, resume, shift=0):
+    """values[:keep] + part + values[resume:] shifted by `shift` (arrays or lists)"""
+    if shift:
+        tail = array(values.typecode, (v + shift for v in values[resume:]))
+    else:
+        tail = values[resume:]
+    return values[:keep] + part + tail
+
+class IncrementalIndex:
+    """
+    MarkdownIndex of one document that can be updated from an edit without
+    re-scanning the unchanged lines.
+
+    The changed range is found from the common prefix and suffix of the old
+    and new lines. Scanning restarts at the first changed line (moved back to
+    the opening line of a fence containing it) and stops at the first line
+    past the edit where neither the old nor the new document is inside a
+    fence; from there on both indexes agree up to a line and offset shift.
+    """
+
+    def __init__(self, md_text, toc_heading=DEFAULT_TOC_HEADING):
+        self.toc_heading = toc_heading
+        self.lines = md_text.splitlines(keepends=True)
+        self.length = len(md_text)
+        self.index = _scan(_line_items(self.lines), toc_heading)
+
+    def _fence_around(self, line):
+        """The fence (start, end) that is open when the scan reaches `line`, or None"""
+        starts, ends = self.index.fence_starts, self.index.fence_ends
+        i = bisect_right(starts, line) - 1
+        if i < 0:
+            return None
+        start, end = starts[i], ends[i]
+        if start < line < end:
+            return start, end
+        if line == end == len(self.lines) and self._unterminated(start, end):
+            return start, end  # appending to a document that ends inside a fence
+        return None
+
+    def _unterminated(self, start, end):
+        # a closed fence ends on a line repeating its opening token
+        return end - 1 == start or self.lines[end - 1].strip()[:3] != self.lines[start].strip()[:3]
+
+    def update(self, md_text):
+        """Bring the index in line with `md_text`; returns the number of lines re-scanned"""
+        old = self.lines
+        new_lines = md_text.splitlines(keepends=True)
+        n_old, n_new = len(old), len(new_lines)
+
+        prefix = 0
+        limit = min(n_old, n_new)
+        while prefix < limit and old[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[n_old - 1 - suffix] == new_lines[n_new - 1 - suffix]:
+            suffix += 1
+        if prefix == n_old == n_new:
+            return 0
+
+        delta = n_new - n_old
+        shift = len(md_text) - self.length
+        hi_new = n_new - suffix
+        lo = prefix
+        fence = self._fence_around(lo)
+        if fence is not None:
+            lo = fence[0]
+
+        def settled(i):
+            # past the edit, and the old document was outside a fence here too
+            return i >= hi_new and i - delta < n_old and self._fence_around(i - delta) is None
+
+        part = _scan(_line_items(new_lines[lo:], lo, sum(map(len, new_lines[:lo]))), self.toc_heading,
+                     first_line=lo, until=settled)
+        stop_old = part.line_count - delta
+
+        index = self.index
+        keep = bisect_right(index.fence_ends, lo)
+        resume = bisect_left(index.fence_starts, stop_old)
+        index.fence_starts = _spliced(index.fence_starts, keep, part.fence_starts, resume, delta)
+        index.fence_ends = _spliced(index.fence_ends, keep, part.fence_ends, resume, delta)
+
+        keep = bisect_left(index.heading_lines, lo)
+        resume = bisect_left(index.heading_lines, stop_old)
+        index.heading_lines = _spliced(index.heading_lines, keep, part.heading_lines, resume, delta)
+        index.heading_offsets = _spliced(index.heading_offsets, keep, part.heading_offsets, resume, shift)
+        for name in ("heading_levels", "titles", "slugs"):
+            setattr(index, name, _spliced(getattr(index, name), keep, getattr(part, name), resume))
+
+        keep = bisect_left(index.mark_lines, lo)
+        resume = bisect_left(index.mark_lines, stop_old)
+        index.mark_lines = _spliced(index.mark_lines, keep, part.mark_lines, resume, delta)
+        index.mark_offsets = _spliced(index.mark_offsets, keep, part.mark_offsets, resume, shift)
+        index.mark_kinds = _spliced(index.mark_kinds, keep, part.mark_kinds, resume)
+
+        self.lines = new_lines
+        self.length = len(md_text)
+        self._locate_toc()
+        return part.line_count - lo
+
+    def _locate_toc(self):
+        """Recompute the TOC position fields of the index from its marks"""
+        index = self.index
+        index.line_count = len(self.lines)
+        index.toc_start = index.toc_end = index.first_h1 = index.insert_at = None
+        index.offsets = offsets = {}
+        marks = list(zip(index.mark_lines, index.mark_offsets, index.mark_kinds))
+        for k, (line, offset, kind) in enumerate(marks):
+            if kind == MARK_TOC and index.toc_start is None:
+                index.toc_start = line
+                offsets["toc_start"] = offset
+                if k + 1 < len(marks):
+                    index.toc_end, offsets["toc_end"] = marks[k + 1][:2]
+                else:
+                    index.toc_end = index.line_count
+            if kind == MARK_H1 and index.first_h1 is None:
+                index.first_h1 = line
+        if index.first_h1 is not None:
+            index.insert_at = next((i for i in range(index.first_h1 + 1, index.line_count)
+                                    if self.lines[i].strip()), index.line_count)
+            if index.insert_at < index.line_count:
+                offsets["insert_at"] = sum(map(len, self.lines[:index.insert_at]))
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+class WatchedDocument:
+    """A markdown file, its in-memory index and the stat of our last write to it"""
+
+    def __init__(self, path, include_h1=False, toc_heading=DEFAULT_TOC_HEADING):
+        self.path = Path(path)
+        self.include_h1 = include_h1
+        self.toc_heading = toc_heading
+        self.text = None
+        self.index = None
+        self.own_stat = None
+        self.rescanned = 0  # lines re-scanned for the last external edit
+
+    def refresh(self):
+        """
+        Re-read the file and regenerate its TOC.
+
+        Returns True when the file was rewritten. Events for a file whose stat
+        still matches our own last write, or whose text did not change, are
+        ignored.
+        """
+        stat = _stat_key(self.path)
+        if stat is None or stat == self.own_stat:
+            return False
+        text = self.path.read_text(encoding="utf-8")
+        if text == self.text:
+            return False
+
+        if self.index is None:
+            self.index = IncrementalIndex(text, self.toc_heading)
+            self.rescanned = len(self.index.lines)
+        else:
+            self.rescanned = self.index.update(text)
+        self.text = text
+
+        index = self.index.index
+        toc_block = build_toc(index, include_h1=self.include_h1, toc_title=self.toc_heading)
+        new_md = insert_or_replace_toc(text, toc_block, self.toc_heading, index=index)
+        if new_md == text:
+            return False
+
+        _write_atomic(self.path, [new_md.encode("utf-8")])
+        self.own_stat = _stat_key(self.path)
+        self.text = new_md
+        self.index.update(new_md)
+        return True
+
+#====================================================================================
+# File-change sources
+#====================================================================================
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = 0o4000
+_EVENT = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """Reports names written or moved into the watched directories (Linux only)"""
+
+    def __init__(self, directories):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(err, f"cannot watch {directory}")
+            self._dirs[wd] = Path(directory)
+
+    def wait(self, timeout):
+        """Paths touched within `timeout` seconds (empty set on timeout)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        paths = set()
+        pos = 0
+        while pos < len(data):
+            wd, _, _, name_len = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = data[pos:pos + name_len].rstrip(b"\0")
+            pos += name_len
+            if name and wd in self._dirs:
+                paths.add(self._dirs[wd] / os.fsdecode(name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Portable fallback: compares os.stat of the watched files every POLL_INTERVAL"""
+
+    def __init__(self, files):
+        self._stats = {path: _stat_key(path) for path in files}
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, POLL_INTERVAL))
+        paths = set()
+        for path, old in self._stats.items():
+            stat = _stat_key(path)
+            if stat != old:
+                self._stats[path] = stat
+                paths.add(path)
+        return paths
+
+    def close(self):
+        pass
+
+def make_watcher(files, poll=False):
+    if not poll:
+        try:
+            return InotifyWatcher(sorted({str(path.parent) for path in files}))
+        except OSError:
+            pass
+    return PollingWatcher(files)
+
+def watch(files, include_h1=False, toc_heading=DEFAULT_TOC_HEADING,
+          debounce=DEFAULT_DEBOUNCE, poll=False, log=print):
+    """
+    Regenerate the TOCs of `files` on every change until interrupted.
+
+    Changes are collected until `debounce` seconds pass without a new event,
+    then each touched document is refreshed once.
+    """
+    docs = {Path(path).resolve(): WatchedDocument(path, include_h1, toc_heading) for path in files}
+    for doc in docs.values():
+        if doc.refresh():
+            log(f"TOC updated in {doc.path}")
+
+    watcher = make_watcher(list(docs), poll=poll)
+    log(f"Watching {len(docs)} file(s) for changes ({type(watcher).__name__}); press Ctrl-C to stop")
+    pending = set()
+    last_event = 0.0  # monotonic time of the last event for a watched document
+    try:
+        while True:
+            if pending:
+                remaining = debounce - (time.monotonic() - last_event)
+            else:
+                remaining = 3600
+            if remaining > 0:
+                # events for other files (editor swap files, our own .tmp
+                # writes) end the wait early but do not count as activity
+                touched = {p.resolve() for p in watcher.wait(remaining)} & docs.keys()
+                if touched:
+                    pending |= touched
+                    last_event = time.monotonic()
+                continue
+            # quiet for a full debounce interval: flush the burst
+            for path in sorted(pending):
+                doc = docs[path]
+                try:
+                    if doc.refresh():
+                        log(f"TOC updated in {doc.path} ({doc.rescanned} of "
+                            f"{len(doc.index.lines)} lines re-scanned)")
+                except (OSError, UnicodeDecodeError) as e:
+                    log(f"Error: {doc.path}: {e}")
+            pending.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()